@@ -0,0 +1,126 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chess_puzzle import is_check, game_status, CHECKMATE, STALEMATE, read_board, index2location
+from chess_engine import search, DEFAULT_DEPTH, DEFAULT_TIME_LIMIT
+
+# Batch solver: analyse many board set-up files (in the board_examp.txt format) at once.
+# Every board is read with read_board, checked for check, checkmate and stalemate on both
+# sides and given the engine's best move for Black. Boards are spread over a process pool
+# and each result is written as one JSON line as soon as it is ready, so the output file
+# doubles as a checkpoint: with resume, boards already in it are skipped.
+
+def find_board_files(path: str) -> list[str]:
+    # The .txt files of a directory, or the files matching a glob pattern, in sorted order.
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".txt"))
+    return sorted(name for name in glob.glob(path) if os.path.isfile(name))
+
+def format_move(piece_move: tuple) -> str:
+    piece, x, y = piece_move
+    return index2location(piece.pos_x, piece.pos_y) + index2location(x, y)
+
+def analyse_board(filename: str, depth: int = DEFAULT_DEPTH, time_limit: float = DEFAULT_TIME_LIMIT) -> dict:
+    # One JSON-ready record for a board file. A file that cannot be analysed gets an error
+    # entry instead, so one bad file does not stop the batch. The search stops after
+    # time_limit seconds, so one large board cannot hold up the batch; None searches to the
+    # full depth however long it takes.
+    start = time.perf_counter()
+    record = {"file": filename}
+    try:
+        B = read_board(filename)
+        status = {"white": game_status(True, B), "black": game_status(False, B)}
+        record["check"] = {"white": is_check(True, B), "black": is_check(False, B)}
+        record["checkmate"] = {side: verdict == CHECKMATE for side, verdict in status.items()}
+        record["stalemate"] = {side: verdict == STALEMATE for side, verdict in status.items()}
+        result = search(B, False, depth, time_limit)
+        record["best_move"] = format_move(result[0]) if result else None
+        record["score"] = result[1] if result else None
+        record["depth"] = result[2] if result else 0
+        record["nodes"] = result[3] if result else 0
+    except Exception as error:
+        record["error"] = str(error) or type(error).__name__
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+def completed_files(output: str) -> set[str]:
+    # Files already recorded in an output file; lines cut short by an interrupted run are ignored.
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["file"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+def solve_batch(files: list[str], output: str, workers: int = None, depth: int = DEFAULT_DEPTH,
+                time_limit: float = DEFAULT_TIME_LIMIT, resume: bool = False, progress=sys.stderr,
+                progress_every: int = 100) -> int:
+    # Analyse files and append one JSON line per board to output as each finishes (in the
+    # order they finish, not the order given). Returns the number of boards analysed.
+    if resume:
+        done = completed_files(output)
+        files = [name for name in files if name not in done]
+        if done and progress:
+            print(f"Resuming: {len(done)} boards already done, {len(files)} to go.", file=progress)
+    cut_short = False # An interrupted run left half a line at the end of the output.
+    if resume and os.path.exists(output) and os.path.getsize(output):
+        with open(output, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            cut_short = f.read(1) != b"\n"
+
+    start = time.perf_counter()
+    count = 0
+    with open(output, "a" if resume else "w") as out:
+        if cut_short:
+            out.write("\n")
+
+        def write(record):
+            nonlocal count
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            count += 1
+            if progress and (count % progress_every == 0 or count == len(files)):
+                seconds = time.perf_counter() - start
+                rate = count / seconds if seconds > 0 else 0.0
+                print(f"{count}/{len(files)} boards, {rate:.1f} boards/s", file=progress)
+
+        if workers == 1:
+            for name in files:
+                write(analyse_board(name, depth, time_limit))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = [pool.submit(analyse_board, name, depth, time_limit) for name in files]
+                for future in as_completed(futures):
+                    write(future.result())
+    return count
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse a directory or glob of board files, one JSON line per board.")
+    parser.add_argument("path", help="directory of .txt board files, or a glob pattern such as 'boards/*.txt'")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSON lines output file")
+    parser.add_argument("-w", "--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("-d", "--depth", type=int, default=DEFAULT_DEPTH, help="engine search depth")
+    parser.add_argument("-t", "--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="engine seconds per board")
+    parser.add_argument("--no-time-limit", action="store_true", help="search every board to the full depth")
+    parser.add_argument("--resume", action="store_true", help="skip boards already in the output file")
+    args = parser.parse_args(argv)
+
+    files = find_board_files(args.path)
+    if not files:
+        print(f"No board files found at {args.path}.", file=sys.stderr)
+        return 1
+    time_limit = None if args.no_time_limit else args.time_limit
+    solve_batch(files, args.output, args.workers, args.depth, time_limit, args.resume, sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
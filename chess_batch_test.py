@@ -0,0 +1,118 @@
+import io
+import json
+import shutil
+
+import pytest
+from chess_batch import *
+
+def make_boards(directory): # board_examp.txt, a checkmate, and a file that is not a board
+    shutil.copy("board_examp.txt", directory / "examp.txt")
+    (directory / "mate.txt").write_text("5\nKb5, Be5, Bc1, Bd1\nKb3, Be3, Ba2\n")
+    (directory / "broken.txt").write_text("not a board\n")
+    (directory / "notes.md").write_text("not a .txt file\n")
+
+def read_records(path): # the JSON lines of an output file, by board file name
+    return {os.path.basename(record["file"]): record for record in map(json.loads, path.read_text().splitlines())}
+
+# find_board_files tests:
+def test_find_board_files1(tmp_path): # a directory gives its .txt files in order
+    make_boards(tmp_path)
+    assert [os.path.basename(name) for name in find_board_files(str(tmp_path))] == ["broken.txt", "examp.txt", "mate.txt"]
+
+def test_find_board_files2(tmp_path): # a glob pattern gives the matching files
+    make_boards(tmp_path)
+    assert [os.path.basename(name) for name in find_board_files(str(tmp_path / "m*"))] == ["mate.txt"]
+    assert find_board_files(str(tmp_path / "none*.txt")) == []
+
+# analyse_board tests:
+def test_analyse_board1(): # the checks of both sides and the engine's move for Black
+    record = analyse_board("board_examp.txt", depth=2)
+    assert record["file"] == "board_examp.txt"
+    for key in ("check", "checkmate", "stalemate"):
+        assert record[key] == {"white": False, "black": False}
+    assert len(record["best_move"]) == 4 and record["depth"] == 2 and record["nodes"] > 0
+    assert "error" not in record and record["seconds"] >= 0
+
+def test_analyse_board2(tmp_path, capsys): # a checkmated Black has no move, and nothing is printed
+    make_boards(tmp_path)
+    record = analyse_board(str(tmp_path / "mate.txt"), depth=2)
+    assert record["checkmate"] == {"white": False, "black": True}
+    assert record["check"]["black"] == True
+    assert record["best_move"] is None and record["score"] is None
+    assert capsys.readouterr().out == ""
+
+def test_analyse_board3(tmp_path): # a file that is not a board is reported, not raised
+    make_boards(tmp_path)
+    record = analyse_board(str(tmp_path / "broken.txt"))
+    assert record["error"] == "This is not a valid file."
+    assert "best_move" not in record
+
+def test_analyse_board_time_limit(monkeypatch): # the search is time limited unless asked not to be
+    limits = []
+    monkeypatch.setattr("chess_batch.search", lambda B, side, depth, time_limit: limits.append(time_limit))
+    analyse_board("board_examp.txt")
+    analyse_board("board_examp.txt", time_limit=None)
+    assert limits == [DEFAULT_TIME_LIMIT, None]
+
+# solve_batch tests:
+def test_solve_batch1(tmp_path): # one JSON line per board, with progress reports
+    make_boards(tmp_path)
+    output = tmp_path / "out.jsonl"
+    progress = io.StringIO()
+    assert solve_batch(find_board_files(str(tmp_path)), str(output), workers=1, depth=2,
+                       progress=progress, progress_every=2) == 3
+    records = read_records(output)
+    assert set(records) == {"broken.txt", "examp.txt", "mate.txt"}
+    assert records["mate.txt"]["checkmate"]["black"] == True
+    assert progress.getvalue().splitlines()[0].startswith("2/3 boards,")
+    assert progress.getvalue().splitlines()[-1].startswith("3/3 boards,") and "boards/s" in progress.getvalue()
+
+def test_solve_batch2(tmp_path): # a worker pool gives the same records
+    make_boards(tmp_path)
+    files = find_board_files(str(tmp_path))
+    serial, pooled = tmp_path / "serial.jsonl", tmp_path / "pooled.jsonl"
+    solve_batch(files, str(serial), workers=1, depth=2, progress=None)
+    solve_batch(files, str(pooled), workers=2, depth=2, progress=None)
+    strip = lambda records: {name: {k: v for k, v in r.items() if k != "seconds"} for name, r in records.items()}
+    assert strip(read_records(serial)) == strip(read_records(pooled))
+
+def test_solve_batch_resume(tmp_path): # resuming skips the boards already written, even after a cut-off line
+    make_boards(tmp_path)
+    files = find_board_files(str(tmp_path))
+    output = tmp_path / "out.jsonl"
+    solve_batch(files[:1], str(output), workers=1, depth=2, progress=None)
+    with open(output, "a") as f:
+        f.write('{"file": "half')
+    progress = io.StringIO()
+    assert solve_batch(files, str(output), workers=1, depth=2, resume=True, progress=progress) == 2
+    assert progress.getvalue().startswith("Resuming: 1 boards already done, 2 to go.")
+    lines = output.read_text().splitlines()
+    assert len(lines) == 4 and lines[1] == '{"file": "half'
+    assert completed_files(str(output)) == set(files)
+
+def test_solve_batch_overwrite(tmp_path): # without resume the output starts afresh
+    make_boards(tmp_path)
+    output = tmp_path / "out.jsonl"
+    output.write_text("old\n")
+    solve_batch(find_board_files(str(tmp_path / "mate.txt")), str(output), workers=1, depth=1, progress=None)
+    assert len(output.read_text().splitlines()) == 1
+
+# CLI tests:
+def test_main(tmp_path, capsys): # the command line runs a directory into the output file
+    make_boards(tmp_path)
+    output = tmp_path / "out.jsonl"
+    assert main([str(tmp_path), "-o", str(output), "-w", "1", "-d", "1"]) == 0
+    assert len(read_records(output)) == 3
+    assert "3/3 boards" in capsys.readouterr().err
+
+def test_main_time_limit(tmp_path, monkeypatch): # -t sets the time per board, --no-time-limit lifts it
+    limits = []
+    monkeypatch.setattr("chess_batch.solve_batch", lambda files, output, workers, depth, time_limit, *args: limits.append(time_limit))
+    main(["board_examp.txt"])
+    main(["board_examp.txt", "-t", "0.5"])
+    main(["board_examp.txt", "--no-time-limit"])
+    assert limits == [DEFAULT_TIME_LIMIT, 0.5, None]
+
+def test_main_no_files(tmp_path, capsys): # nothing to analyse is an error
+    assert main([str(tmp_path / "*.txt")]) == 1
+    assert "No board files found" in capsys.readouterr().err
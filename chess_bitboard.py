@@ -0,0 +1,199 @@
+import chess_puzzle
+from chess_geometry import DIRECTIONS, geometry
+from chess_puzzle import Board, Bishop, King, IndexedBoard, logger
+
+# Bitboard backend: a position is stored as Python ints with one bit per square,
+# bit (y - 1) * S + (x - 1) for the square (x, y). Python ints have arbitrary precision,
+# so a 26x26 board (676 bits) needs nothing special.
+
+# Diagonal directions, as in chess_geometry. The first two go up the board (increasing
+# square index), the last two go down (decreasing square index).
+POSITIVE_DIRECTIONS = (0, 1)
+
+_tables = {} # Board size -> (rays, king_zones), built on first use.
+
+def square_index(pos_X: int, pos_Y: int, S: int) -> int:
+    return (pos_Y - 1) * S + (pos_X - 1)
+
+def square_xy(sq: int, S: int) -> tuple[int, int]:
+    return (sq % S + 1, sq // S + 1)
+
+def tables(S: int) -> tuple[list[list[int]], list[int]]:
+    # The ray mask of every diagonal direction from every square (excluding the square
+    # itself) and the king neighbourhood of every square, as bit masks of the geometry
+    # tables; built once per board size.
+    if S in _tables:
+        return _tables[S]
+    geo = geometry(S)
+
+    def mask(squares):
+        return sum(1 << geo.index(square) for square in squares)
+
+    rays = [[0] * (S * S) for _ in DIRECTIONS]
+    king_zones = [0] * (S * S)
+    for square in geo.squares:
+        sq = geo.index(square)
+        for d, ray in enumerate(geo.rays[square]):
+            rays[d][sq] = mask(ray)
+        king_zones[sq] = mask(geo.neighbours[square])
+
+    _tables[S] = (rays, king_zones)
+    if chess_puzzle.DEBUG:
+        logger.debug(f"Bitboard tables built for a {S}x{S} board.")
+    return _tables[S]
+
+def bishop_attacks(sq: int, occupied: int, S: int) -> int:
+    # Squares a bishop on sq attacks: each ray up to and including its first blocker.
+    rays = tables(S)[0]
+    attacks = 0
+    for d in range(4):
+        ray = rays[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            if d in POSITIVE_DIRECTIONS:
+                first = (blockers & -blockers).bit_length() - 1 # Lowest set bit.
+            else:
+                first = blockers.bit_length() - 1 # Highest set bit.
+            ray ^= rays[d][first] # Cut the ray off behind the blocker.
+        attacks |= ray
+    return attacks
+
+class BitBoard:
+    # Occupancy of each side plus one mask per piece type. The masks are plain ints, so a
+    # copy of the position is five integers and a move is a handful of bitwise operations.
+    __slots__ = ('size', 'white', 'black', 'kings', 'bishops')
+
+    def __init__(self, S: int, white: int = 0, black: int = 0, kings: int = 0, bishops: int = 0):
+        tables(S) # Validate the size and build the tables up front.
+        self.size = S
+        self.white = white
+        self.black = black
+        self.kings = kings
+        self.bishops = bishops
+
+    @classmethod
+    def from_board(cls, B: Board) -> 'BitBoard':
+        S = B[0]
+        board = cls(S)
+        for piece in B[1]:
+            bit = 1 << square_index(piece.pos_x, piece.pos_y, S)
+            if piece.side:
+                board.white |= bit
+            else:
+                board.black |= bit
+            if isinstance(piece, King):
+                board.kings |= bit
+            else:
+                board.bishops |= bit
+        return board
+
+    def to_board(self) -> IndexedBoard:
+        pieces = []
+        for sq in range(self.size * self.size):
+            bit = 1 << sq
+            if (self.white | self.black) & bit:
+                x, y = square_xy(sq, self.size)
+                piece_type = King if self.kings & bit else Bishop
+                pieces.append(piece_type(x, y, bool(self.white & bit)))
+        return IndexedBoard(self.size, pieces)
+
+    def copy(self) -> 'BitBoard':
+        return BitBoard(self.size, self.white, self.black, self.kings, self.bishops)
+
+    def occupied(self) -> int:
+        return self.white | self.black
+
+    def side_mask(self, side: bool) -> int:
+        return self.white if side else self.black
+
+    def is_piece_at(self, pos_X: int, pos_Y: int) -> bool:
+        if not (1 <= pos_X <= self.size and 1 <= pos_Y <= self.size):
+            return False
+        return bool(self.occupied() >> square_index(pos_X, pos_Y, self.size) & 1)
+
+    def king_square(self, side: bool) -> int:
+        kings = self.kings & self.side_mask(side)
+        if not kings:
+            raise ValueError("Could not find a king on the board. Check configuration text file.")
+        return kings.bit_length() - 1
+
+    def attacks_from(self, sq: int) -> int:
+        # Pseudo-legal targets of the piece on sq ([Rule1]/[Rule2]), own pieces included.
+        if self.kings >> sq & 1:
+            return tables(self.size)[1][sq]
+        return bishop_attacks(sq, self.occupied(), self.size)
+
+    def can_reach(self, from_X: int, from_Y: int, pos_X: int, pos_Y: int) -> bool:
+        # Same answer as Piece.can_reach for the piece standing on (from_X, from_Y).
+        S = self.size
+        if not geometry(S).on_board(pos_X, pos_Y):
+            return False
+        sq = square_index(from_X, from_Y, S)
+        side = bool(self.white >> sq & 1)
+        target = 1 << square_index(pos_X, pos_Y, S)
+        return bool(self.attacks_from(sq) & target & ~self.side_mask(side))
+
+    def is_check(self, side: bool) -> bool:
+        # Look from the king outwards: an enemy bishop first on a diagonal gives check.
+        # The enemy king only counts when the kings stand next to each other, which a
+        # legal position never has, but it keeps the answer equal to is_check.
+        king = self.king_square(side)
+        enemy = self.side_mask(not side)
+        if tables(self.size)[1][king] & self.kings & enemy:
+            return True
+        return bool(bishop_attacks(king, self.occupied(), self.size) & self.bishops & enemy)
+
+    def make(self, from_sq: int, to_sq: int) -> 'BitBoard':
+        # Position after moving the piece on from_sq to to_sq, capturing whatever is there.
+        board = self.copy()
+        move = (1 << from_sq) | (1 << to_sq)
+        target = ~(1 << to_sq)
+        board.white &= target
+        board.black &= target
+        board.kings &= target
+        board.bishops &= target
+        if self.white >> from_sq & 1:
+            board.white ^= move
+        else:
+            board.black ^= move
+        if self.kings >> from_sq & 1:
+            board.kings ^= move
+        else:
+            board.bishops ^= move
+        return board
+
+    def can_move_to(self, from_X: int, from_Y: int, pos_X: int, pos_Y: int) -> bool:
+        # Same answer as Piece.can_move_to: reachable, the king does not step next to the
+        # enemy king, and the own king is not in check afterwards ([Rule4]).
+        if not self.can_reach(from_X, from_Y, pos_X, pos_Y):
+            return False
+        S = self.size
+        from_sq = square_index(from_X, from_Y, S)
+        to_sq = square_index(pos_X, pos_Y, S)
+        side = bool(self.white >> from_sq & 1)
+        if self.kings >> from_sq & 1:
+            enemy_king = self.king_square(not side)
+            if to_sq == enemy_king or tables(S)[1][enemy_king] >> to_sq & 1:
+                return False
+        return not self.make(from_sq, to_sq).is_check(side)
+
+    def legal_moves(self, side: bool):
+        # Yield (from square, to square) for every legal move of side, the same moves as
+        # generate_legal_moves: a king keeps away from the enemy king, and no move may leave
+        # the own king in check.
+        S = self.size
+        own = self.side_mask(side)
+        enemy_king = self.king_square(not side)
+        king_banned = tables(S)[1][enemy_king] | (1 << enemy_king)
+        pieces = own
+        while pieces:
+            from_sq = (pieces & -pieces).bit_length() - 1
+            pieces &= pieces - 1
+            targets = self.attacks_from(from_sq) & ~own
+            if self.kings >> from_sq & 1:
+                targets &= ~king_banned
+            while targets:
+                to_sq = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                if not self.make(from_sq, to_sq).is_check(side):
+                    yield from_sq, to_sq
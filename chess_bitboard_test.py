@@ -0,0 +1,102 @@
+import random
+
+import pytest
+from chess_puzzle import *
+from chess_bitboard import *
+
+# tables tests:
+def test_tables1(): # a corner square has a single diagonal ray of length S - 1
+    rays, king_zones = tables(5)
+    corner = square_index(1, 1, 5)
+    assert [bin(rays[d][corner]).count("1") for d in range(4)] == [4, 0, 0, 0]
+
+def test_tables2(): # king neighbourhoods: 3 squares in a corner, 8 in the middle
+    king_zones = tables(5)[1]
+    assert bin(king_zones[square_index(1, 1, 5)]).count("1") == 3
+    assert bin(king_zones[square_index(3, 3, 5)]).count("1") == 8
+
+def test_tables3(): # board sizes outside 3..26 are rejected
+    with pytest.raises(ValueError):
+        tables(2)
+    with pytest.raises(ValueError):
+        BitBoard(27)
+
+def test_tables4(): # the largest board fits in a Python int
+    rays = tables(26)[0]
+    assert rays[0][square_index(1, 1, 26)].bit_length() == 26 * 26
+
+# conversion tests:
+def test_from_board1(): # round trip through the bitboard keeps every piece
+    B = read_board("board_examp.txt")
+    B_round = BitBoard.from_board(B).to_board()
+    assert B_round[0] == B[0]
+    assert sorted(str((p.pos_x, p.pos_y, p.side, type(p))) for p in B_round[1]) == \
+        sorted(str((p.pos_x, p.pos_y, p.side, type(p))) for p in B[1])
+
+def test_is_piece_at1(): # same occupancy as the object board
+    B = read_board("board_examp.txt")
+    BB = BitBoard.from_board(B)
+    for x in range(0, 7):
+        for y in range(0, 7):
+            assert BB.is_piece_at(x, y) == is_piece_at(x, y, B)
+
+# bishop_attacks tests:
+def test_bishop_attacks1(): # an empty board: the whole diagonal cross
+    assert bin(bishop_attacks(square_index(3, 3, 5), 0, 5)).count("1") == 8
+
+def test_bishop_attacks2(): # rays stop at (and include) the first blocker
+    blocker = 1 << square_index(4, 4, 5)
+    attacks = bishop_attacks(square_index(3, 3, 5), blocker, 5)
+    assert attacks & blocker
+    assert not attacks & (1 << square_index(5, 5, 5))
+
+# is_check tests:
+def test_is_check1(): # same boards as the object tests
+    B4 = (5, [King(2,3,False), Bishop(2,5,True), Bishop(3,1,True), Bishop(3,3,False), King(3,5,True), Bishop(5,3, False)])
+    assert BitBoard.from_board(B4).is_check(True) == True
+    B5 = (6, [King(2,3,False), Bishop(2,5,True), Bishop(3,1,True), Bishop(3,3,False), King(3,5,True), Bishop(5,6,True)])
+    assert BitBoard.from_board(B5).is_check(False) == True
+
+def test_is_check2(): # no check for either side
+    BB = BitBoard.from_board((5, [King(3,5,True), King(2,3,False), Bishop(2,5,True)]))
+    assert BB.is_check(True) == False
+    assert BB.is_check(False) == False
+
+# can_move_to tests:
+def test_can_move_to1(): # a pinned bishop may only capture its pinner
+    BB = BitBoard.from_board((5, [King(3,5,True), Bishop(4,4,True), Bishop(5,3,False), King(2,3,False)]))
+    assert BB.can_move_to(4, 4, 5, 5) == False
+    assert BB.can_move_to(4, 4, 5, 3) == True
+
+def test_can_move_to2(): # a king may not step next to the enemy king
+    BB = BitBoard.from_board((5, [King(1, 1, True), King(3, 3, False)]))
+    assert BB.can_move_to(1, 1, 2, 2) == False
+    assert BB.can_move_to(1, 1, 1, 2) == True
+
+# cross-check against the object-based functions on random positions:
+def test_cross_check():
+    rng = random.Random(2024)
+    for _ in range(40):
+        S = rng.randint(3, 7)
+        B = random_board(rng, S, rng.randint(0, min(5, S * S - 2)))
+        BB = BitBoard.from_board(B)
+        for side in (True, False):
+            assert BB.is_check(side) == is_check(side, B)
+        for piece in B[1]:
+            for x in range(0, S + 2):
+                for y in range(0, S + 2):
+                    if (x, y) == (piece.pos_x, piece.pos_y):
+                        continue
+                    assert BB.can_reach(piece.pos_x, piece.pos_y, x, y) == piece.can_reach(x, y, B)
+                    assert BB.can_move_to(piece.pos_x, piece.pos_y, x, y) == piece.can_move_to(x, y, B)
+
+# legal_moves tests:
+def test_legal_moves(): # the same moves as generate_legal_moves
+    rng = random.Random(2025)
+    for _ in range(40):
+        S = rng.randint(3, 8)
+        B = random_board(rng, S, rng.randint(0, min(8, S * S - 2)))
+        BB = BitBoard.from_board(B)
+        for side in (True, False):
+            moves = {(square_xy(from_sq, S), square_xy(to_sq, S)) for from_sq, to_sq in BB.legal_moves(side)}
+            assert moves == {((p.pos_x, p.pos_y), (x, y)) for p, x, y in generate_legal_moves(side, B)}
@@ -0,0 +1,198 @@
+import argparse
+import sqlite3
+import sys
+
+import chess_puzzle
+from chess_puzzle import Board, Piece, as_indexed, generate_legal_moves, read_board, zobrist_hash, logger
+from chess_engine import search, DEFAULT_DEPTH, DEFAULT_TIME_LIMIT, MATE_BOUND
+from chess_batch import find_board_files
+
+# Persistent analysis cache: search results kept in an SQLite database between runs, so a
+# position that comes back (the same puzzle in another session, or a board file analysed
+# again) costs one lookup instead of a search. Results are keyed by the Zobrist hash of the
+# position (which includes the side to move) and the board size, and hold the best move, its
+# score, the depth searched and the nodes it took.
+#
+# The database runs in WAL mode so readers in other processes are not blocked by a writer.
+# New results and the "last used" stamps of cache hits are written in batches, and when a
+# batch takes the cache over max_entries the least recently used results are evicted.
+
+DEFAULT_MAX_ENTRIES = 1_000_000
+DEFAULT_BATCH_SIZE = 64
+
+Move = tuple[int, int, int, int] # (from x, from y, to x, to y)
+CachedResult = tuple[Move, int, int, int] # (best move, score, depth, nodes)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    hash INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    from_x INTEGER NOT NULL,
+    from_y INTEGER NOT NULL,
+    to_x INTEGER NOT NULL,
+    to_y INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    nodes INTEGER NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (hash, size)
+);
+CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis (last_used);
+"""
+
+# A deeper result replaces a shallower one, never the other way round.
+UPSERT = """
+INSERT INTO analysis VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (hash, size) DO UPDATE SET
+    from_x = excluded.from_x, from_y = excluded.from_y, to_x = excluded.to_x, to_y = excluded.to_y,
+    score = excluded.score, depth = excluded.depth, nodes = excluded.nodes, last_used = excluded.last_used
+WHERE excluded.depth >= analysis.depth
+"""
+
+def signed(key: int) -> int:
+    # SQLite integers are signed 64-bit; Zobrist hashes are unsigned.
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+def is_sufficient(score: int, searched: int, depth: int) -> bool:
+    # A result searched at least depth plies deep answers a search of depth; so does a
+    # forced mate, which the search stops deepening once it is found.
+    return searched >= depth or abs(score) > MATE_BOUND
+
+class AnalysisCache:
+    def __init__(self, filename: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.filename = filename
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        # Use stamps count up, so the smallest last_used is the least recently used result.
+        self.clock = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM analysis").fetchone()[0]
+        self.pending = {} # (hash, size) -> row to write
+        self.touched = {} # (hash, size) -> last_used of a cache hit to write
+        self.hits = 0
+        self.misses = 0
+
+    def tick(self) -> int:
+        self.clock += 1
+        return self.clock
+
+    def key(self, B: Board, side_to_move: bool) -> tuple[int, int]:
+        return signed(zobrist_hash(B, side_to_move)), B[0]
+
+    def lookup(self, B: Board, side_to_move: bool, depth: int = 0) -> CachedResult:
+        # The stored result for B with side_to_move if it is deep enough for depth, or None.
+        key = self.key(B, side_to_move)
+        row = self.pending.get(key)
+        if row is None:
+            row = self.connection.execute("SELECT * FROM analysis WHERE hash = ? AND size = ?", key).fetchone()
+        if row is None or not is_sufficient(row[6], row[7], depth):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched[key] = self.tick()
+        if len(self.touched) >= self.batch_size:
+            self.flush()
+        return tuple(row[2:6]), row[6], row[7], row[8]
+
+    def store(self, B: Board, side_to_move: bool, result: CachedResult) -> None:
+        # Queue a search result; it is written with the next batch.
+        key = self.key(B, side_to_move)
+        move, score, depth, nodes = result
+        previous = self.pending.get(key)
+        if previous is not None and previous[7] > depth:
+            return
+        self.pending[key] = (*key, *move, score, depth, nodes, self.tick())
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        # Write the queued results and use stamps in one transaction, then evict the least
+        # recently used results beyond max_entries.
+        if not self.pending and not self.touched:
+            return
+        with self.connection:
+            self.connection.executemany(UPSERT, self.pending.values())
+            self.connection.executemany("UPDATE analysis SET last_used = ? WHERE hash = ? AND size = ?",
+                                        [(stamp, *key) for key, stamp in self.touched.items()])
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self.connection.execute("DELETE FROM analysis WHERE rowid IN "
+                                        "(SELECT rowid FROM analysis ORDER BY last_used LIMIT ?)", (excess,))
+                if chess_puzzle.DEBUG:
+                    logger.debug(f"Analysis cache {self.filename}: {excess} least recently used results evicted.")
+        self.pending.clear()
+        self.touched.clear()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> "AnalysisCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def cached_move(cache: AnalysisCache, B: Board, side: bool, depth: int) -> tuple[Piece, int, int]:
+    # The cached best move for side as a (piece, x, y) of B, or None. The move is checked
+    # against the legal moves, so a hash collision can never play an impossible move.
+    result = cache.lookup(B, side, depth)
+    if result is None:
+        return None
+    from_x, from_y, x, y = result[0]
+    for piece, to_x, to_y in generate_legal_moves(side, as_indexed(B, side)):
+        if (piece.pos_x, piece.pos_y, to_x, to_y) == (from_x, from_y, x, y):
+            return piece, x, y
+    return None
+
+def warm_up(cache: AnalysisCache, path: str, depth: int = DEFAULT_DEPTH, time_limit: float = DEFAULT_TIME_LIMIT) -> int:
+    # Search Black's move in every board file of a directory (or glob) that is not already
+    # cached deep enough, for at most time_limit seconds each (None for no limit). Returns
+    # the number of boards searched.
+    searched = 0
+    for filename in find_board_files(path):
+        try:
+            B = read_board(filename)
+        except IOError:
+            logger.warning(f"{filename} is not a valid board file; skipped.")
+            continue
+        if cache.lookup(B, False, depth) is not None:
+            continue
+        result = search(B, False, depth, time_limit)
+        searched += 1
+        if result is not None:
+            (piece, x, y), score, completed, nodes = result
+            cache.store(B, False, ((piece.pos_x, piece.pos_y, x, y), score, completed, nodes))
+    cache.flush()
+    return searched
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the persistent analysis cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm = commands.add_parser("warm", help="search every board file of a directory into the cache")
+    warm.add_argument("path", help="directory of .txt board files, or a glob pattern")
+    warm.add_argument("-d", "--depth", type=int, default=DEFAULT_DEPTH, help="engine search depth")
+    warm.add_argument("-t", "--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="engine seconds per board")
+    warm.add_argument("--no-time-limit", action="store_true", help="search every board to the full depth")
+    info = commands.add_parser("info", help="show how many results the cache holds")
+    for command in (warm, info):
+        command.add_argument("--db", default="analysis.db", help="cache database file")
+        command.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES, help="size cap of the cache")
+    args = parser.parse_args(argv)
+
+    with AnalysisCache(args.db, args.max_entries) as cache:
+        if args.command == "warm":
+            time_limit = None if args.no_time_limit else args.time_limit
+            searched = warm_up(cache, args.path, args.depth, time_limit)
+            print(f"{searched} boards searched; the cache holds {len(cache)} results.")
+        else:
+            print(f"{args.db} holds {len(cache)} results.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
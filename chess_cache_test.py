@@ -0,0 +1,127 @@
+import shutil
+import sqlite3
+
+import pytest
+from chess_puzzle import *
+from chess_cache import *
+from chess_engine import MATE
+
+def examp_move(): # the engine's move and result for board_examp.txt at depth 2
+    B = read_board("board_examp.txt")
+    (piece, x, y), score, depth, nodes = search(B, False, 2)
+    return B, ((piece.pos_x, piece.pos_y, x, y), score, depth, nodes)
+
+# cache tests:
+def test_cache1(tmp_path): # a stored result is found again, also from a new connection
+    B, result = examp_move()
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.lookup(B, False) is None
+        cache.store(B, False, result)
+        assert cache.lookup(B, False) == result # still waiting in the batch
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.lookup(B, False, 2) == result
+        assert len(cache) == 1
+
+def test_cache2(tmp_path): # results are keyed by the side to move and the board size
+    B, result = examp_move()
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        cache.store(B, False, result)
+        assert cache.lookup(B, True) is None
+        assert cache.lookup((6, B[1]), False) is None
+
+def test_cache3(tmp_path): # a result too shallow for the depth asked is a miss, unless it is a mate
+    B, result = examp_move()
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        cache.store(B, False, result)
+        assert cache.lookup(B, False, 3) is None
+        assert (cache.hits, cache.misses) == (0, 1)
+        mate = (result[0], MATE - 3, 3, 10)
+        cache.store(B, False, mate)
+        assert cache.lookup(B, False, 6) == mate
+
+def test_cache4(tmp_path): # a deeper result is never replaced by a shallower one
+    B, result = examp_move()
+    deeper = (result[0], result[1], 5, result[3])
+    with AnalysisCache(str(tmp_path / "cache.db"), batch_size=1) as cache:
+        cache.store(B, False, deeper)
+        cache.store(B, False, result)
+        assert cache.lookup(B, False) == deeper
+
+def test_cache5(tmp_path): # the database is in WAL mode and written in batches
+    B, result = examp_move()
+    filename = str(tmp_path / "cache.db")
+    cache = AnalysisCache(filename, batch_size=2)
+    assert cache.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    cache.store(B, False, result)
+    reader = sqlite3.connect(filename)
+    assert reader.execute("SELECT COUNT(*) FROM analysis").fetchone()[0] == 0
+    cache.store(B, True, result)
+    assert reader.execute("SELECT COUNT(*) FROM analysis").fetchone()[0] == 2
+    reader.close()
+    cache.close()
+
+def test_cache6(tmp_path): # over the size cap the least recently used results are evicted
+    boards = [(5, [King(1, 1, True), King(5, 5, False), Bishop(x, 3, False)]) for x in range(1, 6)]
+    with AnalysisCache(str(tmp_path / "cache.db"), max_entries=3, batch_size=1) as cache:
+        for B in boards[:3]:
+            cache.store(B, False, ((5, 5, 4, 4), 0, 1, 1))
+        assert cache.lookup(boards[0], False) is not None # boards[1] is now the least recently used
+        cache.flush()
+        cache.store(boards[3], False, ((5, 5, 4, 4), 0, 1, 1))
+        assert len(cache) == 3
+        assert cache.lookup(boards[1], False) is None
+        assert all(cache.lookup(B, False) is not None for B in (boards[0], boards[2], boards[3]))
+
+# find_black_move tests:
+def test_find_black_move_cache1(tmp_path): # the first call searches and stores, the second plays the cached move
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        B = read_board("board_examp.txt")
+        piece, x, y = find_black_move(B, depth=2, cache=cache)
+        assert cache.lookup(B, False, 2)[0] == (piece.pos_x, piece.pos_y, x, y)
+        cached = find_black_move(B, depth=2, cache=cache)
+        assert cached == (piece, x, y) and cache.hits == 2
+
+def test_find_black_move_cache2(tmp_path, monkeypatch): # a cache hit does not search
+    B, result = examp_move()
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        cache.store(B, False, result)
+        monkeypatch.setattr("chess_engine.search", None)
+        piece, x, y = find_black_move(B, depth=2, cache=cache)
+        assert (piece.pos_x, piece.pos_y, x, y) == result[0]
+        assert piece in B[1]
+
+def test_find_black_move_cache3(tmp_path): # a cached move that is not legal (a hash collision) is ignored
+    B, result = examp_move()
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        cache.store(B, False, ((1, 1, 5, 5), 0, 9, 1))
+        assert cached_move(cache, B, False, 2) is None
+        piece, x, y = find_black_move(B, depth=2, cache=cache)
+        assert (piece.pos_x, piece.pos_y, x, y) == result[0]
+
+# warm-up tests:
+def test_warm_up(tmp_path): # every board of a directory is searched once; bad files are skipped
+    shutil.copy("board_examp.txt", tmp_path / "examp.txt")
+    (tmp_path / "mate.txt").write_text("5\nKa1, Bb3\nKc2, Bc3, Be3\n")
+    (tmp_path / "broken.txt").write_text("not a board\n")
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        assert warm_up(cache, str(tmp_path), depth=2) == 2
+        assert len(cache) == 2
+        assert warm_up(cache, str(tmp_path), depth=2) == 0
+        assert cache.lookup(read_board(str(tmp_path / "examp.txt")), False, 2) is not None
+
+def test_warm_up_time_limit(tmp_path, monkeypatch): # each board is searched for at most the default time unless asked otherwise
+    shutil.copy("board_examp.txt", tmp_path / "examp.txt")
+    limits = []
+    monkeypatch.setattr("chess_cache.search", lambda B, side, depth, time_limit: limits.append(time_limit))
+    with AnalysisCache(str(tmp_path / "cache.db")) as cache:
+        warm_up(cache, str(tmp_path))
+        warm_up(cache, str(tmp_path), time_limit=None)
+    assert limits == [DEFAULT_TIME_LIMIT, None]
+
+def test_main(tmp_path, capsys): # the warm command fills the cache and info reports its size
+    shutil.copy("board_examp.txt", tmp_path / "examp.txt")
+    db = str(tmp_path / "cache.db")
+    assert main(["warm", str(tmp_path), "--db", db, "-d", "2"]) == 0
+    assert "1 boards searched" in capsys.readouterr().out
+    assert main(["info", "--db", db]) == 0
+    assert "holds 1 results" in capsys.readouterr().out
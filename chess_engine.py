@@ -0,0 +1,639 @@
+import atexit
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import chess_puzzle
+import chess_tablebase
+from chess_geometry import geometry
+from chess_puzzle import (Board, Piece, Bishop, King, IndexedBoard, as_indexed, generate_legal_moves, generate_captures,
+                          is_check, make_move, unmake_move, piece_at, logger)
+
+# Search engine for the Black side: negamax with alpha-beta pruning and iterative deepening.
+# Positions are identified by the Zobrist hash that an IndexedBoard keeps up to date
+# (see zobrist_hash in chess_puzzle), and the search plays moves with make_move/unmake_move.
+
+DEFAULT_DEPTH = 4
+DEFAULT_TIME_LIMIT = 1.0 # Seconds per move.
+
+# Evaluation weights, in hundredths of a bishop.
+BISHOP_VALUE = 100
+MOBILITY_WEIGHT = 2 # Per square a bishop attacks.
+KING_DANGER_WEIGHT = 8 # Per square next to the king that the enemy attacks.
+KING_FREEDOM_WEIGHT = 2 # Per square next to the king the king could step to.
+BISHOP_PAIR_BONUS = 20 # For bishops on both colours: a bishop keeps to one, together they reach every square.
+
+# Piece values for ordering captures (most valuable victim, least valuable attacker). A king
+# can never legally be taken, so a capture of it outranks everything.
+ORDER_VALUES = {Bishop: 1, King: 100}
+KILLERS_PER_PLY = 2
+
+# Quiescence search: a capture is skipped when even the material its exchange wins would
+# leave the score this far below alpha, and no more than QUIESCENCE_DEPTH plies of captures
+# are searched beyond the main search before the static score is taken.
+DELTA_MARGIN = 50
+QUIESCENCE_DEPTH = 3
+
+MATE = 100000 # Score of giving checkmate now; mates further away score less.
+MATE_BOUND = MATE - 1000 # Scores above this are mate scores.
+INFINITY = MATE + 1
+
+# Bound types of a transposition table score.
+EXACT = 0
+LOWER = 1 # The real score is at least the stored one (the search failed high).
+UPPER = 2 # The real score is at most the stored one (the search failed low).
+
+Move = tuple[int, int, int, int] # (from x, from y, to x, to y)
+
+def pack_move(move: Move) -> int:
+    # Coordinates are 1..26, so each fits in 5 bits; 0 is never a packed move.
+    from_x, from_y, to_x, to_y = move
+    return ((from_x << 5 | from_y) << 5 | to_x) << 5 | to_y
+
+def unpack_move(packed: int) -> Move:
+    return (packed >> 15 & 31, packed >> 10 & 31, packed >> 5 & 31, packed & 31)
+
+class TranspositionTable:
+    # Fixed-size hash table of search results, stored in parallel preallocated arrays
+    # rather than as Python objects. Each bucket has two slots: the first keeps the entry
+    # searched to the greatest depth, the second is always replaced, so deep results survive
+    # while recent shallow ones still find a place.
+    ENTRY_BYTES = 8 + 4 + 1 + 1 + 4 # key, score, depth, bound, move
+
+    def __init__(self, size_mb: float = 16):
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        self.clear()
+
+    def clear(self) -> None:
+        slots = 2 * self.buckets
+        self.keys = array('Q', bytes(8 * slots))
+        self.scores = array('i', bytes(4 * slots))
+        self.depths = array('b', [-1]) * slots # -1 marks an empty slot.
+        self.bounds = array('B', bytes(slots))
+        self.moves = array('I', bytes(4 * slots))
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0 # Probes that found the bucket filled by other positions.
+        self.stores = 0
+
+    def probe(self, key: int) -> tuple[int, int, int, Move]:
+        # Return (depth, score, bound, best move or None) stored for key, or None.
+        slot = 2 * (key % self.buckets)
+        for i in (slot, slot + 1):
+            if self.depths[i] >= 0 and self.keys[i] == key:
+                self.hits += 1
+                packed = self.moves[i]
+                return (self.depths[i], self.scores[i], self.bounds[i], unpack_move(packed) if packed else None)
+        self.misses += 1
+        if self.depths[slot] >= 0 or self.depths[slot + 1] >= 0:
+            self.collisions += 1
+        return None
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: Move = None) -> None:
+        slot = 2 * (key % self.buckets)
+        # Depth-preferred slot: taken by the same position or by a deeper (or equal) search.
+        if not (self.keys[slot] == key or depth >= self.depths[slot]):
+            slot += 1 # Always-replace slot.
+        self.keys[slot] = key
+        self.scores[slot] = score
+        self.depths[slot] = min(depth, 127)
+        self.bounds[slot] = bound
+        self.moves[slot] = pack_move(move) if move else 0
+        self.stores += 1
+
+    def usage(self) -> float:
+        # Fraction of the slots in use.
+        return sum(1 for depth in self.depths if depth >= 0) / len(self.depths)
+
+    def stats(self) -> dict[str, float]:
+        probes = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'collisions': self.collisions,
+                'stores': self.stores, 'hit_rate': self.hits / probes if probes else 0.0,
+                'usage': self.usage(), 'size_mb': len(self.depths) * self.ENTRY_BYTES / (1024 * 1024)}
+
+# A move as the rest of the program uses it: (piece, x, y).
+PieceMove = tuple[Piece, int, int]
+
+# Result of search: (best move, its score for the side to move, depth completed, nodes searched
+# including the quiescence search).
+SearchResult = tuple[PieceMove, int, int, int]
+
+class SearchTimeout(Exception):
+    pass
+
+def evaluate(B: IndexedBoard, side: bool) -> int:
+    # Static score of the position for side, read from the attack map of the board:
+    # material, bishop mobility (squares attacked), the bishop pair and king safety
+    # (attacked squares around the king and squares it can still step to).
+    score = 0
+    light = geometry(B[0]).light
+    colours = ({}, {}) # [side] -> the square colours its bishops stand on
+    for piece in B[1]:
+        if isinstance(piece, Bishop):
+            value = BISHOP_VALUE + MOBILITY_WEIGHT * len(B.attacks[piece])
+            score += value if piece.side else -value
+            colours[piece.side][light[(piece.pos_x, piece.pos_y)]] = True
+    for pair_side in (True, False):
+        if len(colours[pair_side]) == 2:
+            score += BISHOP_PAIR_BONUS if pair_side else -BISHOP_PAIR_BONUS
+
+    for king_side, king in B.kings.items():
+        danger = freedom = 0
+        for x, y in B.attacks[king]:
+            if B.is_attacked(x, y, not king_side):
+                danger += 1
+            elif piece_at(x, y, B) is None:
+                freedom += 1
+        safety = KING_FREEDOM_WEIGHT * freedom - KING_DANGER_WEIGHT * danger
+        score += safety if king_side else -safety
+
+    return score if side else -score
+
+def score_to_tt(score: int, ply: int) -> int:
+    # Mate scores are stored relative to the stored position rather than to the root.
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+def tablebase_score(B: Board, side: bool, ply: int) -> int:
+    # Exact score of a position a loaded endgame tablebase covers, in the search's mate
+    # scores, or None when there is no table for it.
+    result = chess_tablebase.probe(B, side)
+    if result is None:
+        return None
+    outcome, distance = result
+    if outcome == chess_tablebase.WIN:
+        return MATE - (ply + distance)
+    if outcome == chess_tablebase.LOSS:
+        return -(MATE - (ply + distance))
+    return 0
+
+def order_value(piece: Piece) -> int:
+    # By isinstance rather than type(piece), so subclasses such as the packed board views count.
+    return ORDER_VALUES[King] if isinstance(piece, King) else ORDER_VALUES[Bishop]
+
+def move_key(move: PieceMove) -> Move:
+    piece, x, y = move
+    return (piece.pos_x, piece.pos_y, x, y)
+
+def gives_check(piece: Piece, pos_X: int, pos_Y: int, B: IndexedBoard) -> bool:
+    # Whether moving piece to (pos_X, pos_Y) checks the enemy king, worked out from the board
+    # without playing the move: a bishop checking from its new square, or a bishop of the same
+    # side behind the moving piece whose diagonal to the king it opens.
+    king = B.kings.get(not piece.side)
+    if king is None:
+        return False
+    origin = (piece.pos_x, piece.pos_y)
+    target = (king.pos_x, king.pos_y)
+    between = geometry(B[0]).between
+
+    def clear_to_king(square):
+        # Whether square sees the king along a diagonal; the origin counts as empty, the
+        # destination as taken.
+        path = between.get((square, target))
+        return path is not None and all(
+            sq != (pos_X, pos_Y) and (sq == origin or sq not in B.squares) for sq in path)
+
+    if isinstance(piece, Bishop) and clear_to_king((pos_X, pos_Y)):
+        return True
+
+    for slider in B.attackers.get(origin, ()):
+        if slider.side != piece.side or not isinstance(slider, Bishop):
+            continue
+        square = (slider.pos_x, slider.pos_y)
+        # The king must lie further along the same diagonal, beyond the moving piece.
+        if origin in between.get((square, target), ()) and clear_to_king(square):
+            return True
+    return False
+
+def exchange_gain(piece: Piece, pos_X: int, pos_Y: int, B: IndexedBoard) -> int:
+    # Static exchange evaluation: the material piece's side wins by taking on (pos_X, pos_Y)
+    # when both sides then recapture there with their least valuable piece, each free to
+    # stop when going on would lose. A bishop behind another on a diagonal joins in once the
+    # one in front has gone. A king is worth MATE, so it only takes a piece no one can
+    # take back. Pins are not looked at.
+    target = (pos_X, pos_Y)
+    geo = geometry(B[0])
+    neighbours = geo.neighbour_sets[target]
+    lines = [] # The pieces on each diagonal from the square outwards, nearest first.
+    for ray in geo.rays[target]:
+        line = []
+        for square in ray:
+            other = B.squares.get(square)
+            if other is None:
+                continue
+            if isinstance(other, King) and square not in neighbours:
+                break # A king further away cannot take, and shields what lies behind it.
+            line.append(other)
+        lines.append(line)
+    lines.append([king for king in B.kings.values() if (king.pos_x, king.pos_y) in neighbours
+                  and (king.pos_x == pos_X or king.pos_y == pos_Y)]) # Kings next to the square, not on a diagonal.
+
+    def value(p):
+        return MATE if isinstance(p, King) else BISHOP_VALUE
+
+    def take(p):
+        for line in lines:
+            if p in line:
+                line.remove(p)
+                return
+
+    take(piece)
+    gains = [value(B.squares[target])]
+    on_square = value(piece)
+    side = not piece.side
+    while True:
+        attackers = [line[0] for line in lines[:4] if line and line[0].side == side]
+        attackers += [king for king in lines[4] if king.side == side]
+        if not attackers:
+            break
+        attacker = min(attackers, key=value)
+        gains.append(on_square - gains[-1])
+        on_square = value(attacker)
+        take(attacker)
+        side = not side
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
+
+class Engine:
+    # One search at a time; the transposition table is kept between searches, and so is the
+    # history table while the board size stays the same, so one engine can play every move
+    # of a game. The killer moves and cutoff statistics are reset by each search.
+    def __init__(self, tt: TranspositionTable = None, quiescence_checks: bool = False):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.quiescence_checks = quiescence_checks # Also try checking moves at the first quiescence ply.
+        self.nodes = 0
+        self.qnodes = 0 # Nodes of the quiescence search, counted apart from self.nodes.
+        self.deadline = None
+        self.history = []
+        self.root_best = None
+        self.reset_ordering(3)
+
+    def reset_ordering(self, S: int) -> None:
+        self.killers = [] # ply -> up to KILLERS_PER_PLY quiet moves that caused a cutoff
+        if self.history and len(self.history[0]) == S * S:
+            # The next search on the same board: the scores are halved, so the moves that
+            # did well in the new position soon count for more than the old ones.
+            self.history = [[score // 2 for score in scores] for scores in self.history]
+        else:
+            self.history = [[0] * (S * S) for _ in range(4)] # [piece kind][destination square] -> score
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0 # Cutoffs by the first move tried: the ordering was right.
+        self.iteration_nodes = [] # Nodes searched by each iteration of iterative deepening.
+        self.iteration_results = [] # (best move, score) of each completed iteration.
+
+    def history_slot(self, move: PieceMove, S: int) -> tuple[int, int]:
+        # Same piece kinds and square numbering as the Zobrist keys.
+        piece, x, y = move
+        return 2 * isinstance(piece, King) + piece.side, (y - 1) * S + (x - 1)
+
+    def order_moves(self, moves: list[PieceMove], B: IndexedBoard, tt_move: Move, ply: int = 0) -> list[PieceMove]:
+        # In stages: the transposition table move, captures by most valuable victim and then
+        # least valuable attacker, checking moves, the killer moves of this ply, and the
+        # remaining quiet moves by their history score.
+        killers = self.killers[ply] if ply < len(self.killers) else []
+        S = B[0]
+
+        def rank(move):
+            key = move_key(move)
+            if key == tt_move:
+                return (0, 0)
+            victim = B.squares.get((move[1], move[2]))
+            if victim is not None:
+                return (1, -10 * order_value(victim) + order_value(move[0]))
+            if gives_check(*move, B):
+                return (2, 0)
+            if key in killers:
+                return (3, killers.index(key))
+            kind, square = self.history_slot(move, S)
+            return (4, -self.history[kind][square])
+        return sorted(moves, key=rank)
+
+    def record_cutoff(self, move: PieceMove, B: IndexedBoard, depth: int, ply: int, index: int) -> None:
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if (move[1], move[2]) in B.squares:
+            return # Captures are ordered by MVV-LVA already.
+        key = move_key(move)
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if key not in killers:
+            killers.insert(0, key)
+            del killers[KILLERS_PER_PLY:]
+        kind, square = self.history_slot(move, B[0])
+        self.history[kind][square] += depth * depth
+
+    def stats(self) -> dict[str, float]:
+        # Cutoff statistics of the last search. The effective branching factor is the growth
+        # in nodes from one iteration to the next; better ordering makes it smaller.
+        nodes = self.iteration_nodes
+        factors = [b / a for a, b in zip(nodes, nodes[1:]) if a]
+        total = self.nodes + self.qnodes
+        return {'nodes': self.nodes, 'qnodes': self.qnodes, 'quiescence_share': self.qnodes / total if total else 0.0,
+                'cutoffs': self.cutoffs, 'first_move_cutoffs': self.first_move_cutoffs,
+                'first_move_rate': self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+                'iteration_nodes': list(nodes),
+                'branching_factor': factors[-1] if factors else 0.0}
+
+    def check_time(self) -> None:
+        if self.deadline is not None and (self.nodes + self.qnodes) & 255 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+    def quiesce(self, B: IndexedBoard, alpha: int, beta: int, ply: int, qply: int = 0) -> int:
+        # Search captures only (and checks at the first ply when quiescence_checks is set)
+        # until the position is quiet, so the static evaluation is not taken in the middle of
+        # a bishop trade. The side to move may "stand pat" on the static score instead of
+        # capturing, except in check, where every evasion is searched. Captures are tried by
+        # their exchange gain, and those that lose material are not tried at all.
+        self.qnodes += 1
+        self.check_time()
+        side = B.side_to_move
+        if side not in B.kings:
+            return -(MATE - ply)
+        if len(B[1]) <= chess_tablebase.MAX_PIECES:
+            score = tablebase_score(B, side, ply)
+            if score is not None:
+                return score
+
+        if is_check(side, B):
+            moves = list(generate_legal_moves(side, B))
+            if not moves:
+                return -(MATE - ply)
+            best_score = -INFINITY
+            moves = self.order_moves(moves, B, None, ply)
+        else:
+            best_score = evaluate(B, side) # Stand pat.
+            if best_score >= beta or qply >= QUIESCENCE_DEPTH:
+                return best_score
+            alpha = max(alpha, best_score)
+            ranked = []
+            for move in self.order_moves(list(generate_captures(side, B)), B, None, ply):
+                gain = exchange_gain(*move, B)
+                if gain < 0:
+                    continue # The exchange loses material.
+                if best_score + gain + DELTA_MARGIN < alpha:
+                    continue # Delta pruning: not even what the exchange wins brings the score up to alpha.
+                ranked.append((-gain, len(ranked), move))
+            moves = [move for _, _, move in sorted(ranked)]
+            if self.quiescence_checks and qply == 0:
+                moves += [move for move in generate_legal_moves(side, B)
+                          if (move[1], move[2]) not in B.squares and gives_check(*move, B)]
+
+        for move in moves:
+            undo = make_move(*move, B)
+            try:
+                score = -self.quiesce(B, -beta, -alpha, ply + 1, qply + 1)
+            finally:
+                unmake_move(undo, B)
+            if score > best_score:
+                best_score = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best_score
+
+    def negamax(self, B: IndexedBoard, depth: int, alpha: int, beta: int, ply: int) -> int:
+        if depth <= 0:
+            return self.quiesce(B, alpha, beta, ply)
+        self.nodes += 1
+        self.check_time()
+
+        original_alpha = alpha
+        tt_move = None
+        entry = self.tt.probe(B.hash)
+        if entry is not None:
+            entry_depth, entry_score, bound, tt_move = entry
+            if entry_depth >= depth:
+                score = score_from_tt(entry_score, ply)
+                if bound == EXACT:
+                    return score
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        side = B.side_to_move
+        if side not in B.kings:
+            return -(MATE - ply) # The king was taken, possible only from an illegal start position.
+        if ply and len(B[1]) <= chess_tablebase.MAX_PIECES:
+            score = tablebase_score(B, side, ply) # The root is searched, to pick the move.
+            if score is not None:
+                return score
+
+        moves = list(generate_legal_moves(side, B))
+        if not moves:
+            return -(MATE - ply) if is_check(side, B) else 0 # Checkmate or stalemate.
+
+        best_score = -INFINITY
+        best_move = None
+        for index, move in enumerate(self.order_moves(moves, B, tt_move, ply)):
+            undo = make_move(*move, B)
+            try:
+                score = -self.negamax(B, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                unmake_move(undo, B)
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.record_cutoff(move, B, depth, ply, index)
+                break
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(B.hash, depth, score_to_tt(best_score, ply), bound, move_key(best_move))
+        return best_score
+
+    def search_root(self, B: IndexedBoard, moves: list[PieceMove], depth: int) -> tuple[PieceMove, int]:
+        # The best of moves and its score. root_best follows the best move found so far, for
+        # when the time runs out part way.
+        best_move, best_score = None, -INFINITY
+        alpha = -INFINITY
+        self.root_best = None
+        for move in moves:
+            undo = make_move(*move, B)
+            try:
+                score = -self.negamax(B, depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                unmake_move(undo, B)
+            if score > best_score:
+                best_move, best_score = move, score
+                alpha = max(alpha, score)
+                self.root_best = (move, score)
+        self.tt.store(B.hash, depth, score_to_tt(best_score, 0), EXACT, move_key(best_move))
+        return best_move, best_score
+
+    def search(self, B: Board, side: bool = False, depth: int = DEFAULT_DEPTH,
+               time_limit: float = None, root_moves: list[Move] = None) -> SearchResult:
+        # Iterative deepening from depth 1 up to depth, stopping early when the time limit
+        # (in seconds) runs out; the answer of the deepest completed iteration is returned.
+        # When not even depth 1 completes, the best of the moves it got through is returned
+        # (as depth 0), or else the first move in search order: a capture or a check if any.
+        # root_moves restricts the first move to the given ones (used by parallel_search to
+        # split the root between processes); the result is then the best of those moves.
+        B = as_indexed(B, side)
+        switched = B.side_to_move != side
+        if switched:
+            B.switch_side()
+        self.nodes = self.qnodes = 0
+        self.reset_ordering(B[0])
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        try:
+            moves = list(generate_legal_moves(side, B))
+            if root_moves is not None:
+                moves = [move for move in moves if move_key(move) in root_moves]
+            if not moves:
+                return None
+
+            entry = self.tt.probe(B.hash)
+            moves = self.order_moves(moves, B, entry[3] if entry else None)
+            result = (moves[0], evaluate(B, side), 0, 0)
+            for current_depth in range(1, depth + 1):
+                try:
+                    best_move, best_score = self.search_root(B, moves, current_depth)
+                except SearchTimeout:
+                    if current_depth == 1 and self.root_best is not None:
+                        result = self.root_best + (0, self.nodes + self.qnodes)
+                    break
+                result = (best_move, best_score, current_depth, self.nodes + self.qnodes)
+                self.iteration_nodes.append(self.nodes - sum(self.iteration_nodes))
+                self.iteration_results.append((move_key(best_move), best_score))
+                if chess_puzzle.DEBUG:
+                    logger.debug(f"Depth {current_depth}: best move {move_key(best_move)}, score {best_score}, "
+                                 f"{self.nodes} nodes + {self.qnodes} quiescence nodes, {self.cutoffs} cutoffs "
+                                 f"({self.first_move_cutoffs} by the first move).")
+                if abs(best_score) > MATE_BOUND:
+                    break # A forced mate was found; searching deeper will not change the move.
+                moves = self.order_moves(moves, B, move_key(best_move))
+            return result
+        finally:
+            if switched:
+                B.switch_side()
+
+def search(B: Board, side: bool = False, depth: int = DEFAULT_DEPTH, time_limit: float = None,
+           tt: TranspositionTable = None, quiescence_checks: bool = False) -> SearchResult:
+    return Engine(tt, quiescence_checks).search(B, side, depth, time_limit)
+
+def encode_position(B: Board, side_to_move: bool = True) -> bytes:
+    # Compact form of a position for sending to worker processes instead of pickled pieces:
+    # the board size and the side to move, then three bytes per piece (its kind as in the
+    # Zobrist keys, x and y), in the order of the piece list.
+    data = bytearray((B[0], side_to_move))
+    for piece in B[1]:
+        data += bytes((2 * isinstance(piece, King) + piece.side, piece.pos_x, piece.pos_y))
+    return bytes(data)
+
+def decode_position(data: bytes) -> IndexedBoard:
+    pieces = []
+    for i in range(2, len(data), 3):
+        kind, x, y = data[i:i + 3]
+        piece_type = King if kind & 2 else Bishop
+        pieces.append(piece_type(x, y, bool(kind & 1)))
+    return IndexedBoard(data[0], pieces, bool(data[1]))
+
+def _search_worker(data: bytes, root_moves: list[Move], depth: int, time_limit: float,
+                   tt_mb: float) -> tuple[list[tuple[Move, int]], int]:
+    # Runs in a worker process: search the position for the best of root_moves and return
+    # the (move, score) of every completed iteration and the nodes searched.
+    B = decode_position(data)
+    engine = Engine(TranspositionTable(tt_mb))
+    engine.search(B, B.side_to_move, depth, time_limit, root_moves)
+    return engine.iteration_results, engine.nodes + engine.qnodes
+
+_pools = {} # Number of workers -> process pool, kept between searches.
+
+def worker_pool(workers: int) -> ProcessPoolExecutor:
+    # The pool of worker processes for parallel_search, started on first use and reused for
+    # every later move, so a game does not pay for starting processes on each search.
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(workers)
+    return _pools[workers]
+
+def shutdown_pools() -> None:
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+atexit.register(shutdown_pools)
+
+def combine_answers(iterations: list[list[tuple[Move, int]]], order: list[Move], depth: int) -> tuple[Move, int, int]:
+    # The best (move, score, depth) from the iteration results of each worker, or None when
+    # no worker finished an iteration. Answers are compared at the deepest depth every worker
+    # completed; when a worker finished none, the deepest answer of each worker that did is
+    # compared instead, and the depth given is the shallowest of those.
+    iterations = [results + [results[-1]] * (depth - len(results)) # A mate holds at every depth.
+                  if results and abs(results[-1][1]) > MATE_BOUND else results for results in iterations]
+    completed = min(len(results) for results in iterations)
+    if completed:
+        answers = [results[completed - 1] for results in iterations]
+    else:
+        finished = [results for results in iterations if results]
+        if not finished:
+            return None
+        completed = min(len(results) for results in finished)
+        answers = [results[-1] for results in finished]
+    best_move, best_score = max(answers, key=lambda answer: (answer[1], -order.index(answer[0])))
+    return best_move, best_score, completed
+
+def parallel_search(B: Board, side: bool = False, depth: int = DEFAULT_DEPTH, time_limit: float = None,
+                    workers: int = None, seed: int = None, tt_mb: float = 16) -> SearchResult:
+    # Split the legal moves at the root between worker processes (one CPU each by default),
+    # each searching its share with its own transposition table of tt_mb megabytes, and
+    # combine their answers. Each worker returns the exact score of its best move, so the
+    # best of those is the best move overall. Answers are compared at the deepest depth every
+    # worker completed and ties go to the move dealt out first, so with a fixed depth the
+    # result does not depend on which worker finishes first. A seed shuffles the order the
+    # moves are dealt out in, reproducibly.
+    B = as_indexed(B, side)
+    moves = list(generate_legal_moves(side, B))
+    if not moves:
+        return None
+
+    order = [move_key(move) for move in moves]
+    if seed is not None:
+        random.Random(seed).shuffle(order)
+    pool_size = workers or os.cpu_count() or 1
+    pool = worker_pool(pool_size)
+    workers = max(1, min(pool_size, len(order)))
+    shares = [order[i::workers] for i in range(workers)]
+    data = encode_position(B, side)
+    try:
+        futures = [pool.submit(_search_worker, data, share, depth, time_limit, tt_mb) for share in shares]
+        answers = [future.result() for future in futures]
+    except BrokenProcessPool:
+        _pools.pop(pool_size, None) # A worker died; the next search starts a new pool.
+        raise
+
+    nodes = sum(worker_nodes for _, worker_nodes in answers)
+    combined = combine_answers([results for results, _ in answers], order, depth)
+    if combined is None:
+        # No worker finished depth 1 in time: a serial depth 1 search rather than an unsearched move.
+        result = search(B, side, 1)
+        return result[:3] + (nodes + result[3],)
+    best_move, best_score, completed = combined
+    if chess_puzzle.DEBUG:
+        logger.debug(f"Parallel search with {workers} workers: best move {best_move}, score {best_score}, "
+                     f"depth {completed}, {nodes} nodes.")
+    fx, fy, x, y = best_move
+    return (B.squares[(fx, fy)], x, y), best_score, completed, nodes
@@ -0,0 +1,458 @@
+import random
+import time
+
+import pytest
+from chess_puzzle import *
+from chess_engine import *
+from chess_puzzle_test import wk1a, wb4, bk1, bb2, bb3, wb3, wb5
+from chess_perft import REFERENCE_POSITIONS
+
+# move packing tests:
+def test_pack_move1(): # packing round trip on the smallest and the largest board
+    for move in [(1, 1, 2, 2), (26, 26, 25, 25), (1, 26, 26, 1)]:
+        assert unpack_move(pack_move(move)) == move
+
+def test_pack_move2(): # no move packs to 0, which marks "no move" in the table
+    assert pack_move((1, 1, 1, 1)) != 0
+
+# TranspositionTable tests:
+def test_tt_store_probe1(): # a stored entry comes back, other keys miss
+    tt = TranspositionTable(0.01)
+    tt.store(12345, 3, -50, LOWER, (1, 2, 3, 4))
+    assert tt.probe(12345) == (3, -50, LOWER, (1, 2, 3, 4))
+    assert tt.probe(54321) is None
+    assert (tt.hits, tt.misses) == (1, 1)
+
+def test_tt_store_probe2(): # entries without a best move
+    tt = TranspositionTable(0.01)
+    tt.store(7, 0, 10, EXACT)
+    assert tt.probe(7) == (0, 10, EXACT, None)
+
+def test_tt_memory_limit(): # the table size follows the memory limit
+    small, large = TranspositionTable(0.5), TranspositionTable(2)
+    assert abs(large.buckets - 4 * small.buckets) < 4
+    assert small.stats()['size_mb'] <= 0.5
+
+def test_tt_replacement1(): # a shallower search does not evict a deeper one from the same bucket
+    tt = TranspositionTable(0.0001)
+    a, b, c = 5, 5 + tt.buckets, 5 + 2 * tt.buckets # all in bucket 5
+    tt.store(a, 6, 1, EXACT)
+    tt.store(b, 2, 2, EXACT) # goes to the always-replace slot
+    assert tt.probe(a)[0] == 6 and tt.probe(b)[0] == 2
+    tt.store(c, 1, 3, EXACT) # replaces b, not a
+    assert tt.probe(a)[0] == 6 and tt.probe(c)[0] == 1
+    assert tt.probe(b) is None
+    assert tt.collisions == 1
+
+def test_tt_replacement2(): # a deeper search takes over the depth-preferred slot
+    tt = TranspositionTable(0.0001)
+    a, b = 9, 9 + tt.buckets
+    tt.store(a, 2, 1, EXACT)
+    tt.store(b, 4, 2, EXACT)
+    assert tt.probe(b)[0] == 4
+
+def test_tt_clear(): # clearing empties the table and resets the counters
+    tt = TranspositionTable(0.01)
+    tt.store(1, 1, 1, EXACT)
+    tt.probe(1)
+    tt.clear()
+    assert tt.probe(1) is None
+    assert tt.stats()['hits'] == 0 and tt.usage() == 0
+
+def test_tt_board_hash(): # keys are the Zobrist hashes kept by an IndexedBoard
+    B = read_board("board_examp.txt")
+    tt = TranspositionTable(0.01)
+    tt.store(B.hash, 2, 30, UPPER, (3, 5, 3, 4))
+    assert tt.probe(zobrist_hash(B))[1:] == (30, UPPER, (3, 5, 3, 4))
+
+# evaluation tests:
+def test_evaluate1(): # the score of one side is minus the score of the other
+    B = read_board("board_examp.txt")
+    assert evaluate(B, True) == -evaluate(B, False)
+
+def test_evaluate2(): # an extra bishop is worth more than the mobility and king safety terms
+    kings = [King(1, 1, True), King(5, 5, False)]
+    B = as_indexed((5, kings + [Bishop(3, 1, False)]))
+    assert evaluate(B, False) > 0 and evaluate(B, True) < 0
+
+def test_evaluate3(): # attacked squares around a king count against it
+    safe = as_indexed((5, [King(1, 1, True), King(5, 5, False), Bishop(5, 1, False)]))
+    exposed = as_indexed((5, [King(1, 1, True), King(5, 5, False), Bishop(4, 3, False)]))
+    assert evaluate(exposed, True) < evaluate(safe, True) + BISHOP_VALUE
+
+def test_evaluate4(monkeypatch): # bishops on both colours earn the pair bonus, two on one colour do not
+    kings = [King(1, 1, True), King(7, 7, False)]
+    pair = as_indexed((7, kings + [Bishop(3, 1, True), Bishop(4, 1, True)]))
+    same = as_indexed((7, kings + [Bishop(3, 1, True), Bishop(5, 1, True)]))
+    with_bonus = evaluate(pair, True), evaluate(same, True)
+    monkeypatch.setattr("chess_engine.BISHOP_PAIR_BONUS", 0)
+    assert with_bonus == (evaluate(pair, True) + BISHOP_PAIR_BONUS, evaluate(same, True))
+
+# search tests:
+def mate_in_one(): # Black mates with the bishop on e3 going to d4
+    return (5, [King(1, 1, True), King(3, 2, False), Bishop(2, 3, False), Bishop(5, 3, False)])
+
+def minimax(B, depth, ply=0): # plain negamax without pruning or a table, for comparison
+    side = B.side_to_move
+    if depth == 0:
+        return capture_minimax(B, ply)
+    moves = list(generate_legal_moves(side, B))
+    if not moves:
+        return -(MATE - ply) if is_check(side, B) else 0
+    best = -INFINITY
+    for move in moves:
+        undo = make_move(*move, B)
+        best = max(best, -minimax(B, depth - 1, ply + 1))
+        unmake_move(undo, B)
+    return best
+
+def capture_minimax(B, ply): # quiescence search without pruning: every capture, or every evasion in check
+    side = B.side_to_move
+    moves = list(generate_legal_moves(side, B))
+    if is_check(side, B):
+        if not moves:
+            return -(MATE - ply)
+        best = -INFINITY
+    else:
+        best = evaluate(B, side)
+        moves = [move for move in moves if (move[1], move[2]) in B.squares]
+    for move in moves:
+        undo = make_move(*move, B)
+        best = max(best, -capture_minimax(B, ply + 1))
+        unmake_move(undo, B)
+    return best
+
+def test_search_mate_in_one(): # the search finds the mate and scores it as one
+    B = as_indexed(mate_in_one(), False)
+    (piece, x, y), score, depth, nodes = search(B, False, 3)
+    assert (piece.pos_x, piece.pos_y, x, y) == (5, 3, 4, 4)
+    assert score == MATE - 1 and depth == 1 and nodes > 0 # the quiescence search sees the mate at the leaves
+    make_move(piece, x, y, B)
+    assert is_checkmate(True, B) == True
+
+def test_search_capture(): # a bishop left hanging is taken
+    B = (5, [King(1, 5, True), King(5, 1, False), Bishop(3, 3, True), Bishop(1, 1, False)])
+    (piece, x, y), score, depth, nodes = search(B, False, 2)
+    assert (piece.pos_x, piece.pos_y, x, y) == (1, 1, 3, 3)
+    assert score > 0
+
+def test_search_no_moves(): # without legal moves there is nothing to return
+    B = (5, [wk1a, wb4, bk1, bb2, bb3, wb3, wb5])
+    assert search(B, False, 2) is None
+
+def test_search_board_unchanged(): # the search leaves the board, its hash and side to move as they were
+    B = read_board("board_examp.txt")
+    before = [(id(p), p.pos_x, p.pos_y) for p in B[1]]
+    key = B.hash
+    search(B, False, 3)
+    assert [(id(p), p.pos_x, p.pos_y) for p in B[1]] == before
+    assert B.hash == key and B.side_to_move == True
+
+def test_search_minimax(monkeypatch): # alpha-beta with the table gives the same score as plain minimax
+    monkeypatch.setattr("chess_engine.DELTA_MARGIN", INFINITY) # Delta pruning is a guess, turn it off.
+    rng = random.Random(10)
+    for _ in range(15):
+        B = as_indexed(random_board(rng, 5, 4), False)
+        if is_check(True, B):
+            continue # White in check with Black to move cannot happen in a game.
+        result = search(B, False, 2)
+        if result is None:
+            continue
+        assert result[1] == minimax(B, 2)
+
+def test_search_time_limit(): # the time limit stops iterative deepening early
+    B = read_board("board_examp.txt")
+    start = time.perf_counter()
+    (piece, x, y), score, depth, nodes = search(B, False, 60, time_limit=0.2)
+    assert time.perf_counter() - start < 1.0
+    assert 1 <= depth < 60
+    assert piece.side == False and piece.can_move_to(x, y, B)
+
+def test_search_reuses_table(): # a second search of the same position starts from the table
+    B = read_board("board_examp.txt")
+    tt = TranspositionTable(1)
+    first = search(B, False, 3, tt=tt)
+    second = search(B, False, 3, tt=tt)
+    assert second[1] == first[1] and second[3] < first[3]
+
+def test_find_black_move_engine(): # find_black_move plays the engine's move
+    B = mate_in_one()
+    piece, x, y = find_black_move(B, depth=2)
+    assert (piece.pos_x, piece.pos_y, x, y) == (5, 3, 4, 4)
+
+def test_find_black_move_game_engine(): # an engine passed for the game keeps its table and history from move to move
+    B = read_board("board_examp.txt")
+    engine = Engine(TranspositionTable(1))
+    find_black_move(B, depth=3, engine=engine)
+    assert engine.tt.stores > 0 and any(any(scores) for scores in engine.history)
+    find_black_move(B, depth=3, engine=engine)
+    assert engine.tt.hits > 0
+    history = [list(scores) for scores in engine.history]
+    engine.reset_ordering(B[0]) # as the next search does
+    assert engine.history == [[score // 2 for score in scores] for scores in history]
+
+def test_search_out_of_time1(monkeypatch): # out of time before depth 1 searched anything: the first move in search order
+    B = parse_board(next(text for name, text, *_ in REFERENCE_POSITIONS if name == "bishops_26").split("\n"))
+    def out_of_time(self):
+        raise SearchTimeout
+    monkeypatch.setattr(Engine, "check_time", out_of_time)
+    (piece, x, y), score, depth, nodes = search(B, False, 3)
+    assert depth == 0 and piece.side == False
+    assert (x, y) in B.squares # a capture comes first
+
+def test_search_out_of_time2(monkeypatch): # out of time part way through depth 1: the best of the moves searched
+    B = parse_board(next(text for name, text, *_ in REFERENCE_POSITIONS if name == "bishops_26").split("\n"))
+    engine = Engine()
+    def check_time(self):
+        if self.qnodes > 300:
+            raise SearchTimeout
+    monkeypatch.setattr(Engine, "check_time", check_time)
+    result = engine.search(B, False, 3)
+    assert result[2] == 0 and engine.root_best is not None
+    assert result[:2] == engine.root_best
+
+# move ordering tests:
+def test_gives_check1(): # a bishop checks from its new square
+    B = as_indexed((5, [King(1, 1, True), Bishop(3, 1, True), King(3, 5, False)]))
+    bishop = B.squares[(3, 1)]
+    assert gives_check(bishop, 1, 3, B) == True # a3 - b4 - c5
+    assert gives_check(bishop, 2, 2, B) == False
+
+def test_gives_check2(): # moving a piece off a bishop's diagonal to the king is a discovered check
+    B = as_indexed((5, [Bishop(1, 1, True), King(3, 3, True), King(5, 5, False)]))
+    king = B.squares[(3, 3)]
+    assert gives_check(king, 2, 3, B) == True # leaves the diagonal
+    assert gives_check(king, 2, 2, B) == False # stays between the bishop and the black king
+
+def test_gives_check_brute_force(): # agrees with playing the move and calling is_check
+    rng = random.Random(12)
+    for _ in range(30):
+        B = as_indexed(random_board(rng, 6, 6))
+        for side in (True, False):
+            if is_check(not side, B):
+                continue
+            for move in list(generate_legal_moves(side, B)):
+                undo = make_move(*move, B)
+                expected = is_check(not side, B)
+                unmake_move(undo, B)
+                assert gives_check(*move, B) == expected, move_key(move)
+
+def ordering_board(): # White: Ka1, Bc1; Black: Kc5, Bd2
+    return as_indexed((5, [King(1, 1, True), Bishop(3, 1, True), King(3, 5, False), Bishop(4, 2, False)]))
+
+def test_order_moves1(): # the table move, then captures, then checks, then the quiet moves
+    B = ordering_board()
+    engine = Engine()
+    engine.reset_ordering(5)
+    ordered = [move_key(move) for move in engine.order_moves(list(generate_legal_moves(True, B)), B, (1, 1, 2, 1))]
+    assert ordered[:3] == [(1, 1, 2, 1), (3, 1, 4, 2), (3, 1, 1, 3)]
+    assert set(ordered[3:]) == {(3, 1, 2, 2), (1, 1, 1, 2), (1, 1, 2, 2)}
+
+def test_order_moves2(): # a killer move of the ply comes before the other quiet moves
+    B = ordering_board()
+    engine = Engine()
+    engine.reset_ordering(5)
+    engine.record_cutoff((B.squares[(1, 1)], 2, 2), B, 3, 1, 2)
+    moves = list(generate_legal_moves(True, B))
+    assert move_key(engine.order_moves(moves, B, None, 1)[2]) == (1, 1, 2, 2)
+    assert engine.killers[1] == [(1, 1, 2, 2)]
+
+def test_order_moves3(): # quiet moves follow the history table, which other plies fill too
+    B = ordering_board()
+    engine = Engine()
+    engine.reset_ordering(5)
+    engine.record_cutoff((B.squares[(1, 1)], 1, 2), B, 2, 4, 0)
+    engine.record_cutoff((B.squares[(3, 1)], 2, 2), B, 3, 5, 0)
+    ordered = [move_key(move) for move in engine.order_moves(list(generate_legal_moves(True, B)), B, None, 0)]
+    assert ordered[2:] == [(3, 1, 2, 2), (1, 1, 1, 2), (1, 1, 2, 1), (1, 1, 2, 2)]
+
+def test_order_moves4(): # bishop takes bishop before king takes bishop
+    B = as_indexed((5, [King(2, 2, True), Bishop(5, 1, True), Bishop(3, 3, False), King(5, 5, False)]))
+    engine = Engine()
+    engine.reset_ordering(5)
+    ordered = [move_key(move) for move in engine.order_moves(list(generate_legal_moves(True, B)), B, None)]
+    assert ordered[:2] == [(5, 1, 3, 3), (2, 2, 3, 3)]
+
+def test_record_cutoff(): # captures count as cutoffs but are not killers, killers keep the newest two
+    B = ordering_board()
+    engine = Engine()
+    engine.reset_ordering(5)
+    engine.record_cutoff((B.squares[(3, 1)], 4, 2), B, 1, 0, 0)
+    assert engine.killers == [] and engine.cutoffs == 1 and engine.first_move_cutoffs == 1
+    for x, y in [(1, 2), (2, 1), (2, 2)]:
+        engine.record_cutoff((B.squares[(1, 1)], x, y), B, 1, 0, 1)
+    assert engine.killers[0] == [(1, 1, 2, 2), (1, 1, 2, 1)]
+    assert engine.cutoffs == 4 and engine.first_move_cutoffs == 1
+
+def test_search_stats(): # the search reports its cutoffs and the nodes of each iteration
+    engine = Engine()
+    engine.search(read_board("board_examp.txt"), False, 4)
+    stats = engine.stats()
+    assert 0 < stats['first_move_cutoffs'] <= stats['cutoffs']
+    assert len(stats['iteration_nodes']) == 4 and sum(stats['iteration_nodes']) == stats['nodes']
+    assert stats['branching_factor'] == stats['iteration_nodes'][3] / stats['iteration_nodes'][2]
+
+def test_ordering_prunes(): # ordered moves search fewer nodes for the same result
+    B = read_board("board_examp.txt")
+    ordered = Engine()
+    result = ordered.search(B, False, 4)
+    unordered = Engine()
+    unordered.order_moves = lambda moves, B, tt_move, ply=0: moves
+    assert unordered.search(B, False, 4)[1] == result[1]
+    assert ordered.nodes < unordered.nodes
+
+# quiescence search tests:
+def test_exchange_gain1(): # a hanging bishop wins a bishop, a defended one wins nothing
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(4, 3, False)]))
+    assert exchange_gain(B.squares[(2, 1)], 4, 3, B) == BISHOP_VALUE
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(4, 3, False), Bishop(5, 2, False)]))
+    assert exchange_gain(B.squares[(2, 1)], 4, 3, B) == 0
+
+def test_exchange_gain2(): # a bishop lined up behind the first one joins the exchange
+    B = as_indexed((6, [King(6, 1, True), Bishop(1, 1, True), Bishop(2, 2, True), King(1, 6, False),
+                        Bishop(4, 4, False), Bishop(6, 6, False)]))
+    assert exchange_gain(B.squares[(2, 2)], 4, 4, B) == BISHOP_VALUE # Bxd4 Bxd4 Bxd4: two bishops for one
+
+def test_exchange_gain3(): # a king does not take a defended bishop
+    B = as_indexed((5, [King(2, 2, True), King(5, 5, False), Bishop(3, 3, False), Bishop(4, 4, False)]))
+    assert exchange_gain(B.kings[True], 3, 3, B) < 0
+
+def test_quiesce_stand_pat(): # without captures the static score stands
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(5, 3, False)]))
+    engine = Engine()
+    assert engine.quiesce(B, -INFINITY, INFINITY, 0) == evaluate(B, True)
+    assert engine.qnodes == 1
+
+def test_quiesce_capture(): # a hanging bishop is taken
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(4, 3, False)]))
+    engine = Engine()
+    score = engine.quiesce(B, -INFINITY, INFINITY, 0)
+    make_move(B.squares[(2, 1)], 4, 3, B)
+    assert score == -evaluate(B, False) and score > BISHOP_VALUE
+
+def test_quiesce_trade(): # taking a defended bishop is scored after the recapture
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(4, 3, False),
+                        Bishop(5, 2, False)]))
+    engine = Engine()
+    score = engine.quiesce(B, -INFINITY, INFINITY, 0)
+    assert score == capture_minimax(B, 0)
+    assert engine.qnodes > 2
+
+def test_quiesce_delta_pruning(): # captures that cannot reach alpha are not searched
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(4, 3, False)]))
+    engine = Engine()
+    stand_pat = evaluate(B, True)
+    assert engine.quiesce(B, stand_pat + BISHOP_VALUE + DELTA_MARGIN + 1, INFINITY, 0) == stand_pat
+    assert engine.qnodes == 1
+
+def test_quiesce_checkmate(): # in check every evasion is tried, and no evasion is mate
+    B = as_indexed((5, [King(2, 5, True), Bishop(5, 5, True), King(2, 3, False), Bishop(5, 3, False),
+                        Bishop(1, 2, False), Bishop(3, 1, True), Bishop(4, 1, True)]), False)
+    assert Engine().quiesce(B, -INFINITY, INFINITY, 3) == -(MATE - 3)
+
+def test_quiesce_checks(): # checks are searched at the first quiescence ply only when asked for
+    B = as_indexed(mate_in_one(), False)
+    assert Engine().quiesce(B, -INFINITY, INFINITY, 0) < MATE_BOUND
+    assert Engine(quiescence_checks=True).quiesce(B, -INFINITY, INFINITY, 0) == MATE - 1
+
+def test_quiesce_board_unchanged(): # the quiescence search leaves the board as it was
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(4, 3, False),
+                        Bishop(5, 2, False)]))
+    before = [(id(p), p.pos_x, p.pos_y) for p in B[1]]
+    key = B.hash
+    Engine().quiesce(B, -INFINITY, INFINITY, 0)
+    assert [(id(p), p.pos_x, p.pos_y) for p in B[1]] == before and B.hash == key
+
+def test_quiesce_depth(monkeypatch): # no more than QUIESCENCE_DEPTH plies of captures are searched
+    B = as_indexed((5, [King(1, 1, True), Bishop(2, 1, True), King(5, 5, False), Bishop(4, 3, False),
+                        Bishop(5, 2, False)]))
+    monkeypatch.setattr("chess_engine.QUIESCENCE_DEPTH", 1)
+    engine = Engine()
+    engine.quiesce(B, -INFINITY, INFINITY, 0)
+    assert engine.qnodes == 2 # the capture, but not the recapture
+
+def test_quiesce_large_board(): # depth 1 of a crowded 26x26 board fits in the default time limit
+    text = next(text for name, text, *_ in REFERENCE_POSITIONS if name == "bishops_26")
+    B = parse_board(text.split("\n"))
+    start = time.perf_counter()
+    result = search(B, False, 1, DEFAULT_TIME_LIMIT)
+    assert result[2] == 1 and time.perf_counter() - start < DEFAULT_TIME_LIMIT + 0.1
+
+def test_search_qnodes(): # the quiescence nodes are counted apart from the main search
+    engine = Engine()
+    engine.search(read_board("board_examp.txt"), False, 3)
+    stats = engine.stats()
+    assert stats['qnodes'] > 0 and stats['nodes'] > 0
+    assert stats['quiescence_share'] == stats['qnodes'] / (stats['nodes'] + stats['qnodes'])
+
+# parallel search tests:
+def test_encode_position1(): # three bytes per piece after the size and the side to move
+    B = read_board("board_examp.txt")
+    data = encode_position(B, False)
+    assert isinstance(data, bytes) and len(data) == 2 + 3 * len(B[1])
+    assert data[:2] == bytes((5, 0))
+
+def test_encode_position2(): # decoding gives back the same pieces, side to move and hash
+    rng = random.Random(14)
+    for side in (True, False):
+        B = as_indexed(random_board(rng, 26, 30), side)
+        decoded = decode_position(encode_position(B, side))
+        assert [(type(p), p.side, p.pos_x, p.pos_y) for p in decoded[1]] == [(type(p), p.side, p.pos_x, p.pos_y) for p in B[1]]
+        assert decoded[0] == 26 and decoded.side_to_move == side and decoded.hash == B.hash
+
+def test_search_root_moves(): # the search can be limited to some of the first moves
+    B = read_board("board_examp.txt")
+    allowed = [move_key(move) for move in generate_legal_moves(False, B)][-2:]
+    engine = Engine()
+    (piece, x, y), score, depth, nodes = engine.search(B, False, 2, root_moves=allowed)
+    assert (piece.pos_x, piece.pos_y, x, y) in allowed
+    assert len(engine.iteration_results) == 2 and engine.iteration_results[-1] == ((piece.pos_x, piece.pos_y, x, y), score)
+    assert all(move in allowed for move, _ in engine.iteration_results)
+    assert engine.search(B, False, 2, root_moves=[]) is None
+
+def test_parallel_search1(): # the workers together find the score of the serial search
+    B = read_board("board_examp.txt")
+    serial = search(B, False, 3)
+    (piece, x, y), score, depth, nodes = parallel_search(B, False, 3, workers=2)
+    assert score == serial[1] and depth == 3 and nodes > 0
+    assert piece in B[1] and piece.side == False and piece.can_move_to(x, y, B)
+
+def test_parallel_search2(): # the same seed gives the same move
+    B = read_board("board_examp.txt")
+    first = parallel_search(B, False, 2, workers=3, seed=7)
+    second = parallel_search(B, False, 2, workers=3, seed=7)
+    assert first[:3] == second[:3]
+
+def test_parallel_search3(): # a mate found by one worker wins
+    B = mate_in_one()
+    (piece, x, y), score, depth, nodes = parallel_search(B, False, 3, workers=2)
+    assert (piece.pos_x, piece.pos_y, x, y) == (5, 3, 4, 4) and score == MATE - 1
+
+def test_parallel_search4(): # without legal moves there is nothing to return
+    B = (5, [wk1a, wb4, bk1, bb2, bb3, wb3, wb5])
+    assert parallel_search(B, False, 2, workers=2) is None
+
+def test_parallel_search5(): # out of time before any worker finishes depth 1: a searched move, not an unsearched one
+    B = read_board("board_examp.txt")
+    (piece, x, y), score, depth, nodes = parallel_search(B, False, 4, time_limit=1e-9, workers=2)
+    assert depth >= 1 and piece.side == False and piece.can_move_to(x, y, B)
+
+def test_parallel_search6(): # the worker pool is kept for the next search
+    B = read_board("board_examp.txt")
+    parallel_search(B, False, 1, workers=2)
+    pool = worker_pool(2)
+    parallel_search(B, False, 1, workers=2)
+    assert worker_pool(2) is pool
+
+def test_combine_answers(): # a worker with no finished iteration does not throw away the others
+    a, b, c = (1, 1, 2, 2), (3, 3, 4, 4), (5, 5, 4, 4)
+    order = [a, b, c]
+    assert combine_answers([[(a, 5), (a, 3)], [(b, 4), (b, 9)]], order, 4) == (b, 9, 2)
+    assert combine_answers([[(a, 5), (a, 3)], [(b, 4)]], order, 4) == (a, 5, 1)
+    assert combine_answers([[(a, 5), (a, 3)], [], [(c, 7)]], order, 4) == (c, 7, 1)
+    assert combine_answers([[(a, 5), (a, 3)], [(b, MATE - 1)]], order, 4) == (b, MATE - 1, 2)
+    assert combine_answers([[], []], order, 4) is None
+
+def test_find_black_move_parallel(): # find_black_move can spread the search over processes
+    piece, x, y = find_black_move(mate_in_one(), depth=2, workers=2, seed=1)
+    assert (piece.pos_x, piece.pos_y, x, y) == (5, 3, 4, 4)
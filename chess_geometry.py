@@ -0,0 +1,73 @@
+import logging
+
+# Board geometry, worked out once per board size and shared by the rules, the search and the
+# other move generators: the four diagonal rays from every square, the king neighbourhood of
+# every square, the squares between every two squares on a common diagonal and the colour of
+# every square. Squares are (x, y) pairs counted from 1, as everywhere in chess_puzzle; the
+# tables of a size are built the first time that size is asked for and then kept.
+
+logger = logging.getLogger("chess_puzzle")
+
+MIN_SIZE = 3
+MAX_SIZE = 26
+
+# Diagonal directions, in the order every ray walk uses.
+DIRECTIONS = ((1, 1), (-1, 1), (1, -1), (-1, -1))
+
+# King steps, in the order the king's moves are generated.
+KING_STEPS = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
+
+Square = tuple[int, int]
+
+class Geometry:
+    # rays[square]            the four diagonals from square outwards, in DIRECTIONS order
+    # neighbours[square]      the squares a king on square attacks, in KING_STEPS order
+    # neighbour_sets[square]  the same as a frozenset, for membership tests
+    # between[(a, b)]         the squares strictly between a and b, for a and b on one
+    #                         diagonal (absent otherwise), nearest to a first
+    # light[square]           whether square is a light square (a1 is dark); a bishop keeps
+    #                         to the squares of one colour
+    __slots__ = ("size", "squares", "rays", "neighbours", "neighbour_sets", "between", "light")
+
+    def __init__(self, S: int):
+        self.size = S
+        self.squares = tuple((x, y) for y in range(1, S + 1) for x in range(1, S + 1))
+        self.rays = {}
+        self.neighbours = {}
+        self.neighbour_sets = {}
+        self.between = {}
+        self.light = {}
+        for x, y in self.squares:
+            rays = []
+            for dx, dy in DIRECTIONS:
+                ray = []
+                rx, ry = x + dx, y + dy
+                while 1 <= rx <= S and 1 <= ry <= S:
+                    self.between[((x, y), (rx, ry))] = tuple(ray)
+                    ray.append((rx, ry))
+                    rx += dx
+                    ry += dy
+                rays.append(tuple(ray))
+            self.rays[(x, y)] = tuple(rays)
+            self.neighbours[(x, y)] = tuple((x + dx, y + dy) for dx, dy in KING_STEPS
+                                           if 1 <= x + dx <= S and 1 <= y + dy <= S)
+            self.neighbour_sets[(x, y)] = frozenset(self.neighbours[(x, y)])
+            self.light[(x, y)] = (x + y) % 2 == 1
+
+    def on_board(self, x: int, y: int) -> bool:
+        return 1 <= x <= self.size and 1 <= y <= self.size
+
+    def index(self, square: Square) -> int:
+        # Square number (y - 1) * S + (x - 1), as in the Zobrist keys and the bitboards.
+        return (square[1] - 1) * self.size + (square[0] - 1)
+
+_geometry = {} # Board size -> Geometry
+
+def geometry(S: int) -> Geometry:
+    if S not in _geometry:
+        if not MIN_SIZE <= S <= MAX_SIZE:
+            raise ValueError(f"Board size must be between {MIN_SIZE} and {MAX_SIZE}, not {S}.")
+        _geometry[S] = Geometry(S)
+        if logger.isEnabledFor(logging.DEBUG): # set_debug in chess_puzzle sets the level.
+            logger.debug(f"Geometry tables built for a {S}x{S} board.")
+    return _geometry[S]
@@ -0,0 +1,60 @@
+import pytest
+
+import chess_geometry
+from chess_puzzle import set_debug
+from chess_geometry import geometry, KING_STEPS
+
+def test_rays_from_corner_and_centre(): # From a1 only the up-right diagonal exists; from the centre of a 5x5 board all four do.
+    geo = geometry(5)
+    assert geo.rays[(1, 1)] == (((2, 2), (3, 3), (4, 4), (5, 5)), (), (), ())
+    assert geo.rays[(3, 3)] == (((4, 4), (5, 5)), ((2, 4), (1, 5)), ((4, 2), (5, 1)), ((2, 2), (1, 1)))
+
+def test_neighbours(): # Corner, edge and inner squares have 3, 5 and 8 neighbours, listed in KING_STEPS order.
+    geo = geometry(4)
+    assert len(geo.neighbours[(1, 1)]) == 3
+    assert len(geo.neighbours[(1, 2)]) == 5
+    assert geo.neighbours[(2, 2)] == tuple((2 + dx, 2 + dy) for dx, dy in KING_STEPS)
+    assert geo.neighbour_sets[(2, 2)] == frozenset(geo.neighbours[(2, 2)])
+
+def test_between(): # Squares strictly between two squares of a diagonal, nearest to the first; none for unaligned pairs.
+    geo = geometry(6)
+    assert geo.between[((1, 1), (4, 4))] == ((2, 2), (3, 3))
+    assert geo.between[((4, 4), (1, 1))] == ((3, 3), (2, 2))
+    assert geo.between[((2, 3), (3, 2))] == ()
+    assert ((1, 1), (1, 4)) not in geo.between
+    assert ((1, 1), (1, 1)) not in geo.between
+
+def test_light_squares(): # a1 is dark, b1 and a2 are light, and a diagonal keeps its colour.
+    geo = geometry(8)
+    assert not geo.light[(1, 1)]
+    assert geo.light[(2, 1)] and geo.light[(1, 2)]
+    assert all(geo.light[square] == geo.light[(1, 2)] for ray in geo.rays[(1, 2)] for square in ray)
+
+def test_on_board(): # The corners are on the board, the squares just outside are not.
+    geo = geometry(5)
+    assert geo.on_board(1, 1) and geo.on_board(5, 5)
+    assert not geo.on_board(0, 3) and not geo.on_board(3, 6)
+
+def test_index(): # The square numbering of the Zobrist keys and the bitboards.
+    geo = geometry(7)
+    assert [geo.index(square) for square in geo.squares] == list(range(49))
+
+def test_memoised_per_size(): # The tables are built once per size and shared afterwards.
+    assert geometry(9) is geometry(9)
+    assert geometry(9) is not geometry(10)
+    assert 9 in chess_geometry._geometry
+
+@pytest.mark.parametrize("S", [2, 27])
+def test_size_out_of_range(S): # Board sizes outside 3 to 26 are rejected.
+    with pytest.raises(ValueError):
+        geometry(S)
+
+def test_debug_log(caplog, monkeypatch): # Building the tables is logged with debugging on, and only then.
+    monkeypatch.setattr(chess_geometry, "_geometry", {})
+    geometry(11)
+    set_debug(True)
+    try:
+        geometry(12)
+    finally:
+        set_debug(False)
+    assert "12x12" in caplog.text and "11x11" not in caplog.text
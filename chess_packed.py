@@ -0,0 +1,141 @@
+from array import array
+
+from chess_puzzle import Board, Piece, Bishop, King
+
+# Compact positions: a PackedBoard keeps its pieces as four parallel array('b') columns (x,
+# y, side and kind) instead of one Python object per piece, so keeping thousands of
+# positions costs a few bytes per piece and copying one is four array copies.
+#
+# For the existing rules and search, packed.board is an ordinary (S, pieces) board whose
+# pieces are BishopView and KingView objects: real Bishop and King instances that read and
+# write their row of the columns. Moves made on it (make_move, move_to, an IndexedBoard
+# around it) go straight into the packed board; a captured piece keeps its row, marked
+# CAPTURED, so that unmake_move can put it back.
+
+BISHOP_KIND = 0
+KING_KIND = 1
+CAPTURED = 2 # Added to the kind of a piece taken off the board.
+
+class PieceView:
+    # The part of BishopView and KingView that maps pos_x, pos_y and side to a row of a
+    # PackedBoard. The slots (packed, index) are declared by the concrete classes.
+    __slots__ = ()
+
+    def __init__(self, packed: "PackedBoard", index: int):
+        self.packed = packed
+        self.index = index
+
+    @property
+    def pos_x(self) -> int:
+        return self.packed.xs[self.index]
+
+    @pos_x.setter
+    def pos_x(self, value: int) -> None:
+        self.packed.xs[self.index] = value
+
+    @property
+    def pos_y(self) -> int:
+        return self.packed.ys[self.index]
+
+    @pos_y.setter
+    def pos_y(self, value: int) -> None:
+        self.packed.ys[self.index] = value
+
+    @property
+    def side(self) -> bool:
+        return bool(self.packed.sides[self.index])
+
+    @side.setter
+    def side(self, value: bool) -> None:
+        self.packed.sides[self.index] = value
+
+class BishopView(PieceView, Bishop):
+    __slots__ = ("packed", "index")
+
+class KingView(PieceView, King):
+    __slots__ = ("packed", "index")
+
+class PackedPieces(list):
+    # The piece list of packed.board. Taking a piece out (a capture) marks its row CAPTURED
+    # and putting it back clears the mark, so the columns always match the list.
+    __slots__ = ("packed",)
+
+    def pop(self, index: int = -1) -> Piece:
+        view = super().pop(index)
+        self.packed.kinds[view.index] |= CAPTURED
+        return view
+
+    def insert(self, index: int, view: Piece) -> None:
+        if not isinstance(view, PieceView) or view.packed is not self.packed:
+            raise ValueError("Only pieces taken from this packed board can be put back on it.")
+        self.packed.kinds[view.index] &= ~CAPTURED
+        super().insert(index, view)
+
+    def remove(self, view: Piece) -> None:
+        self.pop(self.index(view))
+
+class PackedBoard:
+    __slots__ = ("S", "xs", "ys", "sides", "kinds", "_board")
+
+    def __init__(self, S: int, xs: array = None, ys: array = None, sides: array = None, kinds: array = None):
+        self.S = S
+        self.xs = xs if xs is not None else array("b")
+        self.ys = ys if ys is not None else array("b")
+        self.sides = sides if sides is not None else array("b")
+        self.kinds = kinds if kinds is not None else array("b")
+        self._board = None
+
+    @classmethod
+    def from_board(cls, B: Board) -> "PackedBoard":
+        packed = cls(B[0])
+        for piece in B[1]:
+            packed.xs.append(piece.pos_x)
+            packed.ys.append(piece.pos_y)
+            packed.sides.append(piece.side)
+            packed.kinds.append(KING_KIND if isinstance(piece, King) else BISHOP_KIND)
+        return packed
+
+    def copy(self) -> "PackedBoard":
+        # An independent copy: the columns are copied, views are only made when asked for.
+        return PackedBoard(self.S, self.xs[:], self.ys[:], self.sides[:], self.kinds[:])
+
+    def __copy__(self) -> "PackedBoard":
+        return self.copy()
+
+    def __deepcopy__(self, memo: dict) -> "PackedBoard":
+        return self.copy()
+
+    def __reduce__(self):
+        return PackedBoard, (self.S, self.xs, self.ys, self.sides, self.kinds)
+
+    def __len__(self) -> int:
+        # Pieces on the board; captured rows do not count.
+        return sum(1 for kind in self.kinds if not kind & CAPTURED)
+
+    def __eq__(self, other) -> bool:
+        # Same size and the same pieces on the same squares, in any row order.
+        if not isinstance(other, PackedBoard):
+            return NotImplemented
+        return self.S == other.S and sorted(self.rows()) == sorted(other.rows())
+
+    def rows(self) -> list[tuple[int, int, int, int]]:
+        # (x, y, side, kind) of every piece on the board, in row order.
+        return [(x, y, side, kind) for x, y, side, kind in zip(self.xs, self.ys, self.sides, self.kinds)
+                if not kind & CAPTURED]
+
+    @property
+    def board(self) -> Board:
+        # The position as an (S, pieces) board of views, made on first use.
+        if self._board is None:
+            pieces = PackedPieces()
+            pieces.packed = self
+            for i, kind in enumerate(self.kinds):
+                if not kind & CAPTURED:
+                    pieces.append((KingView if kind == KING_KIND else BishopView)(self, i))
+            self._board = (self.S, pieces)
+        return self._board
+
+    def unpack(self) -> Board:
+        # The position as a board of separate Bishop and King objects.
+        return (self.S, [(King if kind == KING_KIND else Bishop)(x, y, bool(side))
+                         for x, y, side, kind in self.rows()])
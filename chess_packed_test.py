@@ -0,0 +1,86 @@
+import copy
+import pickle
+import random
+import sys
+
+import pytest
+from chess_puzzle import *
+from chess_packed import *
+from chess_engine import search
+
+def pieces_of(B): # the pieces of a board, independent of their order
+    return sorted((type(p).__name__.replace("View", ""), p.side, p.pos_x, p.pos_y) for p in B[1])
+
+# slots tests:
+def test_piece_slots(): # pieces have no __dict__ and take no other attributes
+    piece = Bishop(1, 2, True)
+    assert not hasattr(piece, "__dict__")
+    with pytest.raises(AttributeError):
+        piece.colour = "white"
+    assert copy.deepcopy(piece).pos_y == 2 and pickle.loads(pickle.dumps(King(3, 3, False))).side is False
+
+# packed board tests:
+def test_from_board(): # one row per piece in four byte columns
+    packed = PackedBoard.from_board(read_board("board_examp.txt"))
+    assert len(packed) == 7
+    assert packed.xs.typecode == packed.ys.typecode == packed.sides.typecode == packed.kinds.typecode == "b"
+    assert packed.rows()[1] == (3, 5, 1, KING_KIND) # Kc5
+    assert pieces_of(packed.unpack()) == pieces_of(read_board("board_examp.txt"))
+
+def test_copy(): # copies are independent, including copy.copy, deepcopy and pickle
+    packed = PackedBoard.from_board(read_board("board_examp.txt"))
+    for duplicate in (packed.copy(), copy.copy(packed), copy.deepcopy(packed), pickle.loads(pickle.dumps(packed))):
+        assert duplicate == packed
+        duplicate.xs[0] = 1
+        assert duplicate != packed and packed.xs[0] == 2
+
+def test_views1(): # the views are Bishop and King objects reading the columns
+    packed = PackedBoard.from_board(read_board("board_examp.txt"))
+    S, pieces = packed.board
+    assert S == 5 and len(pieces) == 7
+    assert isinstance(pieces[0], Bishop) and isinstance(pieces[1], King)
+    assert (pieces[1].pos_x, pieces[1].pos_y, pieces[1].side) == (3, 5, True)
+    assert packed.board is packed.board
+
+def test_views2(): # the rules give the same answers on the views as on the original pieces
+    rng = random.Random(30)
+    for _ in range(40):
+        B = random_board(rng, 6, 6)
+        view = PackedBoard.from_board(B).board
+        for side in (True, False):
+            assert is_check(side, view) == is_check(side, B)
+            assert sorted((p.pos_x, p.pos_y, x, y) for p, x, y in generate_legal_moves(side, view)) == \
+                sorted((p.pos_x, p.pos_y, x, y) for p, x, y in generate_legal_moves(side, B))
+
+def test_views3(): # a move on the views is a move in the columns, and a capture marks the row
+    packed = PackedBoard.from_board(read_board("board_examp.txt"))
+    bishop = packed.board[1][0] # Bb5
+    undo = make_move(bishop, 3, 4, packed.board)
+    assert (packed.xs[0], packed.ys[0]) == (3, 4)
+    undo2 = make_move(packed.board[1][2], 3, 3, packed.board) # Bd4 takes Bc3
+    assert len(packed) == 6 and len(packed.board[1]) == 6
+    unmake_move(undo2, packed.board)
+    unmake_move(undo, packed.board)
+    assert packed == PackedBoard.from_board(read_board("board_examp.txt"))
+
+def test_views4(): # an IndexedBoard around the views searches the same as around the original
+    B = read_board("board_examp.txt")
+    packed = PackedBoard.from_board(B)
+    move, score, depth, nodes = search(packed.board, False, 3)
+    expected = search(B, False, 3)
+    assert (move[0].pos_x, move[0].pos_y, move[1], move[2], score) == \
+        (expected[0][0].pos_x, expected[0][0].pos_y, expected[0][1], expected[0][2], expected[1])
+    assert packed == PackedBoard.from_board(B) # the search undid all its moves
+
+def test_packed_pieces(): # only the board's own captured pieces can be put back
+    packed = PackedBoard.from_board(read_board("board_examp.txt"))
+    with pytest.raises(ValueError):
+        packed.board[1].insert(0, Bishop(1, 1, True))
+    packed.board[1].remove(packed.board[1][0])
+    assert len(packed) == 6 and (5, 2, 5, 1) not in packed.rows()
+
+def test_size(): # a packed position is far smaller than its piece objects
+    B = random_board(random.Random(31), 16, 30)
+    packed = PackedBoard.from_board(B)
+    packed_size = sum(sys.getsizeof(column) for column in (packed.xs, packed.ys, packed.sides, packed.kinds))
+    assert packed_size < sys.getsizeof(B[1]) + sum(sys.getsizeof(piece) for piece in B[1])
@@ -0,0 +1,152 @@
+import argparse
+import sys
+import time
+
+from chess_bitboard import BitBoard, square_xy
+from chess_puzzle import (Board, as_indexed, generate_legal_moves, make_move, unmake_move, parse_board, read_board,
+                          index2location)
+
+# Perft: count the positions reached after every sequence of depth legal moves. The counts
+# check move generation against known values, and the time taken measures its speed, so any
+# change to can_move_to, is_check or generate_legal_moves can be checked for both.
+
+Move = tuple[int, int, int, int] # (from x, from y, to x, to y)
+
+# Move generators perft can run on: the piece objects of chess_puzzle or the bitboards of
+# chess_bitboard. Both must give the same counts; the times show which is faster.
+OBJECTS = "objects"
+BITBOARD = "bitboard"
+BACKENDS = (OBJECTS, BITBOARD)
+
+def check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}.")
+
+def perft(B: Board, side: bool, depth: int, backend: str = OBJECTS) -> int:
+    # Number of leaf positions depth plies below B, with side to move first.
+    check_backend(backend)
+    if backend == BITBOARD:
+        return bitboard_perft(BitBoard.from_board(B), side, depth)
+    B = as_indexed(B, side)
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return sum(1 for _ in generate_legal_moves(side, B)) # No need to play the last moves.
+    nodes = 0
+    for piece, x, y in list(generate_legal_moves(side, B)):
+        undo = make_move(piece, x, y, B)
+        try:
+            nodes += perft(B, not side, depth - 1)
+        finally:
+            unmake_move(undo, B)
+    return nodes
+
+def bitboard_perft(BB: BitBoard, side: bool, depth: int) -> int:
+    # Perft over BitBoard.legal_moves; a move makes a new bitboard, so there is nothing to undo.
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return sum(1 for _ in BB.legal_moves(side))
+    return sum(bitboard_perft(BB.make(from_sq, to_sq), not side, depth - 1) for from_sq, to_sq in BB.legal_moves(side))
+
+def divide(B: Board, side: bool, depth: int, backend: str = OBJECTS) -> dict[Move, int]:
+    # Perft split by the first move, to find which move a wrong count comes from.
+    check_backend(backend)
+    if backend == BITBOARD:
+        BB = BitBoard.from_board(B)
+        return {square_xy(from_sq, BB.size) + square_xy(to_sq, BB.size):
+                bitboard_perft(BB.make(from_sq, to_sq), not side, depth - 1)
+                for from_sq, to_sq in BB.legal_moves(side)}
+    B = as_indexed(B, side)
+    counts = {}
+    for piece, x, y in list(generate_legal_moves(side, B)):
+        move = (piece.pos_x, piece.pos_y, x, y)
+        undo = make_move(piece, x, y, B)
+        try:
+            counts[move] = perft(B, not side, depth - 1) if depth > 1 else 1
+        finally:
+            unmake_move(undo, B)
+    return counts
+
+# Reference positions: (name, board text as in a board file, side to move, {depth: nodes}).
+# board_examp is board_examp.txt (and B1 of chess_puzzle_test.py); the B boards are the other
+# test boards, and the two large boards are random set-ups with many bishops. Every count was
+# checked against a brute-force perft over the bitboard move generator in chess_bitboard.
+REFERENCE_POSITIONS = [
+    ("board_examp", "5\nBb5, Kc5, Bd4, Bc1\nKb3, Bc3, Be3", True, {1: 10, 2: 100, 3: 941, 4: 8452, 5: 95083}),
+    ("B2", "5\nBb5, Bd4, Bc1, Kc5, Bd1\nBc3, Be3, Kb3, Ba2, Bc2", True, {1: 12, 2: 115, 3: 1139, 4: 10798, 5: 114869}),
+    ("B3", "5\nBb5, Bd4, Kc5, Bd1\nBc3, Be3, Kb3, Ba2, Bc2, Be4", True, {1: 7, 2: 76, 3: 516, 4: 6583, 5: 51637}),
+    ("B4", "5\nBb5, Kc5, Bc1\nKb3, Bc3, Be3", True, {1: 2, 2: 27, 3: 229, 4: 2292, 5: 22627}), # White in check.
+    ("B5", "6\nBb5, Bc1, Kc5, Be6\nKb3, Bc3", False, {1: 1, 2: 22, 3: 228, 4: 4147, 5: 38766}), # Black in check.
+    ("B8", "5\nKb5, Be5, Bc1, Bd1\nKb3, Be3, Ba2", False, {1: 0, 2: 0}), # Black is checkmated.
+    ("B13", "4\nKa1, Ba2, Bb1, Bd2\nKd4", True, {1: 8, 2: 4, 3: 27, 4: 71, 5: 568, 6: 1227}),
+    ("bishops_16", "16\nKm6, Bg12, Bh13, Bn5, Be14, Bh11, Bo9, Bi2, Bo11, Bb9\n"
+     "Km3, Bo4, Ba11, Be3, Bp8, Bi3, Bg8, Bo12, Bm9, Bf12, Bj6, Bo5, Bd8, Bc4, Be9, Bm2",
+     True, {1: 100, 2: 20840, 3: 2089086}),
+    ("bishops_26", "26\nKr22, Bs9, Br21, Bu1, Bx4, Bh8, By21, By5, Br16, Bf16, Bd15, Bv6, By26, Bb17, Bp16, "
+     "By7, Bz16, By15, Bu22, Bc9, Bb11, Bj14, Bx17, Bs8, Br10, Bx8, Bh19\n"
+     "Kw2, Bh13, Bu5, Bs20, Bh9, Bd19, Bl25, Bx12, Bz20, Bg6, Ba16, Bc13, Bb5, Bm23, Bu12",
+     True, {1: 546, 2: 192476}),
+]
+
+def reference_board(text: str) -> Board:
+    return parse_board(text.split("\n"))
+
+def run(B: Board, side: bool, depth: int, backend: str = OBJECTS) -> tuple[int, float]:
+    # Perft count and the seconds it took.
+    start = time.perf_counter()
+    nodes = perft(B, side, depth, backend)
+    return nodes, time.perf_counter() - start
+
+def report(label: str, nodes: int, seconds: float, expected: int = None) -> str:
+    rate = nodes / seconds if seconds > 0 else 0.0
+    line = f"{label:<28} {nodes:>10} nodes {seconds:8.3f} s {rate:12.0f} nodes/s"
+    if expected is not None:
+        line += " ok" if nodes == expected else f" WRONG (expected {expected})"
+    return line
+
+def run_suite(max_depth: int = None, out=sys.stdout, backend: str = OBJECTS) -> bool:
+    # Run every reference position at each depth with a known count; False if any count is wrong.
+    correct = True
+    total_nodes = 0
+    total_seconds = 0.0
+    for name, text, side, counts in REFERENCE_POSITIONS:
+        for depth, expected in sorted(counts.items()):
+            if max_depth is not None and depth > max_depth:
+                continue
+            nodes, seconds = run(reference_board(text), side, depth, backend)
+            total_nodes += nodes
+            total_seconds += seconds
+            correct = correct and nodes == expected
+            print(report(f"{name} depth {depth}", nodes, seconds, expected), file=out)
+    print(report("total", total_nodes, total_seconds), file=out)
+    return correct
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Count legal move sequences (perft) and time move generation.")
+    parser.add_argument("board", nargs="?", help="board file; without one the reference positions are checked")
+    parser.add_argument("-d", "--depth", type=int, help="depth in plies (default 3 for a board file)")
+    parser.add_argument("-s", "--side", choices=("white", "black"), default="white", help="side to move")
+    parser.add_argument("--divide", action="store_true", help="print the count below each first move")
+    parser.add_argument("-b", "--backend", choices=BACKENDS, default=OBJECTS, help="move generator (default objects)")
+    args = parser.parse_args(argv)
+
+    if args.board is None:
+        return 0 if run_suite(args.depth, backend=args.backend) else 1
+
+    B = read_board(args.board)
+    side = args.side == "white"
+    depth = args.depth if args.depth is not None else 3
+    if args.divide:
+        start = time.perf_counter()
+        counts = divide(B, side, depth, args.backend)
+        seconds = time.perf_counter() - start
+        for (from_x, from_y, to_x, to_y), nodes in sorted(counts.items()):
+            print(f"{index2location(from_x, from_y)}{index2location(to_x, to_y)}: {nodes}")
+        print(report(f"{args.board} depth {depth}", sum(counts.values()), seconds))
+    else:
+        print(report(f"{args.board} depth {depth}", *run(B, side, depth, args.backend)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
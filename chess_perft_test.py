@@ -0,0 +1,126 @@
+import io
+import random
+
+import pytest
+from chess_puzzle import *
+from chess_perft import *
+
+def brute_force_perft(B, side, depth): # perft over can_move_to on every square, without generate_legal_moves
+    if depth == 0:
+        return 1
+    nodes = 0
+    for piece in list(B[1]):
+        if piece.side != side:
+            continue
+        for x in range(1, B[0] + 1):
+            for y in range(1, B[0] + 1):
+                if (x, y) != (piece.pos_x, piece.pos_y) and piece.can_move_to(x, y, B):
+                    undo = make_move(piece, x, y, B)
+                    nodes += brute_force_perft(B, not side, depth - 1)
+                    unmake_move(undo, B)
+    return nodes
+
+# perft tests:
+def test_perft1(): # depth 0 is the position itself, depth 1 the legal moves
+    B = read_board("board_examp.txt")
+    assert perft(B, True, 0) == 1
+    assert perft(B, True, 1) == len(list(generate_legal_moves(True, B)))
+
+def test_perft2(): # known counts of board_examp.txt
+    B = read_board("board_examp.txt")
+    assert [perft(B, True, depth) for depth in (1, 2, 3)] == [10, 100, 941]
+
+def test_perft3(): # a checkmated side has no moves at any depth
+    B = (5, [King(2, 5, True), Bishop(5, 5, True), King(2, 3, False), Bishop(5, 3, False), Bishop(1, 2, False),
+             Bishop(3, 1, True), Bishop(4, 1, True)])
+    assert perft(B, False, 1) == 0 and perft(B, False, 3) == 0
+
+def test_perft4(): # plain tuples and indexed boards count the same
+    B = (5, [King(3, 5, True), King(2, 3, False), Bishop(2, 5, True), Bishop(3, 3, False)])
+    assert perft(B, True, 3) == perft(as_indexed(B), True, 3)
+
+def test_perft_board_unchanged(): # perft leaves the board as it was
+    B = read_board("board_examp.txt")
+    before = [(id(p), p.pos_x, p.pos_y) for p in B[1]]
+    key = B.hash
+    perft(B, True, 3)
+    assert [(id(p), p.pos_x, p.pos_y) for p in B[1]] == before and B.hash == key
+
+def test_perft_brute_force(): # perft agrees with trying can_move_to on every square
+    rng = random.Random(11)
+    for _ in range(10):
+        B = random_board(rng, 5, 4)
+        if is_check(False, B):
+            continue # White to move with Black in check cannot happen in a game.
+        assert perft(as_indexed(B), True, 2) == brute_force_perft(B, True, 2)
+
+# divide tests:
+def test_divide1(): # the counts below each first move add up to perft
+    B = read_board("board_examp.txt")
+    counts = divide(B, True, 3)
+    assert len(counts) == 10
+    assert sum(counts.values()) == perft(B, True, 3)
+
+def test_divide2(): # at depth 1 every move counts once
+    B = read_board("board_examp.txt")
+    counts = divide(B, True, 1)
+    assert set(counts.values()) == {1}
+    assert set(counts) == {(p.pos_x, p.pos_y, x, y) for p, x, y in generate_legal_moves(True, B)}
+
+# reference position tests:
+def test_reference_positions(): # every reference count up to depth 3 is right (the CLI checks the deeper ones)
+    for name, text, side, counts in REFERENCE_POSITIONS:
+        for depth, expected in counts.items():
+            if depth <= 3 and expected < 100000:
+                assert perft(reference_board(text), side, depth) == expected, (name, depth)
+
+def test_reference_positions_bitboard(): # the bitboard backend gives the same counts
+    for name, text, side, counts in REFERENCE_POSITIONS:
+        for depth, expected in counts.items():
+            if depth <= 3 and expected < 100000:
+                assert perft(reference_board(text), side, depth, BITBOARD) == expected, (name, depth)
+
+def test_divide_bitboard(): # both backends split the count the same way
+    B = read_board("board_examp.txt")
+    assert divide(B, True, 3, BITBOARD) == divide(B, True, 3)
+
+def test_unknown_backend(): # only the listed backends can be chosen
+    with pytest.raises(ValueError, match="Unknown backend"):
+        perft(read_board("board_examp.txt"), True, 1, "arrays")
+
+def snapshot_text(B): # the pieces of a board, independent of their order
+    return sorted((type(p).__name__, p.side, p.pos_x, p.pos_y) for p in B[1])
+
+def test_reference_board_examp(): # the first reference position is board_examp.txt
+    assert snapshot_text(reference_board(REFERENCE_POSITIONS[0][1])) == snapshot_text(read_board("board_examp.txt"))
+
+def test_run_suite(): # the suite reports nodes per second and passes
+    out = io.StringIO()
+    assert run_suite(2, out) == True
+    lines = out.getvalue().splitlines()
+    assert all("nodes/s" in line for line in lines)
+    assert lines[-1].startswith("total")
+    assert all(line.endswith(" ok") for line in lines[:-1])
+
+def test_run_suite_wrong(monkeypatch): # a wrong count fails the suite
+    monkeypatch.setattr("chess_perft.REFERENCE_POSITIONS", [("bad", REFERENCE_POSITIONS[0][1], True, {1: 11})])
+    out = io.StringIO()
+    assert run_suite(None, out) == False
+    assert "WRONG (expected 11)" in out.getvalue()
+
+# CLI tests:
+def test_main_board(capsys): # a board file with --divide prints one line per move and the total
+    assert main(["board_examp.txt", "--depth", "2", "--divide"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 11
+    assert "c5d5: 13" in lines
+    assert " 100 nodes" in lines[-1]
+
+def test_main_side(capsys): # the side to move can be chosen
+    assert main(["board_examp.txt", "-d", "1", "-s", "black"]) == 0
+    assert f" {perft(read_board('board_examp.txt'), False, 1)} nodes" in capsys.readouterr().out
+
+def test_main_backend(capsys): # the move generator can be chosen
+    assert main(["board_examp.txt", "-d", "2", "--backend", "bitboard", "--divide"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert "c5d5: 13" in lines and " 100 nodes" in lines[-1]
@@ -0,0 +1,260 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Iterable, Iterator
+
+from chess_puzzle import (Board, BoardErrorHandler, Bishop, King, IndexedBoard, read_numbered_boards, format_board,
+                          save_board, zobrist_hash, logger)
+
+# Binary position format and a memory-mapped position database.
+#
+# A position is a fixed-width record: the board size, the side to move, both king squares,
+# the number of bishops and then max_bishops slots of two bytes, each bishop stored as its
+# square index (y - 1) * S + (x - 1) shifted left one bit with its colour in the low bit
+# (1 for White). Unused slots are zero. All numbers are little-endian.
+#
+# A database file is a header (magic, version, max_bishops) followed by the records, so
+# record i is at a fixed offset and can be read straight from the mapped file. Next to it,
+# filename + INDEX_SUFFIX holds (Zobrist hash, record number) pairs sorted by hash, which
+# are binary searched to find a position.
+
+MAGIC = b"CHPD"
+VERSION = 1
+HEADER = struct.Struct("<4sHH") # magic, version, max_bishops
+RECORD_HEAD = struct.Struct("<BBHHH") # size, side to move, white king, black king, bishops
+INDEX_ENTRY = struct.Struct("<QI") # Zobrist hash, record number
+INDEX_SUFFIX = ".zidx"
+DEFAULT_MAX_BISHOPS = 32
+
+def record_size(max_bishops: int) -> int:
+    return RECORD_HEAD.size + 2 * max_bishops
+
+def pack_position(B: Board, side_to_move: bool = True, max_bishops: int = DEFAULT_MAX_BISHOPS) -> bytes:
+    S = B[0]
+    kings = {}
+    bishops = []
+    for piece in B[1]:
+        square = (piece.pos_y - 1) * S + (piece.pos_x - 1)
+        if isinstance(piece, King):
+            if piece.side in kings:
+                raise ValueError("Each side must have exactly one king.")
+            kings[piece.side] = square
+        else:
+            bishops.append(square << 1 | piece.side)
+    if len(kings) != 2:
+        raise ValueError("Each side must have exactly one king.")
+    count = len(bishops)
+    if count > max_bishops:
+        raise ValueError(f"{count} bishops do not fit in a record of {max_bishops}.")
+    bishops += [0] * (max_bishops - count)
+    return RECORD_HEAD.pack(S, side_to_move, kings[True], kings[False], count) + \
+        struct.pack(f"<{max_bishops}H", *bishops)
+
+def unpack_position(data: bytes) -> IndexedBoard:
+    # The board of a record, with the kings first and the bishops in their stored order.
+    S, side_to_move, white_king, black_king, count = RECORD_HEAD.unpack_from(data)
+    pieces = [King(white_king % S + 1, white_king // S + 1, True),
+              King(black_king % S + 1, black_king // S + 1, False)]
+    for value in struct.unpack_from(f"<{count}H", data, RECORD_HEAD.size):
+        square = value >> 1
+        pieces.append(Bishop(square % S + 1, square // S + 1, bool(value & 1)))
+    return IndexedBoard(S, pieces, bool(side_to_move))
+
+def as_hash(B: Board, side_to_move: bool) -> int:
+    if isinstance(B, IndexedBoard) and B.side_to_move == side_to_move:
+        return B.hash
+    return zobrist_hash(B, side_to_move)
+
+def write_position_db(filename: str, boards: Iterable[Board], max_bishops: int = DEFAULT_MAX_BISHOPS,
+                      on_error: BoardErrorHandler = None) -> int:
+    # Write boards (each with its side_to_move, White for plain tuples) to a new database
+    # and its Zobrist index. Returns the number of records. A board a record cannot hold is
+    # reported with its number among the boards (to on_error, or as a logged warning) and
+    # skipped. Both files are written under temporary names and moved into place at the end,
+    # so a failed conversion leaves no half-written database behind.
+    index = []
+    temporary = (filename + ".tmp", filename + INDEX_SUFFIX + ".tmp")
+    try:
+        with open(temporary[0], "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, max_bishops))
+            for number, B in enumerate(boards, 1):
+                side = getattr(B, "side_to_move", True)
+                try:
+                    f.write(pack_position(B, side, max_bishops))
+                except ValueError as error:
+                    if on_error is not None:
+                        on_error(number, str(error))
+                    else:
+                        logger.warning(f"{filename}, board {number}: {error} Record skipped.")
+                    continue
+                index.append((as_hash(B, side), len(index)))
+        index.sort()
+        with open(temporary[1], "wb") as f:
+            for entry in index:
+                f.write(INDEX_ENTRY.pack(*entry))
+        os.replace(temporary[1], filename + INDEX_SUFFIX)
+        os.replace(temporary[0], filename)
+    finally:
+        for name in temporary:
+            if os.path.exists(name):
+                os.remove(name)
+    return len(index)
+
+class PositionDB:
+    # Read-only view of a database file through mmap: records are unpacked only when asked
+    # for, so opening a database of any size is immediate.
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_bishops = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{filename} is not a version {VERSION} position database.")
+        self.record_size = record_size(self.max_bishops)
+        self.count = (len(self.data) - HEADER.size) // self.record_size
+        self.index = None
+        try:
+            with open(filename + INDEX_SUFFIX, "rb") as f:
+                if self.count:
+                    self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            logger.warning(f"{filename} has no Zobrist index; lookups are not available.")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, i: int) -> bytes:
+        if not 0 <= i < self.count:
+            raise IndexError(f"Record {i} is not in a database of {self.count}.")
+        start = HEADER.size + i * self.record_size
+        return self.data[start:start + self.record_size]
+
+    def __getitem__(self, i: int) -> IndexedBoard:
+        if i < 0:
+            i += self.count
+        return unpack_position(self.record(i))
+
+    def __iter__(self) -> Iterator[IndexedBoard]:
+        for i in range(self.count):
+            yield unpack_position(self.record(i))
+
+    def find(self, key: int) -> list[int]:
+        # Record numbers of the positions with Zobrist hash key, by binary search of the index.
+        if self.index is None:
+            if self.count:
+                raise LookupError(f"{self.filename} has no Zobrist index.")
+            return []
+        low, high = 0, len(self.index) // INDEX_ENTRY.size
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_ENTRY.unpack_from(self.index, middle * INDEX_ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < len(self.index) // INDEX_ENTRY.size:
+            entry_key, record = INDEX_ENTRY.unpack_from(self.index, low * INDEX_ENTRY.size)
+            if entry_key != key:
+                break
+            found.append(record)
+            low += 1
+        return found
+
+    def lookup(self, B: Board, side_to_move: bool = None) -> int:
+        # Record number of the position B (with side_to_move, by default that of B), or None.
+        side = side_to_move if side_to_move is not None else getattr(B, "side_to_move", True)
+        try:
+            target = pack_position(B, side, self.max_bishops)
+        except ValueError:
+            return None # Not a position a record can hold.
+        # Hash collisions are ruled out by comparing the stored record, as a set of pieces.
+        for i in self.find(as_hash(B, side)):
+            if same_position(self.record(i), target):
+                return i
+        return None
+
+    def close(self) -> None:
+        self.data.close()
+        if self.index is not None:
+            self.index.close()
+
+    def __enter__(self) -> "PositionDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def same_position(a: bytes, b: bytes) -> bool:
+    # Records hold the bishops in piece-list order, so compare them as sets.
+    head_a, head_b = RECORD_HEAD.unpack_from(a), RECORD_HEAD.unpack_from(b)
+    if head_a != head_b:
+        return False
+    count = head_a[4]
+    return sorted(struct.unpack_from(f"<{count}H", a, RECORD_HEAD.size)) == \
+        sorted(struct.unpack_from(f"<{count}H", b, RECORD_HEAD.size))
+
+def text_to_db(text_files: Iterable[str], db_file: str, max_bishops: int = DEFAULT_MAX_BISHOPS,
+               on_error: BoardErrorHandler = None) -> int:
+    # Convert board files (read_board files, or multi-position files) into a database.
+    # Positions are stored with White to move, as read_board gives them. Bad records, and
+    # boards with more bishops than max_bishops, are skipped and reported the same way: with
+    # the number of the record's first line in its file, to on_error (the problem then starts
+    # with the file name), or as a logged warning.
+    location = [None, 0] # The file and first line of the board being written.
+
+    def report(text_file, number, problem):
+        if on_error is not None:
+            on_error(number, f"{text_file}: {problem}")
+        else:
+            logger.warning(f"{text_file}, line {number}: {problem} Record skipped.")
+
+    def boards():
+        for text_file in text_files:
+            def file_error(number, problem, text_file=text_file):
+                report(text_file, number, problem)
+            for number, B in read_numbered_boards(text_file, file_error):
+                location[:] = [text_file, number]
+                yield B
+
+    def pack_error(_, problem): # write_position_db counts boards; the record's line is reported instead.
+        report(*location, problem)
+
+    return write_position_db(db_file, boards(), max_bishops, pack_error)
+
+def db_to_text(db_file: str, text_file: str, one_line: bool = False) -> int:
+    # Write every position of a database to a multi-position text file.
+    with PositionDB(db_file) as db, open(text_file, "w") as f:
+        for B in db:
+            f.write(format_board(B, one_line))
+        return len(db)
+
+def export_board(db_file: str, i: int, filename: str) -> None:
+    # Save record i of a database as a board file that read_board (and the game) can open.
+    with PositionDB(db_file) as db:
+        save_board(filename, db[i])
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert between board text files and a binary position database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    to_db = commands.add_parser("to-db", help="board files to a database")
+    to_db.add_argument("text_files", nargs="+")
+    to_db.add_argument("-o", "--output", required=True, help="database file")
+    to_db.add_argument("--max-bishops", type=int, default=DEFAULT_MAX_BISHOPS, help="bishop slots per record")
+    to_text = commands.add_parser("to-text", help="a database to a multi-position text file")
+    to_text.add_argument("db_file")
+    to_text.add_argument("-o", "--output", required=True, help="text file")
+    to_text.add_argument("--one-line", action="store_true", help="one line per position")
+    args = parser.parse_args(argv)
+
+    if args.command == "to-db":
+        count = text_to_db(args.text_files, args.output, args.max_bishops)
+    else:
+        count = db_to_text(args.db_file, args.output, args.one_line)
+    print(f"{count} positions written to {args.output}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import os
+import random
+import struct
+
+import pytest
+from chess_puzzle import *
+from chess_positions import *
+from chess_perft import REFERENCE_POSITIONS
+
+def pieces_of(B): # the pieces of a board, independent of their order
+    return sorted((type(p).__name__, p.side, p.pos_x, p.pos_y) for p in B[1])
+
+# record tests:
+def test_pack_position1(): # fixed width whatever the number of bishops
+    B = read_board("board_examp.txt")
+    assert len(pack_position(B, True, 8)) == record_size(8) == 8 + 2 * 8
+    assert len(pack_position((5, [King(1, 1, True), King(5, 5, False)]), True, 8)) == record_size(8)
+
+def test_pack_position2(): # the header fields and a bishop's square and colour bit
+    B = (5, [King(3, 5, True), Bishop(2, 5, True), King(2, 3, False), Bishop(3, 3, False)])
+    data = pack_position(B, False, 2)
+    assert RECORD_HEAD.unpack_from(data) == (5, 0, 22, 11, 2)
+    assert struct.unpack_from("<2H", data, RECORD_HEAD.size) == (21 << 1 | 1, 12 << 1)
+
+def test_pack_position3(): # positions that do not fit are refused
+    with pytest.raises(ValueError):
+        pack_position(read_board("board_examp.txt"), True, 4)
+    with pytest.raises(ValueError):
+        pack_position((5, [King(1, 1, True), Bishop(5, 5, False)]))
+
+def test_unpack_position(): # round trip of the pieces, side to move and hash, up to 26x26
+    rng = random.Random(17)
+    for S in (3, 8, 26):
+        for side in (True, False):
+            B = as_indexed(random_board(rng, S, min(S, 7)), side)
+            decoded = unpack_position(pack_position(B, side))
+            assert pieces_of(decoded) == pieces_of(B)
+            assert decoded.side_to_move == side and decoded.hash == B.hash
+
+# database tests:
+def sample_boards(): # board_examp.txt and some random positions with either side to move
+    rng = random.Random(3)
+    boards = [read_board("board_examp.txt")]
+    for i in range(40):
+        boards.append(as_indexed(random_board(rng, rng.randint(3, 12), rng.randint(0, 6)), i % 2 == 0))
+    return boards
+
+def test_position_db1(tmp_path): # random access by record number
+    boards = sample_boards()
+    filename = str(tmp_path / "positions.db")
+    assert write_position_db(filename, boards, 6) == len(boards)
+    with PositionDB(filename) as db:
+        assert len(db) == len(boards)
+        for i in (0, 17, len(boards) - 1, -1):
+            assert pieces_of(db[i]) == pieces_of(boards[i])
+            assert db[i].side_to_move == boards[i].side_to_move
+        with pytest.raises(IndexError):
+            db[len(boards)]
+
+def test_position_db2(tmp_path): # the file is the header and fixed-width records
+    filename = str(tmp_path / "positions.db")
+    write_position_db(filename, sample_boards(), 6)
+    assert os.path.getsize(filename) == HEADER.size + 41 * record_size(6)
+    assert os.path.getsize(filename + INDEX_SUFFIX) == 41 * INDEX_ENTRY.size
+
+def test_position_db_iterate(tmp_path): # iterating gives every record in order
+    boards = sample_boards()
+    filename = str(tmp_path / "positions.db")
+    write_position_db(filename, boards, 6)
+    with PositionDB(filename) as db:
+        assert [pieces_of(B) for B in db] == [pieces_of(B) for B in boards]
+
+def test_position_db_lookup(tmp_path): # positions are found by their Zobrist hash
+    boards = sample_boards()
+    filename = str(tmp_path / "positions.db")
+    write_position_db(filename, boards, 6)
+    with PositionDB(filename) as db:
+        for i, B in enumerate(boards):
+            assert db.lookup(B) == i
+            assert i in db.find(B.hash)
+        examp = read_board("board_examp.txt")
+        assert db.lookup(examp) == 0
+        assert db.lookup(examp, False) is None # the side to move is part of the position
+        assert db.lookup((26, [King(1, 1, True), King(26, 26, False)])) is None
+        assert db.find(12345) == []
+
+def test_position_db_not_a_db(tmp_path): # other files are refused
+    filename = str(tmp_path / "positions.db")
+    with open(filename, "wb") as f:
+        f.write(b"5\nKa1\nKe5\n")
+    with pytest.raises(ValueError):
+        PositionDB(filename)
+
+def test_position_db_empty(tmp_path): # an empty database has no records and finds nothing
+    filename = str(tmp_path / "positions.db")
+    assert write_position_db(filename, []) == 0
+    with PositionDB(filename) as db:
+        assert len(db) == 0 and list(db) == [] and db.lookup(read_board("board_examp.txt")) is None
+
+# converter tests:
+def test_text_to_db(tmp_path): # board files and multi-position files go into one database
+    multi = tmp_path / "many.txt"
+    boards = sample_boards()[1:]
+    for B in boards:
+        append_board(multi, B, one_line=True)
+    filename = str(tmp_path / "positions.db")
+    assert text_to_db(["board_examp.txt", str(multi)], filename, 6) == 41
+    with PositionDB(filename) as db:
+        assert pieces_of(db[0]) == pieces_of(read_board("board_examp.txt"))
+        assert [pieces_of(db[i + 1]) for i in range(40)] == [pieces_of(B) for B in boards]
+        assert all(B.side_to_move == True for B in db) # text files do not record the side to move
+
+def test_text_to_db_too_many_bishops(tmp_path): # a board with more bishops than the records hold is reported and skipped
+    multi = tmp_path / "many.txt"
+    crowded = parse_board([line for name, text, *_ in REFERENCE_POSITIONS if name == "bishops_26" for line in text.split("\n")])
+    for B in (read_board("board_examp.txt"), crowded, read_board("board_examp.txt")):
+        append_board(multi, B)
+    filename = str(tmp_path / "positions.db")
+    problems = []
+    assert text_to_db([str(multi)], filename, on_error=lambda number, problem: problems.append(number)) == 2
+    assert problems == [4] # the first line of the second record
+    with PositionDB(filename) as db:
+        assert len(db) == 2 and db.lookup(read_board("board_examp.txt")) is not None
+
+def test_text_to_db_errors(tmp_path): # parse and pack errors reach the same handler, by file and line
+    first, second = tmp_path / "first.txt", tmp_path / "second.txt"
+    first.write_text("5; Ka1; Ke5\nnonsense\n")
+    crowded = next(text for name, text, *_ in REFERENCE_POSITIONS if name == "bishops_26")
+    second.write_text("5; Ka1; Ke5\n" + crowded + "\n")
+    problems = []
+    count = text_to_db([str(first), str(second)], str(tmp_path / "positions.db"), 6,
+                       lambda number, problem: problems.append((number, problem.split(":")[0])))
+    assert count == 2
+    assert problems == [(2, str(first)), (2, str(second))]
+
+def test_write_position_db_failure(tmp_path): # a conversion that fails leaves the previous database and no temporary files
+    filename = str(tmp_path / "positions.db")
+    write_position_db(filename, sample_boards(), 6)
+    def failing():
+        yield read_board("board_examp.txt")
+        raise OSError("disk full")
+    with pytest.raises(OSError):
+        write_position_db(filename, failing(), 6)
+    assert sorted(os.listdir(tmp_path)) == ["positions.db", "positions.db" + INDEX_SUFFIX]
+    with PositionDB(filename) as db:
+        assert len(db) == 41
+
+def test_db_to_text(tmp_path): # a database back to text that read_boards reads
+    filename = str(tmp_path / "positions.db")
+    boards = sample_boards()
+    write_position_db(filename, boards, 6)
+    text = tmp_path / "positions.txt"
+    assert db_to_text(filename, str(text)) == 41
+    assert [pieces_of(B) for B in read_boards(text)] == [pieces_of(B) for B in boards]
+
+def test_export_board(tmp_path): # one record as a board file for read_board
+    filename = str(tmp_path / "positions.db")
+    write_position_db(filename, sample_boards(), 6)
+    exported = tmp_path / "board.txt"
+    export_board(filename, 0, str(exported))
+    assert pieces_of(read_board(exported)) == pieces_of(read_board("board_examp.txt"))
+
+def test_main(tmp_path, capsys): # the command line converts both ways
+    filename = str(tmp_path / "positions.db")
+    text = str(tmp_path / "positions.txt")
+    assert main(["to-db", "board_examp.txt", "-o", filename]) == 0
+    assert main(["to-text", filename, "-o", text, "--one-line"]) == 0
+    assert capsys.readouterr().out.splitlines() == [f"1 positions written to {filename}.", f"1 positions written to {text}."]
+    with open(text) as f:
+        assert f.read().count("\n") == 1
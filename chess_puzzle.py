@@ -1,27 +1,62 @@
-import copy 
 import logging
-
-logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.DEBUG)
+import random
+import re
+from collections.abc import Callable, Iterator
+
+from chess_geometry import geometry
+
+logger = logging.getLogger(__name__)
+
+# Debug logging is off by default. Hot paths test DEBUG before building a log message,
+# so nothing is formatted when it is off, and importing the module leaves the root
+# logger alone. Switch it on and off with set_debug.
+DEBUG = False
+_debug_handler = None
+
+def set_debug(enabled: bool = True) -> None:
+    global DEBUG, _debug_handler
+    DEBUG = enabled
+    if enabled:
+        logger.setLevel(logging.DEBUG)
+        if _debug_handler is None:
+            _debug_handler = logging.StreamHandler()
+            _debug_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+            logger.addHandler(_debug_handler)
+    else:
+        logger.setLevel(logging.NOTSET)
+        if _debug_handler is not None:
+            logger.removeHandler(_debug_handler)
+            _debug_handler = None
 
 def location2index(loc: str) -> tuple[int, int]:
     # From a location string, convert letter -> x, number -> y (board indexing starts at 1,1).
     x = ord(loc[0]) - ord('a') + 1
     y = int(loc[1:])
 
-    logging.debug(f"{loc} has been converted to {x, y}.")
+    if DEBUG:
+        logger.debug(f"{loc} has been converted to {x, y}.")
     return (x, y)
 	
 def index2location(x: int, y: int) -> str:
     # From tuple of x, y, convert x -> letter, y -> number.
     letter = chr(x + ord('a') - 1)
 
-    logging.debug(f"{x, y} has been converted to {letter}{y}.")
+    if DEBUG:
+        logger.debug(f"{x, y} has been converted to {letter}{y}.")
     return f"{letter}{y}" # Location string. 
 
+def parse_move(move: str) -> tuple[tuple[int, int], tuple[int, int]]:
+    # From a move string such as a1b2 or a10b10 (start location, then end location), the two (x, y) squares.
+    match = re.fullmatch(r"([a-z][0-9]+)([a-z][0-9]+)", move.strip())
+    if match is None:
+        raise ValueError(f"{move!r} is not a move.")
+    return location2index(match[1]), location2index(match[2])
+
 class Piece:
     pos_x : int	
     pos_y : int
     side : bool #True for White and False for Black
+    __slots__ = ("pos_x", "pos_y", "side") # No per-piece __dict__: smaller pieces, faster copies.
     
     def __init__(self, pos_X : int, pos_Y : int, side_ : bool):
         self.pos_x = pos_X
@@ -39,29 +74,241 @@ class Piece:
 
 Board = tuple[int, list[Piece]]
 
+# Zobrist hashing: one random 64-bit key per (piece type, colour, square), per board size and
+# for "Black to move". The keys come from a fixed seed per board size, so a position hashes to
+# the same value in every process and run (worker pools and on-disk caches rely on this).
+ZOBRIST_SEED = 20240526
+_zobrist_keys = {} # Board size -> (size key, side-to-move key, keys[kind][square]).
+
+def zobrist_keys(S: int) -> tuple[int, int, list[list[int]]]:
+    if S not in _zobrist_keys:
+        if not 3 <= S <= 26:
+            raise ValueError(f"Board size must be between 3 and 26, not {S}.")
+        rng = random.Random(ZOBRIST_SEED + S)
+        size_key = rng.getrandbits(64)
+        side_key = rng.getrandbits(64)
+        # kind = 2 * is_king + side: black bishop, white bishop, black king, white king.
+        piece_keys = [[rng.getrandbits(64) for _ in range(S * S)] for _ in range(4)]
+        _zobrist_keys[S] = (size_key, side_key, piece_keys)
+    return _zobrist_keys[S]
+
+def piece_key(piece: Piece, S: int) -> int:
+    kind = 2 * isinstance(piece, King) + piece.side
+    return zobrist_keys(S)[2][kind][(piece.pos_y - 1) * S + (piece.pos_x - 1)]
+
+def zobrist_hash(B: Board, side_to_move: bool = True) -> int:
+    # Hash of a position computed from scratch; an IndexedBoard keeps the same value
+    # up to date in B.hash as pieces move.
+    size_key, side_key, _ = zobrist_keys(B[0])
+    h = size_key if side_to_move else size_key ^ side_key
+    for piece in B[1]:
+        h ^= piece_key(piece, B[0])
+    return h
+
+class IndexedBoard(tuple):
+    # A board that is still the (S, pieces) pair, so B[0], B[1] and unpacking keep working,
+    # but also keeps a square -> piece index in sync with the piece list for O(1) lookups.
+    # Pieces on an indexed board must be moved, captured and placed through the methods below
+    # (move_to does this), otherwise the index no longer matches the piece positions.
+    #
+    # It also keeps an attack map: attackers[square] is the set of pieces attacking that square
+    # (own pieces included, i.e. defended squares count) and attack_counts[side][square] is
+    # how many pieces of side attack it. When a square is emptied or filled only the bishops
+    # whose rays end on it are recomputed, so is_check is a single lookup of the king's square.
+    #
+    # Finally it knows the side to move and keeps the Zobrist hash of the position in hash,
+    # updated with a few XORs per move instead of rehashing every piece.
+    def __new__(cls, S: int, pieces: list[Piece], side_to_move: bool = True):
+        board = super().__new__(cls, (S, pieces))
+        board.side_to_move = side_to_move
+        board.hash = zobrist_hash((S, pieces), side_to_move)
+        board.squares = {(piece.pos_x, piece.pos_y): piece for piece in pieces}
+        board.kings = {piece.side: piece for piece in pieces if isinstance(piece, King)}
+        board.attacks = {} # piece -> squares it attacks
+        board.attackers = {} # square -> pieces attacking it
+        board.attack_counts = ({}, {}) # [side][square] -> number of attackers of that side
+        for piece in pieces:
+            board._add_attacks(piece)
+        return board
+
+    def __getnewargs__(self):
+        # Needed so copy/deepcopy/pickle rebuild the board with the (S, pieces) signature.
+        return (self[0], self[1], self.side_to_move)
+
+    def _attacked_squares(self, piece: Piece) -> list[tuple[int, int]]:
+        # Squares a piece attacks from where it stands: the king's neighbourhood, or each
+        # diagonal of a bishop up to and including the first piece on it.
+        geo = geometry(self[0])
+        square = (piece.pos_x, piece.pos_y)
+        if isinstance(piece, King):
+            return list(geo.neighbours[square])
+
+        squares = []
+        for ray in geo.rays[square]:
+            for target in ray:
+                squares.append(target)
+                if target in self.squares:
+                    break
+        return squares
+
+    def _add_attacks(self, piece: Piece) -> None:
+        squares = self._attacked_squares(piece)
+        self.attacks[piece] = squares
+        counts = self.attack_counts[piece.side]
+        for square in squares:
+            self.attackers.setdefault(square, set()).add(piece)
+            counts[square] = counts.get(square, 0) + 1
+
+    def _remove_attacks(self, piece: Piece) -> None:
+        counts = self.attack_counts[piece.side]
+        for square in self.attacks.pop(piece):
+            self.attackers[square].discard(piece)
+            counts[square] -= 1
+
+    def _sliders_through(self, *squares: tuple[int, int]) -> set[Piece]:
+        # Bishops whose rays end on (or pass) one of these squares; their attacks change
+        # when the occupancy of the squares changes.
+        sliders = set()
+        for square in squares:
+            for piece in self.attackers.get(square, ()):
+                if not isinstance(piece, King):
+                    sliders.add(piece)
+        return sliders
+
+    def move_piece(self, piece: Piece, pos_X: int, pos_Y: int) -> None:
+        # Move a piece to an empty square, keeping the index and the attack map in sync.
+        origin = (piece.pos_x, piece.pos_y)
+        sliders = self._sliders_through(origin, (pos_X, pos_Y))
+        sliders.discard(piece)
+        self._remove_attacks(piece)
+        for slider in sliders:
+            self._remove_attacks(slider)
+
+        del self.squares[origin]
+        self.hash ^= piece_key(piece, self[0])
+        piece.pos_x, piece.pos_y = pos_X, pos_Y
+        self.hash ^= piece_key(piece, self[0])
+        self.squares[(pos_X, pos_Y)] = piece
+
+        self._add_attacks(piece)
+        for slider in sliders:
+            self._add_attacks(slider)
+
+    def pop_piece(self, index: int) -> Piece:
+        # Remove the (captured) piece at position index of the piece list from the list and the index.
+        piece = self[1].pop(index)
+        square = (piece.pos_x, piece.pos_y)
+        sliders = self._sliders_through(square)
+        self._remove_attacks(piece)
+        for slider in sliders:
+            self._remove_attacks(slider)
+        del self.squares[square]
+        self.hash ^= piece_key(piece, self[0])
+        if self.kings.get(piece.side) is piece:
+            del self.kings[piece.side]
+        for slider in sliders:
+            self._add_attacks(slider)
+        return piece
+
+    def insert_piece(self, index: int, piece: Piece) -> None:
+        # Put a piece back at position index of the piece list, e.g. when a capture is undone.
+        square = (piece.pos_x, piece.pos_y)
+        sliders = self._sliders_through(square)
+        for slider in sliders:
+            self._remove_attacks(slider)
+        self[1].insert(index, piece)
+        self.squares[square] = piece
+        self.hash ^= piece_key(piece, self[0])
+        if isinstance(piece, King):
+            self.kings[piece.side] = piece
+        self._add_attacks(piece)
+        for slider in sliders:
+            self._add_attacks(slider)
+
+    def switch_side(self) -> None:
+        # Hand the move to the other side.
+        self.side_to_move = not self.side_to_move
+        self.hash ^= zobrist_keys(self[0])[1]
+
+    def is_attacked(self, pos_X: int, pos_Y: int, side: bool) -> bool:
+        # Whether a piece of side attacks the square (x, y).
+        return self.attack_counts[side].get((pos_X, pos_Y), 0) > 0
+
+def as_indexed(B: Board, side_to_move: bool = True) -> IndexedBoard:
+    # Wrap a plain (S, pieces) tuple in an IndexedBoard; indexed boards are returned as they are.
+    if isinstance(B, IndexedBoard):
+        return B
+    return IndexedBoard(B[0], B[1], side_to_move)
+
 def is_piece_at(pos_X : int, pos_Y : int, B: Board) -> bool:
+    if isinstance(B, IndexedBoard):
+        return (pos_X, pos_Y) in B.squares
+
     for piece in B[1]:
         if piece.pos_x == pos_X and piece.pos_y == pos_Y: 
-            logging.debug(f"There is a piece at {pos_X, pos_Y}.")
+            if DEBUG:
+                logger.debug(f"There is a piece at {pos_X, pos_Y}.")
             return True
         
-    logging.debug(f"There is not a piece at {pos_X, pos_Y}.")
+    if DEBUG:
+        logger.debug(f"There is not a piece at {pos_X, pos_Y}.")
     return False
 
 def piece_at(pos_X : int, pos_Y : int, B: Board) -> Piece:
+    if isinstance(B, IndexedBoard):
+        return B.squares.get((pos_X, pos_Y))
+
     for piece in B[1]:
         if piece.pos_x == pos_X and piece.pos_y == pos_Y:
-            logging.debug(f"Piece at {pos_X, pos_Y}: {piece}.")
+            if DEBUG:
+                logger.debug(f"Piece at {pos_X, pos_Y}: {piece}.")
             return piece
     return None
 
+# Undo record of make_move: (moved piece, its original x, its original y,
+# captured piece or None, index of the captured piece in B[1] or -1).
+Undo = tuple[Piece, int, int, Piece, int]
+
+def make_move(piece: Piece, pos_X: int, pos_Y: int, B: Board) -> Undo:
+    # Move a piece in place, capturing whatever stands on the destination, and return what
+    # unmake_move needs to restore the board. The move is not checked against the rules.
+    captured_piece = piece_at(pos_X, pos_Y, B)
+    captured_index = -1
+    if captured_piece is not None:
+        captured_index = B[1].index(captured_piece)
+        if isinstance(B, IndexedBoard):
+            B.pop_piece(captured_index)
+        else:
+            B[1].pop(captured_index)
+
+    undo = (piece, piece.pos_x, piece.pos_y, captured_piece, captured_index)
+    if isinstance(B, IndexedBoard):
+        B.move_piece(piece, pos_X, pos_Y)
+        B.switch_side()
+    else:
+        piece.pos_x, piece.pos_y = pos_X, pos_Y
+    return undo
+
+def unmake_move(undo: Undo, B: Board) -> None:
+    # Take back a move made with make_move; moves must be undone in reverse order.
+    piece, from_x, from_y, captured_piece, captured_index = undo
+    if isinstance(B, IndexedBoard):
+        B.switch_side()
+        B.move_piece(piece, from_x, from_y)
+        if captured_piece is not None:
+            B.insert_piece(captured_index, captured_piece)
+    else:
+        piece.pos_x, piece.pos_y = from_x, from_y
+        if captured_piece is not None:
+            B[1].insert(captured_index, captured_piece)
+
 class Bishop(Piece):
+    __slots__ = ()
+
     def __init__(self, pos_X : int, pos_Y : int, side_ : bool):
         super().__init__(pos_X, pos_Y, side_)
-        if side_ :
-            logging.debug(f"A white bishop has been created at {pos_X, pos_Y}.")
-        else:
-            logging.debug(f"A black bishop has been created at {pos_X, pos_Y}.")
+        if DEBUG:
+            logger.debug(f"A {'white' if side_ else 'black'} bishop has been created at {pos_X, pos_Y}.")
 	
     def can_reach(self, pos_X : int, pos_Y : int, B: Board) -> bool:
         # Bishop movement capabilities (diagonal movement only).
@@ -69,53 +316,51 @@ class Bishop(Piece):
         dy = abs(self.pos_y - pos_Y)
 
         # Check if movement is within bishop's movement capabilities. 
-        if dx != dy:
-            logging.debug(f"Bishop cannot reach ({pos_X}, {pos_Y}) from ({self.pos_x}, {self.pos_y}) - not a diagonal movement.")
+        if dx != dy or dx == 0:
+            if DEBUG:
+                logger.debug(f"Bishop cannot reach ({pos_X}, {pos_Y}) from ({self.pos_x}, {self.pos_y}) - not a diagonal movement.")
             return False      
 
         # Check if movement is on the board. 
-        if not (1 <= pos_X <= B[0] and 1 <= pos_Y <= B[0]):
-            logging.debug(f"Bishop cannot reach ({pos_X}, {pos_Y}) - out of board bounds.")
+        if not geometry(B[0]).on_board(pos_X, pos_Y):
+            if DEBUG:
+                logger.debug(f"Bishop cannot reach ({pos_X}, {pos_Y}) - out of board bounds.")
             return False        
 
-        # Check if there is another piece in the way of the final destination. 
-            # Determine the direction of the bishop's movement.
-        x_step = 1 if pos_X > self.pos_x else -1
-        y_step = 1 if pos_Y > self.pos_y else -1
-            # Check that each square in the path to the final destination is clear. 
-        x, y = self.pos_x + x_step, self.pos_y + y_step
-
-        while x != pos_X or y != pos_Y: # While the bishop is not yet at the final destination,   
+        # Check if there is another piece in the way of the final destination, 
+        # on the squares between the two that the geometry tables list.
+        for x, y in geometry(B[0]).between[((self.pos_x, self.pos_y), (pos_X, pos_Y))]:
             if is_piece_at(x, y, B):
-                logging.debug(f"Bishop blocked at ({x}, {y}) while moving to ({pos_X}, {pos_Y}).")
+                if DEBUG:
+                    logger.debug(f"Bishop blocked at ({x}, {y}) while moving to ({pos_X}, {pos_Y}).")
                 return False
-            x += x_step # check the next square in the path. 
-            y += y_step 
         
         # Check that the final destination is either empty or not of the same side. 
         if is_piece_at(pos_X, pos_Y, B):
             target_piece = piece_at(pos_X, pos_Y, B)
             if target_piece.side == self.side:
-                logging.debug(f"Bishop blocked by own piece at ({pos_X}, {pos_Y}).")
+                if DEBUG:
+                    logger.debug(f"Bishop blocked by own piece at ({pos_X}, {pos_Y}).")
                 return False
-            logging.debug(f"Bishop can capture {target_piece} at ({pos_X}, {pos_Y}).")
+            if DEBUG:
+                logger.debug(f"Bishop can capture {target_piece} at ({pos_X}, {pos_Y}).")
 
-        logging.debug(f"Bishop at ({self.pos_x}, {self.pos_y}) can reach ({pos_X}, {pos_Y}).")
+        if DEBUG:
+            logger.debug(f"Bishop at ({self.pos_x}, {self.pos_y}) can reach ({pos_X}, {pos_Y}).")
         return True # The bishop can reach the destination.  
 
     def can_move_to(self, pos_X : int, pos_Y : int, B: Board) -> bool:
         # Do not allow a bishop to move to its current position.
         if self.pos_x == pos_X and self.pos_y == pos_Y:
-            logging.debug(
-                f"{self.__class__.__name__} at ({self.pos_x}, {self.pos_y}) cannot move to its current position.")
+            if DEBUG:
+                logger.debug(
+                    f"{self.__class__.__name__} at ({self.pos_x}, {self.pos_y}) cannot move to its current position.")
             return False
 
-        # Backup the piece list. 
-        B = copy.deepcopy(B)
-
         # Firstly, check if the bishop cannot reach (per can_reach method).
         if not self.can_reach(pos_X, pos_Y, B):
-            logging.debug(f"Bishop cannot reach ({pos_X}, {pos_Y}).")
+            if DEBUG:
+                logger.debug(f"Bishop cannot reach ({pos_X}, {pos_Y}).")
             return False
         
         # Secondly, check if the result of the move is a capture,
@@ -124,366 +369,547 @@ class Bishop(Piece):
         if is_piece_at(pos_X, pos_Y, B):
             captured_piece = piece_at(pos_X, pos_Y, B)
             if captured_piece.side == self.side:
-                logging.debug(f"Bishop cannot capture own piece at ({pos_X}, {pos_Y}).")
+                if DEBUG:
+                    logger.debug(f"Bishop cannot capture own piece at ({pos_X}, {pos_Y}).")
                 return False # Cannot capture a piece of the same side.
 
-        # Store the original position.
-        original_pos_x, original_pos_y = self.pos_x, self.pos_y
-        self.pos_x, self.pos_y = pos_X, pos_Y
-        
-        # Handle a capture, if any.
-        if captured_piece: 
-            B = (B[0], [p for p in B[1] if p != captured_piece])
-
-        # Check for check.
-        if is_check(self.side, B):
-            # Restore the original position of the board.
-            self.pos_x, self.pos_y = original_pos_x, original_pos_y
+        # Thirdly, check [Rule4] with the check and pin analysis of the position,
+        # so the move does not have to be played and tested with is_check.
+        if not bishop_move_allowed(self, pos_X, pos_Y, check_analysis(self.side, B)):
+            if DEBUG:
+                logger.debug(f"Bishop move to ({pos_X}, {pos_Y}) would leave its King in check.")
             return False
-        
-        # Restore the original position of the board.
-        self.pos_x, self.pos_y = original_pos_x, original_pos_y
 
-        logging.debug(f"Bishop at ({self.pos_x}, {self.pos_y}) can move to ({pos_X}, {pos_Y}).")
+        if DEBUG:
+            logger.debug(f"Bishop at ({self.pos_x}, {self.pos_y}) can move to ({pos_X}, {pos_Y}).")
         return True # The bishop can move to the new location.
 
     def move_to(self, pos_X : int, pos_Y : int, B: Board) -> Board:
         # Check if the bishop can move to the new location.
         if not self.can_move_to(pos_X, pos_Y, B):
-            logging.debug(f"Bishop cannot move to ({pos_X}, {pos_Y}).")
+            if DEBUG:
+                logger.debug(f"Bishop cannot move to ({pos_X}, {pos_Y}).")
             return B
         
-        # Remove the captured piece, if any. 
-        captured_piece = None
-        if is_piece_at(pos_X, pos_Y, B): # There is an enemy piece (do not have to specify if self or not because can_reach check already does this).
-            captured_piece = piece_at(pos_X, pos_Y, B)
-            B[1].remove(captured_piece)
-            logging.debug(f"The bishop has captured {captured_piece} at {pos_X, pos_Y}. The piece is {captured_piece}.")
-
-        # Move the bishop to the new position. 
-        self.pos_x = pos_X
-        self.pos_y = pos_Y 
-        logging.debug(f"You have moved your bishop to: {pos_X, pos_Y}.")
+        # Move the bishop to the new position, removing the captured piece, if any
+        # (it is an enemy piece because the can_reach check already rules out own pieces).
+        captured_piece = make_move(self, pos_X, pos_Y, B)[3]
+        if DEBUG and captured_piece:
+            logger.debug(f"The bishop has captured {captured_piece} at {pos_X, pos_Y}. The piece is {captured_piece}.")
+        if DEBUG:
+            logger.debug(f"You have moved your bishop to: {pos_X, pos_Y}.")
 
         return B # return the new board
 
 class King(Piece):
+    __slots__ = ()
+
     def __init__(self, pos_X : int, pos_Y : int, side_ : bool):
         super().__init__(pos_X, pos_Y, side_)
-        if side_:
-            logging.debug(f"A white king has been created at {pos_X, pos_Y}.")
-        else:
-            logging.debug(f"A black king has been created at {pos_X, pos_Y}.")
+        if DEBUG:
+            logger.debug(f"A {'white' if side_ else 'black'} king has been created at {pos_X, pos_Y}.")
 
     def can_reach(self, pos_X : int, pos_Y : int, B: Board) -> bool:
-        # King's movement capabilities (1 tile at a time, in any direction).
-        dx = abs(self.pos_x - pos_X)
-        dy = abs(self.pos_y - pos_Y)
-
-        # Check if the movement is within the king's movement capabilities.
-        if dx > 1 or dy > 1:
-            logging.debug(f"King cannot reach ({pos_X}, {pos_Y}) from ({self.pos_x}, {self.pos_y}) - not a valid king movement type.")
+        # King's movement capabilities (1 tile at a time, in any direction), which the
+        # neighbourhood table of the geometry module lists for every square of the board.
+        if (pos_X, pos_Y) not in geometry(B[0]).neighbour_sets[(self.pos_x, self.pos_y)]:
+            if DEBUG:
+                logger.debug(f"King cannot reach ({pos_X}, {pos_Y}) from ({self.pos_x}, {self.pos_y}) - not a king step on the board.")
             return False
-
-        # Check if movement is on the board. 
-        if not (1 <= pos_X <= B[0] and 1 <= pos_Y <= B[0]):
-            logging.debug(f"King cannot reach ({pos_X}, {pos_Y}) - out of board bounds.")
-            return False 
         
         # Check that the final destination is either empty or not of the same side. 
         if is_piece_at(pos_X, pos_Y, B):
             target_piece = piece_at(pos_X, pos_Y, B)
             if target_piece.side == self.side:
-                logging.debug(f"King blocked by own piece at ({pos_X}, {pos_Y}).")
+                if DEBUG:
+                    logger.debug(f"King blocked by own piece at ({pos_X}, {pos_Y}).")
                 return False
-            logging.debug(f"King can capture {target_piece} at ({pos_X}, {pos_Y}).")
+            if DEBUG:
+                logger.debug(f"King can capture {target_piece} at ({pos_X}, {pos_Y}).")
 
-        logging.debug(f"Bishop at ({self.pos_x}, {self.pos_y}) can reach ({pos_X}, {pos_Y}).")
+        if DEBUG:
+            logger.debug(f"Bishop at ({self.pos_x}, {self.pos_y}) can reach ({pos_X}, {pos_Y}).")
         return True # The king can reach the destination.
 
     def can_move_to(self, pos_X : int, pos_Y : int, B: Board) -> bool:
         # Do not allow a king to move to its current position.
         if self.pos_x == pos_X and self.pos_y == pos_Y:
-            logging.debug(
-                f"{self.__class__.__name__} at ({self.pos_x}, {self.pos_y}) cannot move to its current position.")
+            if DEBUG:
+                logger.debug(
+                    f"{self.__class__.__name__} at ({self.pos_x}, {self.pos_y}) cannot move to its current position.")
             return False
         
-        # Backup the pieces list.
-        B = copy.deepcopy(B)
-            
         # Firstly, check if the king cannot reach (per can_reach method).
         if not self.can_reach(pos_X, pos_Y, B):
-            logging.debug(f"King cannot reach ({pos_X}, {pos_Y}).")
+            if DEBUG:
+                logger.debug(f"King cannot reach ({pos_X}, {pos_Y}).")
             return False
 
+        # On an indexed board the attack map decides without simulating the move: the king
+        # may not step onto a square the enemy attacks (which includes the squares next to
+        # the enemy king), nor stay on the diagonal of a checking bishop behind itself,
+        # because the king hides that square from the map while it stands in the way.
+        if isinstance(B, IndexedBoard):
+            enemy_king = B.kings.get(not self.side)
+            if enemy_king is not None and (enemy_king.pos_x, enemy_king.pos_y) == (pos_X, pos_Y):
+                return False
+            if B.is_attacked(pos_X, pos_Y, not self.side):
+                if DEBUG:
+                    logger.debug(f"King cannot move to the attacked square ({pos_X}, {pos_Y}).")
+                return False
+            king = (self.pos_x, self.pos_y)
+            for attacker in B.attackers.get(king, ()):
+                if attacker.side != self.side and isinstance(attacker, Bishop):
+                    # The bishop's ray through the king goes on to the square behind it.
+                    ray = next(ray for ray in geometry(B[0]).rays[(attacker.pos_x, attacker.pos_y)] if king in ray)
+                    behind = ray.index(king) + 1
+                    if behind < len(ray) and ray[behind] == (pos_X, pos_Y):
+                        if DEBUG:
+                            logger.debug(f"King cannot move along the checking diagonal to ({pos_X}, {pos_Y}).")
+                        return False
+            if DEBUG:
+                logger.debug(f"King at ({self.pos_x}, {self.pos_y}) can move to ({pos_X}, {pos_Y}).")
+            return True
+
         # King can not move next to a king. 
         for piece in B[1]:
             if isinstance(piece, King) and piece.side != self.side:
-                if abs(piece.pos_x - pos_X) <= 1 and abs(piece.pos_y - pos_Y) <= 1:
-                    logging.debug(f"King cannot move next to an enemy king.")
+                enemy_square = (piece.pos_x, piece.pos_y)
+                if (pos_X, pos_Y) == enemy_square or (pos_X, pos_Y) in geometry(B[0]).neighbour_sets[enemy_square]:
+                    if DEBUG:
+                        logger.debug(f"King cannot move next to an enemy king.")
                     return False
                 
-        # Store the original position. 
-        original_pos_x, original_pos_y = self.pos_x, self.pos_y
-        self.pos_x, self.pos_y = pos_X, pos_Y
-
-        # Handle a capture, if any. 
-        captured_piece = None
-        if is_piece_at(pos_X, pos_Y, B): # There is an enemy piece. 
-            captured_piece = piece_at(pos_X, pos_Y, B)
-            B[1].remove(captured_piece)
-
-        # Finally, check if the new configuration puts one's own king in check,
-        # if yes, king in check, return False because invalid move.
-        if is_check(self.side, B):
-            # Restore the original position if it causes a check.
-            self.pos_x, self.pos_y = original_pos_x, original_pos_y
+        # Finally, check that no enemy bishop attacks the destination once the king has left
+        # its square. If the king is in check there, return False because invalid move.
+        if is_square_attacked(pos_X, pos_Y, not self.side, B, ignore=self):
             return False
 
-        # Restore original position after the simulation.
-        self.pos_x, self.pos_y = original_pos_x, original_pos_y
-
-        logging.debug(f"King at ({self.pos_x}, {self.pos_y}) can move to ({pos_X}, {pos_Y}).")
+        if DEBUG:
+            logger.debug(f"King at ({self.pos_x}, {self.pos_y}) can move to ({pos_X}, {pos_Y}).")
         return True # The king can move to the new location.
 
     def move_to(self, pos_X : int, pos_Y : int, B: Board) -> Board:
         # Check if the king can move to the new location.
         if not self.can_move_to(pos_X, pos_Y, B):
-            logging.debug(f"King cannot move to ({pos_X}, {pos_Y}).")
+            if DEBUG:
+                logger.debug(f"King cannot move to ({pos_X}, {pos_Y}).")
             return B
         
-        # Remove the captured piece, if any. 
-        captured_piece = None
-        if is_piece_at(pos_X, pos_Y, B): # There is an enemy piece. 
-            captured_piece = piece_at(pos_X, pos_Y, B)
-            B[1].remove(captured_piece) 
-            logging.debug(f"The king has captured a piece at {pos_X, pos_Y}. The piece is {captured_piece}")
-
-        # Move the king to the new location.
-        self.pos_x = pos_X
-        self.pos_y = pos_Y
-        logging.debug(f"You have moved your king to: {pos_X, pos_Y}.")
+        # Move the king to the new location, removing the captured piece, if any.
+        captured_piece = make_move(self, pos_X, pos_Y, B)[3]
+        if DEBUG and captured_piece:
+            logger.debug(f"The king has captured a piece at {pos_X, pos_Y}. The piece is {captured_piece}")
+        if DEBUG:
+            logger.debug(f"You have moved your king to: {pos_X, pos_Y}.")
 
         return B # return the new board        
 
+def find_king(side: bool, B: Board) -> King:
+    king = B.kings.get(side) if isinstance(B, IndexedBoard) else next(
+        (p for p in B[1] if p.side == side and isinstance(p, King)), None)
+    if king is None:
+        raise ValueError("Could not find a king on the board. Check configuration text file.")
+    return king
+
 def is_check(side: bool, B: Board) -> bool:
+    # An indexed board keeps its attack map up to date, so this is a single lookup.
+    if isinstance(B, IndexedBoard):
+        king = find_king(side, B)
+        return B.is_attacked(king.pos_x, king.pos_y, not side)
+
     # Step 1, find the King's position. 
+    king_location = None
     for piece in B[1]:
         if piece.side == side and isinstance(piece, King):
             king_location = (piece.pos_x, piece.pos_y)
-            logging.debug(f"King located at: {king_location}.")
+            if DEBUG:
+                logger.debug(f"King located at: {king_location}.")
             break
 
     if not king_location:
         raise ValueError("Could not find a king on the board. Check configuration text file.")
 
     # Step 2, check if any enemy piece can reach the King's position.
+    # A piece that is itself pinned still gives check, so can_reach is enough here.
     for piece in B[1]:
         if piece.side != side:
-            if piece.can_move_to(king_location[0], king_location[1], B):
-                logging.debug(
-                    f"{piece.__class__.__name__} at {(piece.pos_x, piece.pos_y)} threatens the King at {king_location}")
+            if piece.can_reach(king_location[0], king_location[1], B):
+                if DEBUG:
+                    logger.debug(
+                        f"{piece.__class__.__name__} at {(piece.pos_x, piece.pos_y)} threatens the King at {king_location}")
                 return True
             else:
-                logging.debug(
-                    f"{piece.__class__.__name__} at: {(piece.pos_x, piece.pos_y)} does not threaten the King at {king_location}")
+                if DEBUG:
+                    logger.debug(
+                        f"{piece.__class__.__name__} at: {(piece.pos_x, piece.pos_y)} does not threaten the King at {king_location}")
 
-    logging.debug("Board state is not in check for either side.")
+    if DEBUG:
+        logger.debug("Board state is not in check for either side.")
     return False # No threats to the King. 
 
-def is_checkmate(side: bool, B: Board) -> bool:
-    # Step 1, check if the King is in check; if not, return False.
-    if not is_check(side, B):
-        return False
-
-    all_squares = [(x, y) for x in range(1, B[0] + 1) for y in range(1, B[0] + 1)]
-
-    # Step 2, check for possible moves to get out of check. 
-    for piece in B[1]: # For pieces in the piece list, 
-        if piece.side == side: # if the piece is on the same side of the king,
-            for x, y in all_squares: # check all squares on the board.
-                # Backup the pieces list before simulating the move.
-                original_pieces = B[1][:]
+def is_square_attacked(pos_X: int, pos_Y: int, by_side: bool, B: Board, ignore: Piece = None) -> bool:
+    # Whether a piece of by_side attacks the square (x, y), looking along the diagonals from
+    # the square itself. The ignored piece (the king that is about to move) is treated as if
+    # it had already left its square, so it does not shield the square behind it.
+    geo = geometry(B[0])
+    for ray in geo.rays[(pos_X, pos_Y)]:
+        for x, y in ray:
+            piece = piece_at(x, y, B)
+            if piece is not None and piece is not ignore:
+                if piece.side == by_side and isinstance(piece, Bishop):
+                    return True
+                break
 
-                if piece.can_move_to(x, y, B): # If (same side) piece can move to a square,
-                    # temporarily move the piece and check if the move results in check.
-                    hypothetical_board = (B[0], original_pieces) # Create a new board with the original pieces.
-                    hypothetical_piece = piece_at(piece.pos_x, piece.pos_y, hypothetical_board)
+    for piece in (B.kings.get(by_side),) if isinstance(B, IndexedBoard) else B[1]:
+        if isinstance(piece, King) and piece.side == by_side:
+            return (piece.pos_x, piece.pos_y) in geo.neighbour_sets[(pos_X, pos_Y)]
+    return False
 
-                    # Move the piece on the hypothetical board. 
-                    hypothetical_piece.move_to(x, y, hypothetical_board)
+# Result of check_analysis: (enemy bishops giving check,
+# squares that answer a single check by blocking or capturing, or None when not in check,
+# own pinned piece -> squares of its pin line including the pinning bishop).
+CheckAnalysis = tuple[list[Piece], set[tuple[int, int]], dict[Piece, set[tuple[int, int]]]]
+
+def check_analysis(side: bool, B: Board) -> CheckAnalysis:
+    # One walk along the four diagonals of side's king finds the checking bishops, the
+    # squares that block the check, and the own pieces pinned to the king, so legal moves
+    # can be filtered with set tests instead of playing each one and calling is_check.
+    king = find_king(side, B)
+    checkers = []
+    block_squares = None
+    pins = {}
+    for ray in geometry(B[0]).rays[(king.pos_x, king.pos_y)]:
+        line = set()
+        shield = None # The first own piece on this diagonal, if any.
+        for x, y in ray:
+            piece = piece_at(x, y, B)
+            line.add((x, y))
+            if piece is not None:
+                if piece.side == side:
+                    if shield is not None:
+                        break # Two own pieces: nothing behind them matters.
+                    shield = piece
+                elif isinstance(piece, Bishop):
+                    if shield is None:
+                        checkers.append(piece)
+                        block_squares = line
+                    else:
+                        pins[shield] = line - {(shield.pos_x, shield.pos_y)}
+                    break
+                else:
+                    break # The enemy king does not pin or give check along a diagonal.
+    return (checkers, block_squares, pins)
+
+def bishop_move_allowed(piece: Piece, pos_X: int, pos_Y: int, analysis: CheckAnalysis) -> bool:
+    # [Rule4] for a reachable move of a non-king piece: with two checkers only the king may
+    # move, a single check must be blocked or its bishop captured, and a pinned piece must
+    # stay on its pin line.
+    checkers, block_squares, pins = analysis
+    if len(checkers) > 1:
+        return False
+    if checkers and (pos_X, pos_Y) not in block_squares:
+        return False
+    return piece not in pins or (pos_X, pos_Y) in pins[piece]
+
+def generate_legal_moves(side: bool, B: Board, analysis: CheckAnalysis = None):
+    # Yield every legal move (piece, x, y) of side. Bishops walk their four diagonals until
+    # they are blocked and kings try their eight neighbours, so only real moves are tested
+    # for [Rule4] and the cost grows with the mobility of the pieces, not the board area.
+    # The check and pin analysis is done once for the position, so the board may be changed
+    # between two moves only if it is restored (make/unmake) before the next one is asked for.
+    # An analysis the caller already made for this position may be passed in.
+    geo = geometry(B[0])
+    if analysis is None:
+        analysis = check_analysis(side, B)
+    double_check = len(analysis[0]) > 1
+    for piece in [p for p in B[1] if p.side == side]:
+        if double_check and not isinstance(piece, King):
+            continue # Only the king can answer a double check.
+        if isinstance(piece, King):
+            for x, y in geo.neighbours[(piece.pos_x, piece.pos_y)]:
+                if piece.can_move_to(x, y, B):
+                    yield (piece, x, y)
+            continue
+
+        for ray in geo.rays[(piece.pos_x, piece.pos_y)]:
+            for x, y in ray:
+                target_piece = piece_at(x, y, B)
+                if target_piece is not None and target_piece.side == side:
+                    break # Blocked by own piece.
+                if bishop_move_allowed(piece, x, y, analysis):
+                    yield (piece, x, y)
+                if target_piece is not None:
+                    break # A capture ends the diagonal.
+
+def generate_captures(side: bool, B: Board, analysis: CheckAnalysis = None):
+    # Yield the legal moves of side that take a piece, for the quiescence search. Bishops
+    # look only at the first piece on each diagonal and kings at their neighbours, so the
+    # quiet moves are never built. The same [Rule4] tests as generate_legal_moves apply.
+    # On an indexed board the attack map already holds those squares for every piece.
+    geo = geometry(B[0])
+    if analysis is None:
+        analysis = check_analysis(side, B)
+    double_check = len(analysis[0]) > 1
+    for piece in [p for p in B[1] if p.side == side]:
+        if double_check and not isinstance(piece, King):
+            continue # Only the king can answer a double check.
+        if isinstance(B, IndexedBoard):
+            targets = [square for square in B.attacks[piece] if square in B.squares]
+        elif isinstance(piece, King):
+            targets = [square for square in geo.neighbours[(piece.pos_x, piece.pos_y)] if is_piece_at(*square, B)]
+        else:
+            targets = []
+            for ray in geo.rays[(piece.pos_x, piece.pos_y)]:
+                blocker = next((square for square in ray if is_piece_at(*square, B)), None)
+                if blocker is not None:
+                    targets.append(blocker) # Only the first piece on a diagonal can be taken.
+        for x, y in targets:
+            if piece_at(x, y, B).side == side:
+                continue
+            if piece.can_move_to(x, y, B) if isinstance(piece, King) else bishop_move_allowed(piece, x, y, analysis):
+                yield (piece, x, y)
+
+# Results of game_status.
+ONGOING = "ongoing"
+CHECKMATE = "checkmate"
+STALEMATE = "stalemate"
+
+def game_status(side: bool, B: Board) -> str:
+    # Whether side, to move, is checkmated, stalemated or can play on, found in one pass: the
+    # check analysis that tells whether the king is in check is the one the legal moves are
+    # filtered with, and the search stops at the first legal move.
+
+    # Step 0, a position covered by a loaded endgame tablebase: a won or lost position still
+    # has moves, a mate is read off directly; a draw may be a stalemate, so it is searched.
+    if len(B[1]) <= 4:
+        from chess_tablebase import probe, DRAW, LOSS # chess_tablebase imports this module.
+        result = probe(B, side)
+        if result == (LOSS, 0):
+            return CHECKMATE
+        if result is not None and result[0] != DRAW:
+            return ONGOING
+
+    # Step 1, the king is in check from a bishop, or from the enemy king next to it.
+    analysis = check_analysis(side, B)
+    king = find_king(side, B)
+    enemy_king = find_king(not side, B)
+    in_check = bool(analysis[0]) or (enemy_king.pos_x, enemy_king.pos_y) in geometry(B[0]).neighbour_sets[(king.pos_x, king.pos_y)]
+
+    # Step 2, one legal move is enough to play on; every legal move also escapes a check.
+    for piece, x, y in generate_legal_moves(side, B, analysis):
+        if DEBUG:
+            logger.debug(
+                f"A legal move exists for {piece.__class__.__name__} at ({piece.pos_x}, {piece.pos_y}) "
+                f"to ({x}, {y}). The game goes on.")
+        return ONGOING
+
+    return CHECKMATE if in_check else STALEMATE
 
-                    logging.debug(f"Testing {piece.__class__.__name__} moving to ({x}, {y}).")
-                    if not is_check(side, hypothetical_board):
-                        logging.debug(
-                            f"Escape found! {piece.__class__.__name__} to ({x}, {y}) prevents checkmate.")
-                        return False  # Escape found, so it's not checkmate.
-    
+def is_checkmate(side: bool, B: Board) -> bool:
+    if game_status(side, B) != CHECKMATE:
+        return False
     print(f"Checkmate! The {side} King is in checkmate.")
-    return True # checkmate
+    return True
 
 def is_stalemate(side: bool, B: Board) -> bool:
-    # Step 1, check if the king is in check; return false if king in check.
-    if is_check(side, B):
+    if game_status(side, B) != STALEMATE:
         return False
-    
-    all_squares = [(x, y) for x in range(1, B[0] + 1) for y in range(1, B[0] + 1)]
-
-    # Step 2, Check if any piece has a valid move.
-    for piece in B[1]: # Check all pieces.
-        if piece.side == side:
-            for x, y in all_squares: # Check all squares on the board.
-                    if piece.can_move_to(x, y, B):
-                        # Simulate move without calling move_to.
-                        B_copy = copy.deepcopy(B)
-
-                        # Find the matching piece in the copied board (same side).
-                        simulated_piece = next(p for p in B_copy[1] if
-                                               p.pos_x == piece.pos_x and p.pos_y == piece.pos_y and p.side == side)
-
-                        # Simulate capturing opponent's piece at the destination.
-                        captured_piece = piece_at(x, y, B_copy)
-                        if captured_piece and captured_piece.side != side:
-                            B_copy[1].remove(captured_piece)
-
-                        # Move the simulated piece.
-                        simulated_piece.pos_x, simulated_piece.pos_y = x, y
-
-                        # Check if the king is still in check after the simulated move.
-                        if not is_check(side, B_copy):
-                            logging.debug(
-                                f"A valid move exists for {piece.__class__.__name__} at ({piece.pos_x}, {piece.pos_y}) "
-                                f"to ({x}, {y}). Not stalemate.")
-                            return False  # A valid move exists.
-                        
-    # If no piece can move: it's a stalemate.
     print(f"Stalemate! The {side} King is not in check and no pieces can move.")
-    return True 
+    return True
+
+def parse_piece(piece_str: str, side: bool) -> Piece:
+    # One piece of a board file line: the type ("K" for King, "B" for Bishop) and then the
+    # location (ex, "b5"). The whole token is checked first, so a bad one is named in the error.
+    match = re.fullmatch(r"([KB])([a-z][0-9]+)", piece_str)
+    if match is None:
+        raise ValueError(f"Unknown piece {piece_str}.")
+    x, y = location2index(match[2])
+    return King(x, y, side) if match[1] == "K" else Bishop(x, y, side)
+
+def parse_board(lines: list[str]) -> Board:
+    # Build a board from the three lines of a board file: the size, the white pieces and the black pieces.
+    S = int(lines[0].strip())
+    white_pieces = lines[1].strip().split(', ')
+    black_pieces = lines[2].strip().split(', ')
+
+    if DEBUG:
+        logger.debug(f"Board parameters: {S}")
+        logger.debug(f"White pieces: {white_pieces}")
+        logger.debug(f"Black pieces: {black_pieces}")
+
+    pieces = []
+
+    for piece_str in white_pieces: 
+        if piece_str:
+            pieces.append(parse_piece(piece_str, True))
+
+    for piece_str in black_pieces:
+        if piece_str:
+            pieces.append(parse_piece(piece_str, False))
+
+    # Reject set-ups the rules cannot play rather than failing later in the game.
+    if not 3 <= S <= 26:
+        raise ValueError(f"Board size must be between 3 and 26, not {S}.")
+    geo = geometry(S)
+    squares = set()
+    for piece in pieces:
+        loc = index2location(piece.pos_x, piece.pos_y)
+        if not geo.on_board(piece.pos_x, piece.pos_y):
+            raise ValueError(f"{loc} is not on a {S}x{S} board.")
+        if (piece.pos_x, piece.pos_y) in squares:
+            raise ValueError(f"Two pieces on {loc}.")
+        squares.add((piece.pos_x, piece.pos_y))
+    for side, name in ((True, "White"), (False, "Black")):
+        if sum(1 for piece in pieces if piece.side == side and isinstance(piece, King)) != 1:
+            raise ValueError(f"{name} must have exactly one king.")
+
+    return IndexedBoard(S, pieces)
 
 def read_board(filename: str) -> Board:
     try: 
         with open(filename, 'r') as f:
-            S = int(f.readline().strip())
-            white_pieces = f.readline().strip().split(', ')
-            black_pieces = f.readline().strip().split(', ')
-        
-        logging.debug(f"Board parameters: {S}")
-        logging.debug(f"White pieces: {white_pieces}")
-        logging.debug(f"Black pieces: {black_pieces}")
-
-        pieces = []
-
-        for piece_str in white_pieces: 
-            if piece_str:
-                type_str = piece_str[0] # First character is the type (ex, "K" for King, "B" Bishop),
-                loc = piece_str[1:] # the rest of the string is the location (ex, "b5").
-                x, y = location2index(loc)
-                if type_str == "K":
-                    pieces.append(King(x, y, True))
-                elif type_str == "B":
-                    pieces.append(Bishop(x, y, True))
-
-        for piece_str in black_pieces:
-            if piece_str:
-                type_str = piece_str[0]
-                loc = piece_str[1:]
-                x, y = location2index(loc)
-                if type_str == "K":
-                    pieces.append(King(x, y, False))
-                elif type_str == "B":
-                    pieces.append(Bishop(x, y, False))
-
-        Board = (S, pieces)
-        return Board
-    except: 
-        raise IOError("This is not a valid file.")
+            lines = [f.readline() for _ in range(3)]
+        return parse_board(lines)
+    except (OSError, ValueError, IndexError) as error: 
+        raise IOError("This is not a valid file.") from error
+
+# Multi-position files hold any number of records one after another, each either the three
+# lines of a board file or one line with the three parts separated by semicolons:
+#     5; Bb5, Kc5, Bd4, Bc1; Kb3, Bc3, Be3
+# Blank lines between records are ignored.
+
+BoardErrorHandler = Callable[[int, str], None] # Called with the line number and the problem.
+
+def read_boards(filename: str, on_error: BoardErrorHandler = None) -> Iterator[Board]:
+    # Yield the boards of a multi-position file one at a time, reading the file line by line,
+    # so even a very large file is read in constant memory. A bad record is reported with the
+    # number of its first line (to on_error, or as a logged warning) and skipped.
+    for _, board in read_numbered_boards(filename, on_error):
+        yield board
+
+def read_numbered_boards(filename: str, on_error: BoardErrorHandler = None) -> Iterator[tuple[int, Board]]:
+    # read_boards, with each board the number of the first line of its record.
+    def report(number, problem):
+        if on_error is not None:
+            on_error(number, problem)
+        else:
+            logger.warning(f"{filename}, line {number}: {problem} Record skipped.")
+
+    def parse(number, lines):
+        try:
+            return parse_board(lines)
+        except (ValueError, IndexError) as error:
+            report(number, str(error) or "Not a valid board.")
+            return None
+
+    with open(filename, 'r') as f:
+        block = [] # Lines of the three-line record being read.
+        start = 0 # Line number of its first line.
+        for number, line in enumerate(f, 1):
+            text = line.strip()
+            if block and text.isdigit():
+                # A new record starts before this one has its three lines.
+                report(start, "The record is cut short by the next one.")
+                block, start = [text], number
+            elif block:
+                block.append(text)
+                if len(block) == 3:
+                    board = parse(start, block)
+                    block = []
+                    if board is not None:
+                        yield start, board
+            elif not text:
+                continue
+            elif ';' in text:
+                parts = text.split(';')
+                if len(parts) != 3:
+                    report(number, f"Expected 3 parts separated by ';', found {len(parts)}.")
+                    continue
+                board = parse(number, parts)
+                if board is not None:
+                    yield number, board
+            elif text.isdigit():
+                block, start = [text], number
+            else:
+                report(number, f"Expected a board size, found {text!r}.") # Skip lines until the next record.
+        if block:
+            report(start, "The file ends in the middle of a record.")
+
+def random_board(rng: random.Random, S: int, bishops: int) -> Board:
+    # Both kings (not next to each other) and bishops of random colours on random squares,
+    # for tests and benchmarks.
+    squares = [(x, y) for x in range(1, S + 1) for y in range(1, S + 1)]
+    while True:
+        (wx, wy), (bx, by), *rest = rng.sample(squares, 2 + bishops)
+        if abs(wx - bx) > 1 or abs(wy - by) > 1:
+            return (S, [King(wx, wy, True), King(bx, by, False)] + [Bishop(x, y, rng.random() < 0.5) for x, y in rest])
+
+def format_board(B: Board, one_line: bool = False) -> str:
+    # The text of a board as in a board file, or as one line of a multi-position file.
+    white_pieces = []
+    black_pieces = []
+    for piece in B[1]: 
+        loc = index2location(piece.pos_x, piece.pos_y)
+        piece_char = "K" if isinstance(piece, King) else "B"
+        piece_str = f"{piece_char}{loc}" 
+        if piece.side:
+            white_pieces.append(piece_str)
+        else: 
+            black_pieces.append(piece_str)
+    parts = [str(B[0]), ", ".join(white_pieces), ", ".join(black_pieces)]
+    return "; ".join(parts) + "\n" if one_line else "\n".join(parts) + "\n"
 
 def save_board(filename: str, B: Board) -> None:
     with open(filename, 'w') as f:
-        f.write(f"{B[0]}\n")
-        white_pieces = []
-        black_pieces = []
-        for piece in B[1]: 
-            loc = index2location(piece.pos_x, piece.pos_y)
-            piece_char = "K" if isinstance(piece, King) else "B"
-            piece_str = f"{piece_char}{loc}" 
-            if piece.side:
-                white_pieces.append(piece_str)
-            else: 
-                black_pieces.append(piece_str)
-        f.write(", ".join(white_pieces) + "\n")
-        f.write(", ".join(black_pieces) + "\n")
-
-def find_black_move(B: Board) -> tuple[Piece, int, int]:
-    all_moves = [] # To store all possible moves before choosing the best one.
-    checkmate_found = False
-    check_found = False 
-
-    # Check for checkmate.
-    for piece in [p for p in B[1] if not p.side]: 
-        if checkmate_found:
-            break
-
-        for x in range(1, B[0] + 1):
-            for y in range(1, B[0] + 1):
-                if piece.can_move_to(x, y, B):
-                    orig_x, orig_y = piece.pos_x, piece.pos_y
-                    # Simulate the move. 
-                    hypothetical_board = (B[0, copy.deepcopy(B[1])])
-                    hypothetical_piece = next(p for p in hypothetical_board[1] if
-                                            p.pos_x == piece.pos_x and p.pos_y == piece.pos_y and isinstance(p,
-                                                                                                            piece.__class__))
-
-                    # find a captured piece. 
-                    captured_piece = piece_at(x, y, hypothetical_board)
-                    hypothetical_piece.pos_x, hypothetical_piece.pos_y = x, y
-
-                    # Check for checkmate.
-                    if is_checkmate(False, hypothetical_board):
-                        move_type = 'checkmate'
-                        checkmate_found = True
-                        all_moves.append((orig_x, orig_y, x, y, move_type, captured_piece))
-                        break  # Stop further simulations for this piece.
-                
-                    # Check for check.
-                    elif is_check(False, hypothetical_board):
-                        move_type = 'check'
-                        check_found = True
-                        all_moves.append((orig_x, orig_y, x, y, move_type, captured_piece))
-                        continue
-                    
-                    # Check for capture.
-                    elif captured_piece and captured_piece.side != piece.side:
-                        move_type = 'capture'
-                        all_moves.append((orig_x, orig_y, x, y, move_type, captured_piece))
-
-                    # Valid move.
-                    else:
-                        move_type = 'valid'
-                        all_moves.append((orig_x, orig_y, x, y, move_type, captured_piece))
-
-    # Prioritize better moves. 
-    if all_moves: 
-        move_priority = {'checkmate': 4, 'check': 3, 'capture': 2, 'valid': 1}
-        best_move = max(all_moves, key=lambda move: move_priority[move[4]])
-
-        orig_x, orig_y, x, y, move_type, captured_piece = best_move
-        logging.debug(f"The best move is: {orig_x, orig_y} to {x, y}. Move type: {move_type}.")
-
-        # Locate the actual piece at the original position.
-        piece = next(p for p in B[1] if p.pos_x == orig_x and p.pos_y == orig_y)
-        
-        # Apply the move.
-        return piece, x, y 
-
-    return None
+        f.write(format_board(B))
+
+def append_board(filename: str, B: Board, one_line: bool = False) -> None:
+    # Add a board to the end of a multi-position file (creating it if needed).
+    with open(filename, 'a') as f:
+        f.write(format_board(B, one_line))
+
+def find_black_move(B: Board, depth: int = None, time_limit: float = None,
+                    workers: int = 1, seed: int = None, cache=None, engine=None) -> tuple[Piece, int, int]:
+    # Ask the search engine for Black's best move, searching at most depth plies and for at
+    # most time_limit seconds (the engine defaults when not given). Returns None without legal moves.
+    # With more than one worker the root moves are split between that many processes.
+    # With an AnalysisCache (see chess_cache), a stored result of at least depth is played
+    # without searching, and a new result is stored. A game passes the same Engine for every
+    # move, so its transposition table and history carry over; without one a new one is made.
+    from chess_engine import search, parallel_search, DEFAULT_DEPTH, DEFAULT_TIME_LIMIT # chess_engine imports this module.
+    depth = depth if depth is not None else DEFAULT_DEPTH
+    time_limit = time_limit if time_limit is not None else DEFAULT_TIME_LIMIT
+    if cache is not None:
+        from chess_cache import cached_move
+        move = cached_move(cache, B, False, depth)
+        if move is not None:
+            if DEBUG:
+                logger.debug(f"The best move is cached: {move[0].pos_x, move[0].pos_y} to {move[1:]}.")
+            return move
+    if workers > 1:
+        result = parallel_search(B, False, depth, time_limit, workers, seed)
+    elif engine is not None:
+        result = engine.search(B, False, depth, time_limit)
+    else:
+        result = search(B, False, depth, time_limit)
+    if result is None:
+        return None
+
+    (piece, x, y), score, completed, nodes = result
+    if DEBUG:
+        logger.debug(f"The best move is: {piece.pos_x, piece.pos_y} to {x, y}. Score {score} "
+                     f"at depth {completed} ({nodes} nodes).")
+    if cache is not None:
+        cache.store(B, False, ((piece.pos_x, piece.pos_y, x, y), score, completed, nodes))
+    return piece, x, y
 
 def conf2unicode(B: Board) -> str: 
     unicode_board = "" # Empty string to store the unicode board.
     for y in range(B[0], 0, - 1): # Run a loop from 1 to the size of the board.
         row = []
         for x in range(1, B[0] + 1):
-            piece = next((p for p in B[1] if p.pos_x == x and p.pos_y == y), None)
+            piece = piece_at(x, y, B)
             if piece: 
                 if isinstance(piece, Bishop):
                     row.append("♗" if piece.side else "♝")
@@ -497,9 +923,9 @@ def conf2unicode(B: Board) -> str:
     return unicode_board
 
 def main() -> None:   
+    from chess_engine import Engine # chess_engine imports this module.
     B = None
-    start = None
-    finish = None
+    engine = Engine() # One engine for the whole game, so each search starts from the last one's table.
 
     filename = input("File name for initial configuration: ")
 
@@ -513,7 +939,7 @@ def main() -> None:
             except IOError:
                 filename = input("This is not a valid file. File name for initial configuration: ")
     if B:       
-        logging.debug(conf2unicode(B)) # Print the board in unicode format.
+        print(f"The initial configuration is:\n{conf2unicode(B)}") # Print the board in unicode format.
 
     while True: # Game running.
         # White's turn:
@@ -526,28 +952,8 @@ def main() -> None:
         
         elif white_input != "QUIT":
             try:
-                # Format: (start position, end position) ex: (b5, c6)
-                # len 4, ex: a1b1
-                if len(white_input) == 4:
-                    start = white_input[:2]
-                    finish = white_input[2:]
-                #len 5, format: a10b1 
-                elif len(white_input) == 5:
-                    if white_input[1].isdigit() and white_input[2].isdigit():
-                        start = white_input[:3]
-                        finish = white_input[4:]
-                #len 5, format: a1b10
-                    else:
-                        start = white_input[:2]
-                        finish = white_input[3:]
-                #len 6, ex: a10b10
-                elif len(white_input) == 6:
-                    start = white_input[:3]
-                    finish = white_input[4:]
-
-                # convert to (x,y) coordinates:
-                start_x, start_y = location2index(start)
-                finish_x, finish_y = location2index(finish)
+                # Format: start and end position, ex: a1b1, a10b1, a1b10 or a10b10.
+                (start_x, start_y), (finish_x, finish_y) = parse_move(white_input)
 
                 # find the piece at the starting position:
                 piece = piece_at(start_x, start_y, B)
@@ -568,17 +974,18 @@ def main() -> None:
                 print("Invalid input. Try again.")
                 continue 
 
-        if is_checkmate(False, B):
+        status = game_status(False, B)
+        if status == CHECKMATE:
             print("Checkmate! White wins.")
             break
 
-        elif is_stalemate(False, B):
+        elif status == STALEMATE:
             print("Stalemate! The game is a draw.")
             break
 
         # Black's turn:
         print("Next move of Black is ", end="")
-        black_piece, black_x, black_y = find_black_move(B)
+        black_piece, black_x, black_y = find_black_move(B, engine=engine)
         print(f"{index2location(black_x, black_y)}")
         
         # Apply Black's move to the board.
@@ -586,13 +993,18 @@ def main() -> None:
         print(f"The configuration after Black's move is:\n{conf2unicode(B)}")
 
         # Check for checkmate or stalemate after Black's move.
-        if is_checkmate(True, B):
+        status = game_status(True, B)
+        if status == CHECKMATE:
             print("Game over. Black wins.")
             quit() 
 
-        elif is_stalemate(True, B):
+        elif status == STALEMATE:
             print("Game over. Stalemate.")
             quit()
 
 if __name__ == '__main__': 
-   main()
+    # Run the game from the imported module, not from __main__: the engine and the tablebases
+    # import chess_puzzle, and pieces of a second copy of this module would not be their
+    # King and Bishop.
+    import chess_puzzle
+    chess_puzzle.main()
@@ -1,3 +1,9 @@
+import logging
+import os
+import random
+import subprocess
+import sys
+
 import pytest
 from chess_puzzle import *
 
@@ -141,7 +147,11 @@ def test_can_reach7(): # king can not reach a tile 2 tiles away from it
 
 # can_move_to tests (for bishops):
 def test_can_move_to1(): # bishop can move to a reachable, empty, space, while not putting own King in check 
-    assert wb2.can_move_to(5,5, B1) == True
+    assert wb3.can_move_to(2, 2, B1) == True
+
+def test_can_move_to1a(): # bishop can not leave the diagonal between bb2 and its own King (it is pinned)
+    assert wb2.can_move_to(5, 5, B1) == False
+    assert wb2.can_move_to(5, 3, B1) == True # but it can capture the pinning bishop
 
 def test_can_move_to2(): # bishop can move to a reachable, enemy occupied, space, while not putting own King in check 
     assert bb1.can_move_to(4, 4, B2) == True
@@ -222,6 +232,35 @@ def test_is_stalemate5(): # It's a checkmate so it's not a stalemate, because a.
     B17 = (4, [wk1b, bk1, bb7, bb8, bb9])
     assert is_stalemate(True, B17) == False
 
+# game_status tests:
+def test_game_status1(): # checkmate, stalemate and a game that goes on
+    assert game_status(False, (5, [wk1a, wb4, bk1, bb2, bb3, wb3, wb5])) == CHECKMATE
+    assert game_status(False, (4, [King(1, 4, False), King(2, 2, True), Bishop(4, 2, True)])) == STALEMATE
+    assert game_status(False, (4, [King(1, 4, False), King(2, 2, True), Bishop(3, 2, True)])) == ONGOING
+
+def test_game_status2(monkeypatch): # one pass: no separate is_check, and the first legal move ends the search
+    moves = []
+    def counted(side, B, analysis=None):
+        for move in generate_legal_moves(side, B, analysis):
+            moves.append(move)
+            yield move
+    monkeypatch.setattr("chess_puzzle.is_check", None)
+    monkeypatch.setattr("chess_puzzle.generate_legal_moves", counted)
+    assert game_status(True, read_board("board_examp.txt")) == ONGOING
+    assert len(moves) == 1
+
+def test_game_status3(): # the same verdicts as is_check and the list of legal moves, on plain and indexed boards
+    rng = random.Random(24)
+    for _ in range(300):
+        B = random_board(rng, rng.randint(3, 6), rng.randint(0, 4))
+        for side in (True, False):
+            if not list(generate_legal_moves(side, B)):
+                expected = CHECKMATE if is_check(side, B) else STALEMATE
+            else:
+                expected = ONGOING
+            assert game_status(side, B) == expected
+            assert game_status(side, as_indexed(B, side)) == expected
+
 # read_board tests:
 def test_read_board1(): # preprovided example test from original code
     B = read_board("board_examp.txt")
@@ -288,6 +327,98 @@ def test_read_board8(): # test that no pieces share the same tile
         assert pos not in positions, f"Duplicate piece found at position {pos}"
         positions.add(pos)
 
+def test_read_board9(tmp_path): # set-ups the rules cannot play are not valid files
+    filename = tmp_path / "board.txt"
+    for text in ["5\nKa1, Ka2\nKe5\n", "5\nKa1\nBe4\n", "5\nKa1, Bf6\nKe5\n", "5\nKa1, Ba1\nKe5\n",
+                 "5\nKa1, Qb2\nKe5\n", "2\nKa1\nKb2\n", "five\nKa1\nKe5\n"]:
+        filename.write_text(text)
+        with pytest.raises(IOError):
+            read_board(filename)
+
+# parse_board tests:
+def test_parse_board1(): # the three lines of a board file
+    B = parse_board(["5", "Bb5, Kc5, Bd4, Bc1", "Kb3, Bc3, Be3"])
+    assert B[0] == 5 and len(B[1]) == 7
+    assert isinstance(piece_at(3, 5, B), King) and piece_at(3, 5, B).side == True
+
+def test_parse_board2(): # problems are named
+    with pytest.raises(ValueError, match="Two pieces on a1"):
+        parse_board(["5", "Ka1, Ba1", "Ke5"])
+    with pytest.raises(ValueError, match="Black must have exactly one king"):
+        parse_board(["5", "Ka1", "Be5"])
+    with pytest.raises(ValueError, match="f6 is not on a 5x5 board"):
+        parse_board(["5", "Ka1, Bf6", "Ke5"])
+    with pytest.raises(ValueError, match="Unknown piece Qb2"):
+        parse_board(["5", "Ka1, Qb2", "Ke5"])
+    for token in ("K", "5", "Bb", "B5", "Kb5x"):
+        with pytest.raises(ValueError, match=f"Unknown piece {token}\\."):
+            parse_board(["5", f"Ka1, {token}", "Ke5"])
+
+# multi-position file tests:
+def board_text(B): # the pieces of a board, independent of their order
+    return sorted((type(p).__name__, p.side, p.pos_x, p.pos_y) for p in B[1])
+
+def test_format_board(): # the board file text and the one-line form
+    B = read_board("board_examp.txt")
+    assert format_board(B) == "5\nBb5, Kc5, Bd4, Bc1\nKb3, Bc3, Be3\n"
+    assert format_board(B, one_line=True) == "5; Bb5, Kc5, Bd4, Bc1; Kb3, Bc3, Be3\n"
+
+def test_append_board(tmp_path): # appended boards are read back in order, in either form
+    B = read_board("board_examp.txt")
+    other = (4, [King(1, 1, True), Bishop(2, 2, True), King(4, 4, False)])
+    filename = tmp_path / "boards.txt"
+    append_board(filename, B)
+    append_board(filename, other, one_line=True)
+    append_board(filename, B, one_line=True)
+    append_board(filename, other)
+    boards = list(read_boards(filename))
+    assert [board_text(board) for board in boards] == [board_text(B), board_text(other)] * 2
+
+def test_read_boards_lazy(tmp_path): # boards come one at a time as the file is read
+    filename = tmp_path / "boards.txt"
+    with open(filename, "w") as f:
+        f.write("5; Bb5, Kc5; Kb3\n" * 3)
+    boards = read_boards(filename)
+    assert not isinstance(boards, list)
+    first = next(boards)
+    assert isinstance(first, IndexedBoard) and first[0] == 5
+    assert len(list(boards)) == 2
+
+def test_read_boards_errors(tmp_path): # bad records are reported with their line numbers and skipped
+    filename = tmp_path / "boards.txt"
+    with open(filename, "w") as f:
+        f.write("5\nBb5, Kc5\nKb3\n"      # lines 1-3: good
+                "\n"                      # line 4: blank
+                "5\nKa1, Ba1\nKe5\n"      # lines 5-7: two pieces on a1
+                "hello\n"                 # line 8: not a record
+                "5; Ka1; Ke5; Kc3\n"      # line 9: four parts
+                "4; Ka1; Bd4\n"           # line 10: no black king
+                "4; Ka1; Kd4\n"           # line 11: good
+                "6\nKa1\n")               # lines 12-13: cut short
+    errors = []
+    boards = list(read_boards(filename, lambda number, problem: errors.append((number, problem))))
+    assert [B[0] for B in boards] == [5, 4]
+    assert [number for number, _ in errors] == [5, 8, 9, 10, 12]
+    assert errors[0][1] == "Two pieces on a1."
+    assert errors[-1][1] == "The file ends in the middle of a record."
+
+def test_read_boards_cut_short(tmp_path): # a record cut short does not swallow the next one
+    filename = tmp_path / "boards.txt"
+    with open(filename, "w") as f:
+        f.write("5\nKa1, Bb2\n5\nKa1\nKe5\n5; Ka1; Ke5\n")
+    errors = []
+    boards = list(read_boards(filename, lambda number, problem: errors.append((number, problem))))
+    assert errors == [(1, "The record is cut short by the next one.")]
+    assert [board_text(B) for B in boards] == [board_text((5, [King(1, 1, True), King(5, 5, False)]))] * 2
+
+def test_read_boards_warning(tmp_path, caplog): # without a handler the problems are logged as warnings
+    filename = tmp_path / "boards.txt"
+    with open(filename, "w") as f:
+        f.write("nonsense\n5; Ka1; Ke5\n")
+    with caplog.at_level(logging.WARNING, logger="chess_puzzle"):
+        assert len(list(read_boards(filename))) == 1
+    assert "line 1" in caplog.text and "Record skipped" in caplog.text
+
 # conf2unicode tests:
 def test_conf2unicode1(): 
     board = (3, [King(2, 3, True), King(2, 1, False)])  # try for white King and black King
@@ -435,4 +566,330 @@ def test_move_to5(): # white king is in check, moves out of check
         for piece1 in Actual_B[1]:
             if piece.pos_x == piece1.pos_x and piece.pos_y == piece1.pos_y and piece.side == piece1.side and type(piece) == type(piece1):
                 found = True
-        assert found
\ No newline at end of file
+        assert found
+
+# IndexedBoard tests:
+def test_indexed_board1(): # an indexed board is still the (S, pieces) pair
+    B = as_indexed((5, [King(1, 1, True), King(5, 5, False)]))
+    S, pieces = B
+    assert S == 5 and B[0] == 5
+    assert len(pieces) == 2
+
+def test_indexed_board2(): # lookups agree with the plain tuple board
+    B = as_indexed((5, list(B1[1])))
+    for x in range(0, 7):
+        for y in range(0, 7):
+            assert is_piece_at(x, y, B) == is_piece_at(x, y, B1)
+            assert piece_at(x, y, B) is piece_at(x, y, B1)
+
+def test_indexed_board3(): # the index follows a move
+    bishop = Bishop(3, 3, True)
+    B = as_indexed((5, [bishop, King(1, 5, True), King(5, 1, False)]))
+    B = bishop.move_to(1, 1, B)
+    assert piece_at(1, 1, B) is bishop
+    assert not is_piece_at(3, 3, B)
+
+def test_indexed_board4(): # the index follows a capture
+    bishop = Bishop(2, 2, False)
+    target = Bishop(4, 4, True)
+    B = as_indexed((5, [bishop, target, King(1, 5, True), King(5, 1, False)]))
+    B = bishop.move_to(4, 4, B)
+    assert piece_at(4, 4, B) is bishop
+    assert target not in B[1]
+    assert len(B.squares) == len(B[1]) == 3
+
+def test_indexed_board5(): # read_board returns an indexed board
+    B = read_board("board_examp.txt")
+    assert isinstance(B, IndexedBoard)
+    assert isinstance(piece_at(3, 5, B), King)
+
+# debug logging tests:
+def test_debug1(): # debug logging is off by default and importing does not configure the root logger
+    import chess_puzzle
+    assert chess_puzzle.DEBUG == False
+    assert chess_puzzle.logger.handlers == []
+
+def test_debug2(caplog): # nothing is logged when debug is off
+    with caplog.at_level(logging.DEBUG):
+        location2index("e2")
+    assert caplog.records == []
+
+def test_debug3(): # no log message is even formatted when debug is off
+    class Unprintable(King):
+        def __repr__(self):
+            raise AssertionError("formatted a log message")
+    B = (3, [Unprintable(1, 1, True)])
+    assert isinstance(piece_at(1, 1, B), King)
+
+def test_debug4(caplog): # messages are logged once debug is switched on, and stop when it is switched off
+    set_debug(True)
+    try:
+        with caplog.at_level(logging.DEBUG):
+            location2index("e2")
+        assert "e2 has been converted to (5, 2)." in caplog.messages
+    finally:
+        set_debug(False)
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG):
+        location2index("e2")
+    assert caplog.records == []
+
+# make_move / unmake_move tests:
+def snapshot(B): # the order and positions of all the pieces on a board
+    return [(id(p), p.pos_x, p.pos_y) for p in B[1]]
+
+def test_make_move1(): # a quiet move and its undo record
+    bishop = Bishop(3, 3, True)
+    B = (5, [King(1, 5, True), bishop, King(5, 1, False)])
+    undo = make_move(bishop, 1, 1, B)
+    assert (bishop.pos_x, bishop.pos_y) == (1, 1)
+    assert undo == (bishop, 3, 3, None, -1)
+
+def test_make_move2(): # a capture records the captured piece and its list index
+    bishop = Bishop(2, 2, False)
+    target = Bishop(4, 4, True)
+    B = (5, [King(1, 5, True), target, bishop, King(5, 1, False)])
+    undo = make_move(bishop, 4, 4, B)
+    assert target not in B[1]
+    assert undo[3:] == (target, 1)
+
+def test_unmake_move1(): # undoing a capture restores the piece list in its original order
+    bishop = Bishop(2, 2, False)
+    B = (5, [King(1, 5, True), Bishop(4, 4, True), bishop, King(5, 1, False)])
+    before = snapshot(B)
+    unmake_move(make_move(bishop, 4, 4, B), B)
+    assert snapshot(B) == before
+
+def test_unmake_move2(): # the square index of an indexed board is restored as well
+    bishop = Bishop(2, 2, False)
+    target = Bishop(4, 4, True)
+    B = as_indexed((5, [King(1, 5, True), target, bishop, King(5, 1, False)]))
+    unmake_move(make_move(bishop, 4, 4, B), B)
+    assert piece_at(4, 4, B) is target
+    assert piece_at(2, 2, B) is bishop
+    assert len(B.squares) == 4
+
+def test_unmake_move3(): # moves are undone in reverse order
+    king = King(1, 1, True)
+    bishop = Bishop(3, 3, False)
+    B = as_indexed((5, [king, bishop, King(5, 5, False)]))
+    before = snapshot(B)
+    first = make_move(king, 2, 2, B)
+    second = make_move(bishop, 2, 2, B) # captures the king that just moved
+    unmake_move(second, B)
+    unmake_move(first, B)
+    assert snapshot(B) == before
+    assert piece_at(1, 1, B) is king and piece_at(3, 3, B) is bishop
+
+def test_can_move_to_board_unchanged(): # legality tests leave the board exactly as it was
+    B = read_board("board_examp.txt")
+    before = snapshot(B)
+    for piece in list(B[1]):
+        for x in range(1, 6):
+            for y in range(1, 6):
+                piece.can_move_to(x, y, B)
+    assert snapshot(B) == before
+    assert B.squares == {(p.pos_x, p.pos_y): p for p in B[1]}
+
+def test_no_deepcopy(monkeypatch): # legality simulations do not copy the board
+    import copy
+    def no_copy(*args, **kwargs):
+        raise AssertionError("the board was copied")
+    monkeypatch.setattr(copy, "deepcopy", no_copy)
+    B = read_board("board_examp.txt")
+    assert is_checkmate(True, B) == False
+    assert is_stalemate(False, B) == False
+    piece, x, y = find_black_move(B)
+    assert piece.side == False and piece.can_move_to(x, y, B)
+
+# attack map tests:
+def attack_map(B): # attack counts of a board built from scratch
+    fresh = IndexedBoard(B[0], list(B[1]))
+    return [{sq: n for sq, n in counts.items() if n} for counts in fresh.attack_counts]
+
+def test_attack_map1(): # a bishop's attacks stop at the first piece, a king attacks its neighbours
+    B = as_indexed((5, [Bishop(1, 1, True), Bishop(3, 3, False), King(5, 1, True), King(1, 5, False)]))
+    assert B.is_attacked(2, 2, True) and B.is_attacked(3, 3, True)
+    assert not B.is_attacked(4, 4, True)
+    assert B.is_attacked(4, 2, True) # next to the white king
+
+def test_attack_map2(): # moving a blocker opens the ray behind it
+    blocker = Bishop(3, 3, True)
+    B = as_indexed((5, [Bishop(1, 1, False), blocker, King(5, 2, True), King(1, 5, False)]))
+    assert not B.is_attacked(4, 4, False)
+    make_move(blocker, 2, 4, B)
+    assert B.is_attacked(4, 4, False) and B.is_attacked(5, 5, False)
+
+def test_attack_map3(): # is_check is a lookup that agrees with the plain board
+    B4 = (5, [wb1, wk1, bk1, bb1, bb2, wb3])
+    assert is_check(True, as_indexed((5, list(B4[1])))) == is_check(True, B4) == True
+
+def test_attack_map4(): # the map stays equal to a fresh one through moves, captures and undos
+    rng = random.Random(7)
+    for _ in range(30):
+        S = rng.randint(3, 8)
+        B = as_indexed(random_board(rng, S, rng.randint(0, min(6, S * S - 2))))
+        undos = []
+        for _ in range(6):
+            piece = rng.choice(B[1])
+            targets = [sq for sq in B.attacks[piece] if piece_at(*sq, B) is None or piece_at(*sq, B).side != piece.side]
+            targets = [sq for sq in targets if not isinstance(piece_at(*sq, B), King)]
+            if targets:
+                undos.append(make_move(piece, *rng.choice(targets), B))
+                assert [{sq: n for sq, n in c.items() if n} for c in B.attack_counts] == attack_map(B)
+        while undos:
+            unmake_move(undos.pop(), B)
+            assert [{sq: n for sq, n in c.items() if n} for c in B.attack_counts] == attack_map(B)
+
+def test_attack_map5(): # legality on an indexed board agrees with the plain board
+    rng = random.Random(11)
+    for _ in range(30):
+        S = rng.randint(3, 7)
+        plain = random_board(rng, S, rng.randint(0, min(5, S * S - 2)))
+        B = as_indexed((S, list(plain[1])))
+        for side in (True, False):
+            assert is_check(side, B) == is_check(side, plain)
+        for piece in list(B[1]):
+            for x in range(1, S + 1):
+                for y in range(1, S + 1):
+                    assert piece.can_move_to(x, y, B) == piece.can_move_to(x, y, plain)
+
+# generate_legal_moves tests:
+def brute_force_moves(side, B): # every (piece, x, y) that can_move_to accepts, trying all squares
+    return {(id(p), x, y) for p in list(B[1]) if p.side == side
+            for x in range(1, B[0] + 1) for y in range(1, B[0] + 1) if p.can_move_to(x, y, B)}
+
+def test_generate_legal_moves1(): # a lone king in the corner has three moves
+    B = (5, [King(1, 1, True), King(5, 5, False)])
+    assert {(x, y) for _, x, y in generate_legal_moves(True, B)} == {(1, 2), (2, 1), (2, 2)}
+
+def test_generate_legal_moves2(): # a bishop stops at its own pieces and captures enemy pieces
+    B = (5, [King(5, 1, True), Bishop(3, 3, True), Bishop(1, 1, True), Bishop(5, 5, False), King(1, 4, False)])
+    bishop_moves = {(x, y) for p, x, y in generate_legal_moves(True, B) if (p.pos_x, p.pos_y) == (3, 3)}
+    assert bishop_moves == {(2, 2), (4, 4), (5, 5), (2, 4), (1, 5), (4, 2)}
+
+def test_generate_legal_moves3(): # checkmate: no legal moves at all
+    B8 = (5, [King(2,5,True), Bishop(5,5,True), King(2,3,False), Bishop(5,3,False), Bishop(1,2,False), Bishop(3,1,True), Bishop(4,1,True)])
+    assert list(generate_legal_moves(False, B8)) == []
+
+def test_generate_legal_moves4(): # same moves as trying every square, on plain and indexed boards
+    rng = random.Random(5)
+    for _ in range(30):
+        S = rng.randint(3, 7)
+        plain = random_board(rng, S, rng.randint(0, min(5, S * S - 2)))
+        indexed = as_indexed((S, list(plain[1])))
+        for side in (True, False):
+            expected = brute_force_moves(side, plain)
+            assert {(id(p), x, y) for p, x, y in generate_legal_moves(side, plain)} == expected
+            assert {(id(p), x, y) for p, x, y in generate_legal_moves(side, indexed)} == expected
+
+def test_generate_captures1(): # only the first piece on a diagonal is taken, never an own piece
+    B = (6, [King(6, 1, True), Bishop(1, 1, True), Bishop(3, 3, False), Bishop(4, 4, False), Bishop(1, 3, True), King(6, 6, False)])
+    assert [(p.pos_x, p.pos_y, x, y) for p, x, y in generate_captures(True, B)] == [(1, 1, 3, 3)]
+
+def test_generate_captures2(): # the captures among the legal moves, on plain and indexed boards
+    rng = random.Random(6)
+    for _ in range(30):
+        S = rng.randint(3, 7)
+        plain = random_board(rng, S, rng.randint(0, min(8, S * S - 2)))
+        indexed = as_indexed((S, list(plain[1])))
+        for side in (True, False):
+            expected = {(id(p), x, y) for p, x, y in generate_legal_moves(side, plain) if is_piece_at(x, y, plain)}
+            assert {(id(p), x, y) for p, x, y in generate_captures(side, plain)} == expected
+            assert {(id(p), x, y) for p, x, y in generate_captures(side, indexed)} == expected
+
+# check and pin analysis tests:
+def test_check_analysis1(): # a bishop pinned to its king, no check
+    pinned = Bishop(3, 3, True)
+    B = (5, [King(1, 1, True), pinned, Bishop(5, 5, False), King(1, 5, False)])
+    checkers, block_squares, pins = check_analysis(True, B)
+    assert checkers == [] and block_squares is None
+    assert pins == {pinned: {(2, 2), (4, 4), (5, 5)}}
+
+def test_check_analysis2(): # a single check and the squares that answer it
+    checker = Bishop(4, 4, False)
+    B = (5, [King(1, 1, True), checker, King(1, 5, False)])
+    checkers, block_squares, pins = check_analysis(True, B)
+    assert checkers == [checker]
+    assert block_squares == {(2, 2), (3, 3), (4, 4)}
+
+def test_check_analysis3(): # double check: only the king may move
+    B = (5, [King(3, 3, True), Bishop(1, 1, True), Bishop(5, 5, False), Bishop(1, 5, False), King(5, 1, False)])
+    assert len(check_analysis(True, B)[0]) == 2
+    assert all(isinstance(p, King) for p, _, _ in generate_legal_moves(True, B))
+
+def test_check_analysis4(): # a pinned bishop may only slide along the pin line
+    pinned = Bishop(2, 2, True)
+    B = (5, [King(1, 1, True), pinned, Bishop(4, 4, False), King(1, 5, False)])
+    assert {(x, y) for p, x, y in generate_legal_moves(True, B) if p is pinned} == {(3, 3), (4, 4)}
+
+def test_check_analysis5(): # filtering agrees with playing each move and calling is_check
+    def simulated(piece, x, y, B):
+        undo = make_move(piece, x, y, B)
+        try:
+            return not is_check(piece.side, B)
+        finally:
+            unmake_move(undo, B)
+    rng = random.Random(13)
+    for _ in range(40):
+        S = rng.randint(3, 7)
+        B = random_board(rng, S, rng.randint(0, min(6, S * S - 2)))
+        for piece in list(B[1]):
+            if is_check(not piece.side, B):
+                continue # the side to move can not have left the enemy king in check
+            for x in range(1, S + 1):
+                for y in range(1, S + 1):
+                    if (x, y) != (piece.pos_x, piece.pos_y) and piece.can_reach(x, y, B):
+                        assert piece.can_move_to(x, y, B) == simulated(piece, x, y, B)
+
+# Zobrist hashing tests:
+def test_zobrist1(): # the same position always has the same hash, in any piece order
+    pieces = [King(1, 1, True), Bishop(3, 3, False), King(5, 5, False)]
+    assert zobrist_hash((5, pieces)) == zobrist_hash((5, pieces[::-1]))
+    assert zobrist_hash((5, pieces)) == as_indexed((5, list(pieces))).hash
+
+def test_zobrist2(): # side to move, board size, colour and piece type all change the hash
+    B = (5, [King(1, 1, True), King(5, 5, False)])
+    hashes = {zobrist_hash(B), zobrist_hash(B, False), zobrist_hash((6, B[1])),
+              zobrist_hash((5, B[1] + [Bishop(3, 3, True)])), zobrist_hash((5, B[1] + [Bishop(3, 3, False)])),
+              zobrist_hash((5, [King(1, 1, True), King(5, 4, False)]))}
+    assert len(hashes) == 6
+
+def test_zobrist3(): # keys exist for every board size from 3 to 26 only
+    assert len(zobrist_keys(26)[2][0]) == 26 * 26
+    with pytest.raises(ValueError):
+        zobrist_keys(27)
+
+def test_zobrist4(): # move_to updates the hash incrementally, including the side to move
+    B = read_board("board_examp.txt")
+    B = piece_at(2, 5, B).move_to(1, 4, B) # Bb5 to a4
+    assert B.side_to_move == False
+    assert B.hash == zobrist_hash(B, False)
+
+def test_zobrist5(): # incremental hashes match rehashing through moves, captures and undos
+    rng = random.Random(17)
+    for _ in range(30):
+        S = rng.randint(3, 8)
+        B = as_indexed(random_board(rng, S, rng.randint(0, min(6, S * S - 2))))
+        start = B.hash
+        undos = []
+        for _ in range(6):
+            moves = list(generate_legal_moves(B.side_to_move, B)) if not is_check(not B.side_to_move, B) else []
+            moves = [m for m in moves if not isinstance(piece_at(m[1], m[2], B), King)]
+            if not moves:
+                break
+            undos.append(make_move(*rng.choice(moves), B))
+            assert B.hash == zobrist_hash(B, B.side_to_move)
+        while undos:
+            unmake_move(undos.pop(), B)
+        assert B.hash == start
+
+# main tests:
+def test_main_script(tmp_path): # run as a script: a board file and one White move answered by the engine, then QUIT saves the board
+    saved = tmp_path / "final.txt"
+    result = subprocess.run([sys.executable, "chess_puzzle.py"], input=f"board_examp.txt\nb5a4\nQUIT\n{saved}\n",
+                            capture_output=True, text=True, timeout=120, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+    assert "The configuration after Black's move is:" in result.stdout
+    B = read_board(str(saved))
+    assert not any(isinstance(p, Bishop) and p.side and (p.pos_x, p.pos_y) == (2, 5) for p in B[1]) # the bishop left b5
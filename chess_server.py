@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import chess_puzzle
+from chess_puzzle import (Board, parse_board, parse_move, format_board, piece_at, make_move, unmake_move,
+                          index2location, find_black_move, game_status, ONGOING, logger)
+from chess_engine import encode_position, decode_position, DEFAULT_DEPTH, DEFAULT_TIME_LIMIT
+
+# Game server: many games at once over a local TCP or Unix socket, one game per connection,
+# with White played by the client and Black by the engine. The protocol is line based
+# (UTF-8, one command per line and one reply line per command):
+#     BOARD 5; Bb5, Kc5, Bd4, Bc1; Kb3, Bc3, Be3   start a game from a one-line set-up, or
+#     BOARD                                        followed by the three lines of a board file
+#     MOVE a1b2                                    White's move, in the notation of main()
+#     TIME 0.5                                     seconds Black may think (at most the server's limit)
+#     SHOW                                         the position, as a one-line set-up
+#     QUIT                                         end the session
+# Replies are OK, BOARD <set-up>, BYE or ERROR <problem>. A move is answered by BLACK <move>
+# with Black's reply, followed by CHECKMATE or STALEMATE when that reply ends the game, or by
+# CHECKMATE or STALEMATE alone when White's move ends it.
+#
+# Black's moves are searched in a pool shared by all sessions, off the event loop. At most
+# max_pending searches are queued or running at once; a session waiting for a slot stops
+# reading its socket, so a busy server slows its clients down instead of piling up work.
+# Searches are handed to the pool only when one of its workers is free, and a search that
+# has not answered GRACE seconds after the session's time limit, counted from then, is given
+# up and White's move taken back. Time spent queued behind other searches does not count.
+# A search that fails (a worker process that died, say) also takes White's move back, and
+# the server's own pool is replaced when a dead worker has broken it.
+
+DEFAULT_PORT = 8765
+GRACE = 2.0 # Seconds a search may overrun its time limit before it is given up.
+
+Move = tuple[int, int, int, int] # (from x, from y, to x, to y)
+
+def engine_move(data: bytes, depth: int, time_limit: float) -> Move:
+    # Runs in a worker: Black's move in a position encoded by encode_position.
+    B = decode_position(data)
+    piece, x, y = find_black_move(B, depth, time_limit)
+    return piece.pos_x, piece.pos_y, x, y
+
+class Session:
+    # The game of one connection: the position (None until a BOARD command), whether it is
+    # over, and how long Black may think.
+    def __init__(self, time_limit: float):
+        self.board = None
+        self.over = False
+        self.time_limit = time_limit
+
+class GameServer:
+    def __init__(self, depth: int = DEFAULT_DEPTH, time_limit: float = DEFAULT_TIME_LIMIT,
+                 workers: int = None, max_pending: int = None, executor: Executor = None):
+        workers = workers or os.cpu_count() or 1
+        self.depth = depth
+        self.time_limit = time_limit # Also the longest a session may ask for.
+        self.workers = workers # Searches run at once; set it to the size of a given executor.
+        self.max_pending = max_pending or 2 * workers
+        self.executor = executor if executor is not None else ProcessPoolExecutor(workers)
+        self.owns_executor = executor is None
+        self.slots = None # Semaphore of the searches still allowed, made on the server's event loop.
+        self.idle = None # Semaphore of the free workers, likewise.
+        self.sessions = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, path: str = None) -> asyncio.AbstractServer:
+        # Listen on a Unix socket at path, or else on host and port.
+        self.slots = asyncio.Semaphore(self.max_pending)
+        self.idle = asyncio.Semaphore(self.workers)
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self) -> None:
+        if self.owns_executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    def renew(self, executor: Executor) -> None:
+        # A worker of the server's own pool died, which breaks the pool for good: later
+        # searches get a new one. A pool given to the server is left to its owner.
+        if self.owns_executor and self.executor is executor:
+            logger.warning("The engine pool is broken; starting a new one.")
+            self.executor = ProcessPoolExecutor(self.workers)
+
+    def release(self, future: asyncio.Future) -> None:
+        # A search is finished (answered, failed or given up on): free its worker and its slot.
+        self.idle.release()
+        self.slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Engine search failed: {future.exception()!r}")
+
+    async def black_move(self, B: Board, time_limit: float) -> Move:
+        # Search Black's move in the pool. The search waits for a free worker before it is
+        # submitted, so its time limit starts when it can run. The slot and the worker are
+        # held until the worker is done, even when the session has stopped waiting for it.
+        await self.slots.acquire()
+        try:
+            await self.idle.acquire()
+        except asyncio.CancelledError:
+            self.slots.release()
+            raise
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            future = loop.run_in_executor(executor, engine_move, encode_position(B, False), self.depth, time_limit)
+        except Exception as error: # The pool would not take the search.
+            self.idle.release()
+            self.slots.release()
+            logger.warning(f"Engine search failed: {error!r}")
+            if isinstance(error, BrokenProcessPool):
+                self.renew(executor)
+            raise
+        future.add_done_callback(self.release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), time_limit + GRACE)
+        except BrokenProcessPool:
+            self.renew(executor)
+            raise
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.sessions += 1
+        session = Session(self.time_limit)
+        if chess_puzzle.DEBUG:
+            logger.debug(f"Session opened ({self.sessions} open).")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode().strip().partition(" ")
+                command = command.upper()
+                if command == "QUIT":
+                    writer.write(b"BYE\n")
+                    await writer.drain()
+                    break
+                try:
+                    reply = await self.command(session, command, argument.strip(), reader)
+                except ValueError as error:
+                    reply = f"ERROR {error}"
+                writer.write((reply + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, ValueError) as error: # A dropped connection, a line too long or not UTF-8.
+            logger.warning(f"Session closed: {error!r}")
+        finally:
+            self.sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+            if chess_puzzle.DEBUG:
+                logger.debug(f"Session closed ({self.sessions} open).")
+
+    async def command(self, session: Session, command: str, argument: str, reader: asyncio.StreamReader) -> str:
+        # The reply to one command; a ValueError becomes an ERROR reply.
+        if command == "BOARD":
+            if argument:
+                lines = argument.split(";")
+                if len(lines) != 3:
+                    raise ValueError(f"Expected 3 parts separated by ';', found {len(lines)}.")
+            else:
+                lines = [(await reader.readline()).decode() for _ in range(3)]
+            try:
+                session.board = parse_board(lines)
+            except IndexError:
+                raise ValueError("Not a valid board.") from None
+            session.over = False
+            return "OK"
+        if command == "MOVE":
+            return await self.play(session, argument)
+        if command == "TIME":
+            seconds = float(argument)
+            if not seconds > 0:
+                raise ValueError("The time limit must be a positive number of seconds.")
+            session.time_limit = min(seconds, self.time_limit)
+            return f"OK {session.time_limit}"
+        if command == "SHOW":
+            if session.board is None:
+                raise ValueError("No board yet; send BOARD first.")
+            return "BOARD " + format_board(session.board, one_line=True).strip()
+        raise ValueError(f"Unknown command {command!r}.")
+
+    async def play(self, session: Session, move: str) -> str:
+        # White's move, then Black's answer from the engine.
+        B = session.board
+        if B is None:
+            raise ValueError("No board yet; send BOARD first.")
+        if session.over:
+            raise ValueError("The game is over.")
+        (start_x, start_y), (finish_x, finish_y) = parse_move(move)
+        piece = piece_at(start_x, start_y, B)
+        if piece is None or not piece.side or not piece.can_move_to(finish_x, finish_y, B):
+            raise ValueError("This is not a valid move.")
+        undo = make_move(piece, finish_x, finish_y, B)
+        status = game_status(False, B)
+        if status != ONGOING:
+            session.over = True
+            return status.upper()
+
+        try:
+            from_x, from_y, x, y = await self.black_move(B, session.time_limit)
+        except asyncio.TimeoutError:
+            unmake_move(undo, B)
+            return "ERROR The engine did not answer in time; White's move was taken back."
+        except Exception: # A failed search, logged by black_move or release.
+            unmake_move(undo, B)
+            return "ERROR The engine failed; White's move was taken back."
+        make_move(piece_at(from_x, from_y, B), x, y, B)
+        reply = f"BLACK {index2location(from_x, from_y)}{index2location(x, y)}"
+        status = game_status(True, B)
+        if status != ONGOING:
+            session.over = True
+            reply += f" {status.upper()}"
+        return reply
+
+async def serve(server: GameServer, host: str, port: int, path: str = None) -> None:
+    listener = await server.start(host, port, path)
+    print(f"Serving games on {path or f'{host}:{port}'}.")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve games against the engine over a local socket.")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address to listen on")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-d", "--depth", type=int, default=DEFAULT_DEPTH, help="engine search depth")
+    parser.add_argument("-t", "--time-limit", type=float, default=DEFAULT_TIME_LIMIT,
+                        help="engine seconds per move, and the most a session may ask for")
+    parser.add_argument("-w", "--workers", type=int, help="engine processes (default: one per CPU)")
+    parser.add_argument("--max-pending", type=int, help="searches queued or running at once (default: twice the workers)")
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.depth, args.time_limit, args.workers, args.max_pending)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
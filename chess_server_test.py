@@ -0,0 +1,137 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import chess_server
+from chess_server import GameServer
+
+MATE_IN_ONE = "BOARD 4; Kc1, Bd2, Bb3; Ka1" # White mates with d2c3
+
+def run(commands, server=None, path=None): # one session against a fresh server: the reply to every line sent
+    async def session():
+        game = server or GameServer(depth=2, time_limit=1.0, workers=2, executor=ThreadPoolExecutor(2))
+        listener = await game.start("127.0.0.1", 0, path)
+        async with listener:
+            if path:
+                reader, writer = await asyncio.open_unix_connection(path)
+            else:
+                reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+            writer.write("".join(line + "\n" for line in commands).encode())
+            await writer.drain()
+            expected = sum(1 for line in commands if line.split(" ")[0].isupper()) # board file lines get no reply
+            replies = [(await reader.readline()).decode().strip() for _ in range(expected)]
+            writer.close()
+            await writer.wait_closed()
+        return replies
+    return asyncio.run(session())
+
+def test_board_and_show(): # a one-line set-up is loaded and shown back
+    assert run(["BOARD 5; Kc5, Bd4; Kb3, Bc3", "SHOW", "QUIT"]) == ["OK", "BOARD 5; Kc5, Bd4; Kb3, Bc3", "BYE"]
+
+def test_board_file_lines(tmp_path): # the three lines of a board file, over a Unix socket
+    replies = run(["BOARD", "5", "Bb5, Kc5, Bd4, Bc1", "Kb3, Bc3, Be3", "SHOW"], path=str(tmp_path / "games.sock"))
+    assert replies == ["OK", "BOARD 5; Bb5, Kc5, Bd4, Bc1; Kb3, Bc3, Be3"]
+
+def test_errors(): # bad commands are answered with ERROR and the session goes on
+    replies = run(["MOVE a1b2", "FLY", "BOARD 5; Kc5", "BOARD 2; Ka1; Kb2", MATE_IN_ONE, "MOVE c1", "MOVE a1b2", "MOVE b3a4x", "TIME -1", "SHOW"])
+    assert [reply.split(" ")[0] for reply in replies[:-1]] == ["ERROR", "ERROR", "ERROR", "ERROR", "OK", "ERROR", "ERROR", "ERROR", "ERROR"]
+    assert replies[-1] == "BOARD 4; Kc1, Bd2, Bb3; Ka1"
+
+def test_move(): # White's move is played and answered by a legal Black move
+    replies = run(["BOARD 5; Kc5, Bd4; Ka1, Be3", "MOVE d4e3", "SHOW"])
+    assert replies[1].startswith("BLACK ")
+    assert "Be3" in replies[2].split(";")[1] # White took the bishop
+
+def test_two_digit_squares(): # a10b10 notation on a large board
+    replies = run(["BOARD 12; Ka12, Bb10; Kl1", "MOVE b10c11", "SHOW"])
+    assert replies[1].startswith("BLACK ")
+    assert "Bc11" in replies[2]
+
+def test_checkmate(): # White's mating move ends the game
+    assert run([MATE_IN_ONE, "MOVE d2c3", "MOVE c3b2", "SHOW"]) == [
+        "OK", "CHECKMATE", "ERROR The game is over.", "BOARD 4; Kc1, Bc3, Bb3; Ka1"]
+
+def test_time_limit(): # a session may shorten Black's time, never lengthen it
+    assert run(["TIME 0.25", "TIME 30"]) == ["OK 0.25", "OK 1.0"]
+
+def test_timeout(monkeypatch): # a search that overruns is given up and White's move taken back
+    monkeypatch.setattr(chess_server, "GRACE", 0.05)
+    monkeypatch.setattr(chess_server, "engine_move", lambda *args: time.sleep(0.5))
+    replies = run(["BOARD 5; Kc5, Bd4; Ka1, Be3", "TIME 0.05", "MOVE d4e3", "SHOW"])
+    assert replies[2].startswith("ERROR")
+    assert replies[3] == "BOARD 5; Kc5, Bd4; Ka1, Be3"
+
+def test_engine_failure(monkeypatch): # a search that fails is reported and White's move taken back
+    def broken(*args):
+        raise RuntimeError("no engine")
+    monkeypatch.setattr(chess_server, "engine_move", broken)
+    replies = run(["BOARD 5; Kc5, Bd4; Ka1, Be3", "MOVE d4e3", "SHOW"])
+    assert replies[1:] == ["ERROR The engine failed; White's move was taken back.", "BOARD 5; Kc5, Bd4; Ka1, Be3"]
+
+def worker_dies(*args): # a worker process that dies in the middle of a search
+    os._exit(1)
+
+def test_broken_pool(monkeypatch): # a dead worker breaks the pool: the move is taken back and a new pool started
+    server = GameServer(depth=1, time_limit=0.5, workers=1)
+    try:
+        monkeypatch.setattr(chess_server, "engine_move", worker_dies)
+        pool = server.executor
+        replies = run(["BOARD 5; Kc5, Bd4; Ka1, Be3", "MOVE d4e3", "SHOW"], server)
+        assert replies[1:] == ["ERROR The engine failed; White's move was taken back.", "BOARD 5; Kc5, Bd4; Ka1, Be3"]
+        assert server.executor is not pool
+        monkeypatch.undo()
+        assert run(["BOARD 5; Kc5, Bd4; Ka1, Be3", "MOVE d4e3"], server)[1].startswith("BLACK ")
+    finally:
+        server.close()
+
+def games(server, sessions): # the replies of sessions that each play one move at once
+    async def play():
+        listener = await server.start("127.0.0.1", 0)
+        address = listener.sockets[0].getsockname()[:2]
+        async def game():
+            reader, writer = await asyncio.open_connection(*address)
+            writer.write(b"BOARD 5; Kc5, Bd4; Ka1, Be3\nMOVE d4e3\n")
+            replies = [(await reader.readline()).decode().strip() for _ in range(2)]
+            writer.close()
+            return replies
+        async with listener:
+            return await asyncio.gather(*(game() for _ in range(sessions)))
+    return asyncio.run(play())
+
+def test_back_pressure(monkeypatch): # many sessions at once, never more searches running than workers
+    running = peak = 0
+    lock = threading.Lock()
+    def slow_move(data, depth, time_limit):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return (1, 1, 2, 2)
+    monkeypatch.setattr(chess_server, "engine_move", slow_move)
+    server = GameServer(time_limit=1.0, workers=2, max_pending=4, executor=ThreadPoolExecutor(8))
+    assert all(replies == ["OK", "BLACK a1b2"] for replies in games(server, 6))
+    assert peak == 2
+
+def test_queued_searches_keep_their_time(monkeypatch): # waiting for a busy worker does not use up a search's time
+    monkeypatch.setattr(chess_server, "GRACE", 0.2)
+    def full_search(data, depth, time_limit):
+        time.sleep(time_limit) # every search uses all of its time
+        return (1, 1, 2, 2)
+    monkeypatch.setattr(chess_server, "engine_move", full_search)
+    server = GameServer(time_limit=0.3, workers=1, max_pending=3, executor=ThreadPoolExecutor(1))
+    assert all(replies == ["OK", "BLACK a1b2"] for replies in games(server, 3))
+
+def test_process_pool(): # the default pool of worker processes plays Black
+    server = GameServer(depth=1, time_limit=0.5, workers=1)
+    try:
+        replies = run(["BOARD 5; Kc5, Bd4; Ka1, Be3", "MOVE d4e3"], server)
+    finally:
+        server.close()
+    assert replies[0] == "OK" and replies[1].startswith("BLACK ")
@@ -0,0 +1,361 @@
+import argparse
+import os
+import struct
+import sys
+from itertools import combinations
+from math import comb
+
+import chess_puzzle
+from chess_geometry import geometry as board_geometry
+from chess_puzzle import Board, King, logger
+
+# Endgame tablebases for small boards, built by retrograde analysis: starting from the
+# checkmates, positions are worked backwards one ply at a time until every won and lost
+# position is known; whatever is left is a draw. The rules are those of the game: bishops
+# slide diagonally up to the first piece, kings step one square, the kings never stand next
+# to each other and a move may not leave the own king in check.
+#
+# A table covers one material signature (the number of white and black bishops next to the
+# two kings) on one board size and stores one byte per position:
+#     0            draw
+#     1 ... 126    the side to move mates in that many plies
+#     128 ... 254  the side to move is mated in (value - 128) plies; 128 is checkmate
+#     255          not a legal position
+# The index of a position is a perfect hash of the side to move, the two king squares and
+# the set of squares of each side's bishops (combinatorial number system), so a probe is a
+# little arithmetic and one array lookup.
+
+MAX_SIZE = 8 # Largest board with tables; the tables grow with the fourth power of S.
+MAX_BISHOPS = 2 # Bishops in a table, both sides together.
+MAX_PIECES = 2 + MAX_BISHOPS
+
+DRAW = 0
+LOSS_BASE = 128
+ILLEGAL = 255
+MAX_DTM = 126
+
+WIN = 1
+LOSS = -1
+
+MAGIC = b"CHTB"
+HEADER = struct.Struct("<4sBBB") # magic, S, white bishops, black bishops
+
+_geometry = {} # S -> (rays, neighbours, between)
+_tables = {} # (S, white bishops, black bishops) -> Tablebase
+
+def geometry(S: int) -> tuple[list, list, list]:
+    # The tables of chess_geometry with squares numbered sq = (y - 1) * S + (x - 1): for each
+    # square the four diagonal rays outwards, the king neighbourhood as a set, and for each
+    # other square the squares strictly between the two on a diagonal (None when they are
+    # not on one).
+    if S in _geometry:
+        return _geometry[S]
+    geo = board_geometry(S)
+    N = S * S
+    rays = [[[geo.index(square) for square in ray] for ray in geo.rays[origin]] for origin in geo.squares]
+    neighbours = [{geo.index(square) for square in geo.neighbours[origin]} for origin in geo.squares]
+    between = [[None] * N for _ in range(N)]
+    for (a, b), squares in geo.between.items():
+        between[geo.index(a)][geo.index(b)] = tuple(geo.index(square) for square in squares)
+    _geometry[S] = (rays, neighbours, between)
+    return _geometry[S]
+
+def combination_rank(squares: tuple[int, ...]) -> int:
+    # Rank of a sorted tuple of distinct squares among all sets of that size.
+    return sum(comb(sq, k + 1) for k, sq in enumerate(squares))
+
+def parse_signature(signature: str) -> tuple[int, int]:
+    # "KBBvK" -> (2, 0): the numbers of white and black bishops.
+    white, _, black = signature.upper().partition("V")
+    if not (white.startswith("K") and black.startswith("K")) or set(white[1:] + black[1:]) - {"B"}:
+        raise ValueError(f"Not a signature of kings and bishops: {signature}.")
+    return len(white) - 1, len(black) - 1
+
+def signature_name(white_bishops: int, black_bishops: int) -> str:
+    return "K" + "B" * white_bishops + "vK" + "B" * black_bishops
+
+class Tablebase:
+    def __init__(self, S: int, white_bishops: int, black_bishops: int, values: bytearray = None):
+        self.S = S
+        self.white_bishops = white_bishops
+        self.black_bishops = black_bishops
+        N = S * S
+        self.white_sets = comb(N, white_bishops)
+        self.black_sets = comb(N, black_bishops)
+        self.size = 2 * N * N * self.white_sets * self.black_sets
+        self.values = values if values is not None else bytearray(self.size)
+        if len(self.values) != self.size:
+            raise ValueError(f"A {signature_name(white_bishops, black_bishops)} table for S={S} has "
+                             f"{self.size} positions, not {len(self.values)}.")
+
+    def index(self, side: bool, white_king: int, black_king: int, whites: tuple, blacks: tuple) -> int:
+        N = self.S * self.S
+        i = (int(side) * N + white_king) * N + black_king
+        i = i * self.white_sets + combination_rank(whites)
+        return i * self.black_sets + combination_rank(blacks)
+
+    def value(self, side: bool, white_king: int, black_king: int, whites: tuple, blacks: tuple) -> int:
+        return self.values[self.index(side, white_king, black_king, whites, blacks)]
+
+    def save(self, filename: str) -> None:
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.S, self.white_bishops, self.black_bishops))
+            f.write(self.values)
+
+def load_tablebase(filename: str) -> Tablebase:
+    # Read a table saved by Tablebase.save and make it available to probe.
+    with open(filename, "rb") as f:
+        magic, S, white_bishops, black_bishops = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a tablebase file.")
+        table = Tablebase(S, white_bishops, black_bishops, bytearray(f.read()))
+    _tables[(S, white_bishops, black_bishops)] = table
+    return table
+
+def load_tablebases(directory: str) -> int:
+    # Load every .tb file of a directory; returns how many were loaded.
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".tb"))
+    for name in names:
+        load_tablebase(os.path.join(directory, name))
+    return len(names)
+
+def unload_tablebases() -> None:
+    _tables.clear()
+
+def is_attacked(square: int, bishops, occupied, between) -> bool:
+    # Whether one of the bishops has a clear diagonal to square.
+    for bishop in bishops:
+        path = between[bishop][square]
+        if path is not None and not any(sq in occupied for sq in path):
+            return True
+    return False
+
+def generate_tablebase(S: int, white_bishops: int, black_bishops: int) -> Tablebase:
+    # Build (or return the already built) table for a signature, building the tables its
+    # captures lead to first. Every table built is kept for probe.
+    key = (S, white_bishops, black_bishops)
+    if key in _tables:
+        return _tables[key]
+    if not 3 <= S <= MAX_SIZE:
+        raise ValueError(f"Tablebases are for boards of 3 to {MAX_SIZE} squares a side, not {S}.")
+    if white_bishops < 0 or black_bishops < 0 or white_bishops + black_bishops > MAX_BISHOPS:
+        raise ValueError(f"Tablebases hold at most {MAX_BISHOPS} bishops.")
+    after_white_loss = generate_tablebase(S, white_bishops - 1, black_bishops) if white_bishops else None
+    after_black_loss = generate_tablebase(S, white_bishops, black_bishops - 1) if black_bishops else None
+
+    rays, neighbours, between = geometry(S)
+    N = S * S
+    table = Tablebase(S, white_bishops, black_bishops)
+    values = table.values
+    counts = bytearray(table.size) # Legal moves not yet known to lose (for the side to move).
+    levels = [[] for _ in range(MAX_DTM + 2)] # Positions decided at each distance to mate.
+    events = [[] for _ in range(MAX_DTM + 2)] # (position, move wins) from captures into smaller tables.
+
+    def pieces_of(side, white_king, black_king, whites, blacks):
+        # (own king, enemy king, own bishops, enemy bishops) for the side to move.
+        if side:
+            return white_king, black_king, whites, blacks
+        return black_king, white_king, blacks, whites
+
+    def arrange(side, own_king, enemy_king, own, enemy):
+        # Back from the point of view of side to (white king, black king, whites, blacks).
+        if side:
+            return own_king, enemy_king, tuple(sorted(own)), tuple(sorted(enemy))
+        return enemy_king, own_king, tuple(sorted(enemy)), tuple(sorted(own))
+
+    def moves(side, own_king, enemy_king, own, enemy):
+        # Legal moves of side as (captured square or None, position after the move for the
+        # other side, in the terms of arrange).
+        occupied = {own_king, enemy_king, *own, *enemy}
+        for target in neighbours[own_king]:
+            if target in occupied and target not in enemy:
+                continue
+            if target == enemy_king or target in neighbours[enemy_king]:
+                continue
+            remaining = [sq for sq in enemy if sq != target]
+            if is_attacked(target, remaining, occupied - {own_king}, between):
+                continue
+            yield (target if target in enemy else None), arrange(side, target, enemy_king, own, remaining)
+        for bishop in own:
+            others = [sq for sq in own if sq != bishop]
+            for ray in rays[bishop]:
+                for target in ray:
+                    if target in occupied and target not in enemy:
+                        break # Own piece or the enemy king.
+                    remaining = [sq for sq in enemy if sq != target]
+                    after = (occupied - {bishop}) | {target}
+                    if not is_attacked(own_king, remaining, after, between):
+                        yield (target if target in enemy else None), \
+                            arrange(side, own_king, enemy_king, others + [target], remaining)
+                    if target in enemy:
+                        break
+
+    # Forward pass: mark illegal positions, count the legal moves of the others, find the
+    # checkmates and look up every capture in the smaller tables.
+    for side in (True, False):
+        for white_king in range(N):
+            for black_king in range(N):
+                if black_king == white_king or black_king in neighbours[white_king]:
+                    for whites in combinations(range(N), white_bishops):
+                        for blacks in combinations(range(N), black_bishops):
+                            values[table.index(side, white_king, black_king, whites, blacks)] = ILLEGAL
+                    continue
+                for whites in combinations(range(N), white_bishops):
+                    for blacks in combinations(range(N), black_bishops):
+                        i = table.index(side, white_king, black_king, whites, blacks)
+                        squares = {white_king, black_king, *whites, *blacks}
+                        if len(squares) != 2 + white_bishops + black_bishops:
+                            values[i] = ILLEGAL
+                            continue
+                        own_king, enemy_king, own, enemy = pieces_of(side, white_king, black_king, whites, blacks)
+                        if is_attacked(enemy_king, own, squares, between):
+                            values[i] = ILLEGAL # The side that just moved is in check.
+                            continue
+                        count = 0
+                        for captured, after in moves(side, own_king, enemy_king, own, enemy):
+                            count += 1
+                            if captured is None:
+                                continue
+                            smaller = after_black_loss if side else after_white_loss
+                            result = smaller.value(not side, *after)
+                            if result >= LOSS_BASE:
+                                events[result - LOSS_BASE].append((i, True))
+                            elif result != DRAW:
+                                events[result].append((i, False))
+                        counts[i] = count
+                        if count == 0 and is_attacked(own_king, enemy, squares, between):
+                            values[i] = LOSS_BASE # Checkmate.
+                            levels[0].append(i)
+
+    def decide(i, move_wins, distance):
+        # A move of position i leads to a position decided distance plies from mate.
+        if values[i] != DRAW:
+            return
+        if move_wins:
+            values[i] = distance + 1
+            levels[distance + 1].append(i)
+        else:
+            counts[i] -= 1
+            if counts[i] == 0:
+                values[i] = LOSS_BASE + distance + 1
+                levels[distance + 1].append(i)
+
+    # Backward pass, one ply at a time: a position with a move to a lost position is won,
+    # one whose moves all reach won positions is lost.
+    for distance in range(MAX_DTM + 1):
+        for i, move_wins in events[distance]:
+            decide(i, move_wins, distance)
+        for i in levels[distance]:
+            move_wins = values[i] >= LOSS_BASE
+            for previous in unmoves(table, i, rays, neighbours, between):
+                decide(previous, move_wins, distance)
+    if levels[MAX_DTM + 1]:
+        raise ValueError(f"Mates longer than {MAX_DTM} plies do not fit in a byte.")
+
+    _tables[key] = table
+    if chess_puzzle.DEBUG:
+        logger.debug(f"Tablebase {signature_name(white_bishops, black_bishops)} for S={S} built: "
+                     f"{sum(len(level) for level in levels)} won or lost positions.")
+    return table
+
+def unmoves(table: Tablebase, i: int, rays, neighbours, between):
+    # Indexes of the legal positions from which a non-capturing move leads to position i.
+    S = table.S
+    N = S * S
+    position = decode(table, i)
+    side, white_king, black_king, whites, blacks = position
+    mover = not side # The side that made the move into position i.
+    if mover:
+        own_king, enemy_king, own, enemy = white_king, black_king, whites, blacks
+    else:
+        own_king, enemy_king, own, enemy = black_king, white_king, blacks, whites
+    occupied = {white_king, black_king, *whites, *blacks}
+
+    def index(new_own_king, new_own):
+        new_own = tuple(sorted(new_own))
+        if mover:
+            return table.index(mover, new_own_king, enemy_king, new_own, enemy)
+        return table.index(mover, enemy_king, new_own_king, enemy, new_own)
+
+    for origin in neighbours[own_king]:
+        if origin in occupied or origin in neighbours[enemy_king]:
+            continue
+        after = (occupied - {own_king}) | {origin}
+        if not is_attacked(enemy_king, own, after, between): # The other side was not in check.
+            yield index(origin, own)
+    for bishop in own:
+        others = [sq for sq in own if sq != bishop]
+        for ray in rays[bishop]:
+            for origin in ray:
+                if origin in occupied:
+                    break
+                after = (occupied - {bishop}) | {origin}
+                if not is_attacked(enemy_king, others + [origin], after, between):
+                    yield index(own_king, others + [origin])
+
+def decode(table: Tablebase, i: int) -> tuple[bool, int, int, tuple, tuple]:
+    # (side to move, white king, black king, white bishops, black bishops) of index i.
+    N = table.S * table.S
+    i, black_rank = divmod(i, table.black_sets)
+    i, white_rank = divmod(i, table.white_sets)
+    i, black_king = divmod(i, N)
+    side, white_king = divmod(i, N)
+    return bool(side), white_king, black_king, combination_unrank(white_rank, table.white_bishops), \
+        combination_unrank(black_rank, table.black_bishops)
+
+def combination_unrank(rank: int, k: int) -> tuple[int, ...]:
+    squares = []
+    for size in range(k, 0, -1):
+        sq = size - 1
+        while comb(sq + 1, size) <= rank:
+            sq += 1
+        rank -= comb(sq, size)
+        squares.append(sq)
+    return tuple(reversed(squares))
+
+def probe(B: Board, side: bool) -> tuple[int, int]:
+    # (WIN, DRAW or LOSS for side, plies to mate) when side is to move in B, or None when no
+    # loaded table covers the position (or it is not a legal one).
+    S = B[0]
+    if S > MAX_SIZE or len(B[1]) > MAX_PIECES:
+        return None
+    kings = {}
+    whites = []
+    blacks = []
+    for piece in B[1]:
+        sq = (piece.pos_y - 1) * S + (piece.pos_x - 1)
+        if isinstance(piece, King):
+            kings[piece.side] = sq
+        elif piece.side:
+            whites.append(sq)
+        else:
+            blacks.append(sq)
+    table = _tables.get((S, len(whites), len(blacks)))
+    if table is None or len(kings) != 2:
+        return None
+    value = table.value(side, kings[True], kings[False], tuple(sorted(whites)), tuple(sorted(blacks)))
+    if value == ILLEGAL:
+        return None
+    if value == DRAW:
+        return DRAW, 0
+    if value >= LOSS_BASE:
+        return LOSS, value - LOSS_BASE
+    return WIN, value
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build endgame tablebases for small boards.")
+    parser.add_argument("size", type=int, help=f"board size, 3 to {MAX_SIZE}")
+    parser.add_argument("signatures", nargs="+", help="material, such as KBvK KBBvK KBvKB")
+    parser.add_argument("-o", "--output", default=".", help="directory for the .tb files")
+    args = parser.parse_args(argv)
+
+    for signature in args.signatures:
+        generate_tablebase(args.size, *parse_signature(signature))
+    for (S, white_bishops, black_bishops), table in sorted(_tables.items()):
+        filename = os.path.join(args.output, f"{signature_name(white_bishops, black_bishops)}_{S}.tb")
+        table.save(filename)
+        print(f"{filename}: {table.size} positions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import os
+import random
+from math import comb
+
+import pytest
+from chess_puzzle import *
+from chess_engine import MATE, search
+from chess_tablebase import *
+import chess_tablebase
+
+_built = {} # tables built once for the whole module: (S, white bishops, black bishops) -> tables
+
+@pytest.fixture(autouse=True)
+def no_tables(): # every test starts without loaded tables and leaves none behind
+    unload_tablebases()
+    yield
+    unload_tablebases()
+
+def build(S, white_bishops, black_bishops): # a table and the smaller ones it needs, loaded
+    key = (S, white_bishops, black_bishops)
+    if key not in _built:
+        generate_tablebase(*key)
+        _built[key] = dict(chess_tablebase._tables)
+    chess_tablebase._tables.update(_built[key])
+    return _built[key][key]
+
+def board_of(table, i): # the board and side to move of a table index
+    side, white_king, black_king, whites, blacks = decode(table, i)
+    S = table.S
+    square = lambda sq: (sq % S + 1, sq // S + 1)
+    pieces = [King(*square(white_king), True), King(*square(black_king), False)]
+    pieces += [Bishop(*square(sq), True) for sq in whites] + [Bishop(*square(sq), False) for sq in blacks]
+    return (S, pieces), side
+
+def expected_value(B, side): # the value of a position from its moves under the game's rules and probes of the results
+    if is_check(not side, B):
+        return ILLEGAL
+    B = as_indexed(B, side)
+    results = []
+    for piece, x, y in list(generate_legal_moves(side, B)):
+        undo = make_move(piece, x, y, B)
+        results.append(probe(B, not side))
+        unmake_move(undo, B)
+    if not results:
+        return LOSS_BASE if is_check(side, B) else DRAW
+    wins = [distance for outcome, distance in results if outcome == LOSS]
+    if wins:
+        return min(wins) + 1
+    if all(outcome == WIN for outcome, distance in results):
+        return LOSS_BASE + max(distance for outcome, distance in results) + 1
+    return DRAW
+
+def check_table(table, positions): # every given index agrees with the rules one move ahead
+    for i in positions:
+        B, side = board_of(table, i)
+        if len({(p.pos_x, p.pos_y) for p in B[1]}) < len(B[1]):
+            assert table.values[i] == ILLEGAL
+            continue
+        kings = [p for p in B[1] if isinstance(p, King)]
+        if abs(kings[0].pos_x - kings[1].pos_x) <= 1 and abs(kings[0].pos_y - kings[1].pos_y) <= 1:
+            assert table.values[i] == ILLEGAL
+            continue
+        assert table.values[i] == expected_value(B, side), (B, side)
+
+# signature and index tests:
+def test_parse_signature(): # material signatures name the bishops of each side
+    assert parse_signature("KBvK") == (1, 0)
+    assert parse_signature("kbbvk") == (2, 0)
+    assert parse_signature("KBvKB") == (1, 1)
+    assert signature_name(0, 2) == "KvKBB"
+    with pytest.raises(ValueError):
+        parse_signature("KQvK")
+
+def test_index1(): # the index is a perfect hash: every index decodes to a placement that maps back to it
+    table = Tablebase(3, 2, 0)
+    assert table.size == 2 * 9 * 9 * 36
+    for i in range(table.size):
+        assert table.index(*decode(table, i)) == i
+
+def test_index2(): # bishops of one colour are a set: their order does not matter
+    table = Tablebase(4, 0, 2)
+    assert combination_rank((3, 10)) == comb(3, 1) + comb(10, 2)
+    assert combination_unrank(combination_rank((3, 10)), 2) == (3, 10)
+    assert decode(table, table.index(False, 0, 15, (), (3, 10)))[4] == (3, 10)
+
+def test_generate_tablebase1(): # sizes and bishop counts outside the tables are refused
+    with pytest.raises(ValueError):
+        generate_tablebase(MAX_SIZE + 1, 1, 0)
+    with pytest.raises(ValueError):
+        generate_tablebase(4, 2, 1)
+
+# retrograde analysis tests:
+def test_generate_tablebase2(): # kings alone never win
+    table = build(4, 0, 0)
+    assert set(table.values) == {DRAW, ILLEGAL}
+
+def test_generate_tablebase3(): # one bishop cannot mate on a 4x4 board, and the table says so
+    table = build(4, 1, 0)
+    assert set(table.values) == {DRAW, ILLEGAL}
+    check_table(table, range(0, table.size, 7))
+
+def test_generate_tablebase4(): # KBBvK agrees with the game's rules everywhere on 3x3 and 4x4 boards
+    table = build(3, 2, 0)
+    check_table(table, range(table.size))
+    table = build(4, 2, 0)
+    assert any(0 < value < LOSS_BASE for value in table.values)
+    check_table(table, random.Random(18).sample(range(table.size), 1500))
+
+def test_generate_tablebase5(): # KBvKB, where captures lead into the smaller tables
+    table = build(4, 1, 1)
+    check_table(table, random.Random(18).sample(range(table.size), 1500))
+
+def test_generate_tablebase6(): # wins are odd and losses even numbers of plies
+    table = build(4, 2, 0)
+    assert all(value % 2 == 1 for value in table.values if 0 < value < LOSS_BASE)
+    assert all(value % 2 == 0 for value in table.values if LOSS_BASE <= value < ILLEGAL)
+
+# probe tests:
+def test_probe1(): # nothing is known without a loaded table, or for positions outside every table
+    B = (4, [King(1, 1, False), King(3, 3, True), Bishop(1, 3, True), Bishop(2, 3, True)])
+    assert probe(B, False) is None
+    build(4, 2, 0)
+    assert probe(B, False) is not None
+    assert probe(read_board("board_examp.txt"), True) is None
+
+def test_probe2(): # a checkmate is a loss in 0, the mating move a win in 1
+    build(4, 2, 0)
+    mated = (4, [King(1, 1, False), King(3, 1, True), Bishop(3, 3, True), Bishop(2, 3, True)])
+    assert is_check(False, mated) and not list(generate_legal_moves(False, mated))
+    assert probe(mated, False) == (LOSS, 0)
+    before = (4, [King(1, 1, False), King(3, 1, True), Bishop(4, 2, True), Bishop(2, 3, True)])
+    assert probe(before, True) == (WIN, 1)
+
+def test_probe3(): # an illegal position (the side not to move in check) is not answered
+    build(4, 2, 0)
+    B = (4, [King(1, 1, False), King(3, 1, True), Bishop(3, 3, True), Bishop(2, 3, True)])
+    assert probe(B, True) is None
+
+def test_is_checkmate_tablebase(monkeypatch, capsys): # with a table, is_checkmate needs no move generation
+    build(4, 2, 0)
+    mated = (4, [King(1, 1, False), King(3, 1, True), Bishop(3, 3, True), Bishop(2, 3, True)])
+    lost = (4, [King(1, 1, False), King(4, 1, True), Bishop(3, 3, True), Bishop(2, 3, True)])
+    stalemate = (4, [King(1, 1, False), King(3, 1, True), Bishop(4, 2, True), Bishop(2, 3, True)])
+    with monkeypatch.context() as patch:
+        patch.setattr("chess_puzzle.generate_legal_moves", None)
+        assert is_checkmate(False, mated)
+        assert "Checkmate!" in capsys.readouterr().out
+        assert not is_checkmate(False, lost)
+    # A drawn position may be a stalemate, which only the moves tell apart.
+    assert game_status(False, stalemate) == STALEMATE
+
+def test_is_checkmate_agrees(): # is_checkmate gives the same answers with and without the table
+    rng = random.Random(19)
+    boards = [random_board(rng, 4, 2) for _ in range(300)]
+    without = [(is_checkmate(True, B), is_checkmate(False, B)) for B in boards]
+    build(4, 2, 0)
+    build(4, 0, 2)
+    build(4, 1, 1)
+    assert [(is_checkmate(True, B), is_checkmate(False, B)) for B in boards] == without
+
+# engine tests:
+def test_search_tablebase1(): # the engine scores a won ending by its exact distance to mate
+    table = build(4, 0, 2)
+    won = [i for i in range(table.size) if not decode(table, i)[0] and 0 < table.values[i] < LOSS_BASE]
+    for i in random.Random(20).sample(won, 20):
+        B, side = board_of(table, i)
+        move, score, depth, nodes = search(B, False, 1)
+        assert score == MATE - table.values[i]
+
+def test_search_tablebase2(): # the move played keeps the win and shortens the mate
+    table = build(4, 0, 2)
+    won = [i for i in range(table.size) if not decode(table, i)[0] and 1 < table.values[i] < LOSS_BASE]
+    for i in random.Random(21).sample(won, 20):
+        B, side = board_of(table, i)
+        B = as_indexed(B, False)
+        piece, x, y = search(B, False, 1)[0]
+        make_move(piece, x, y, B)
+        assert probe(B, True) == (LOSS, table.values[i] - 1)
+
+# file tests:
+def test_save_load(tmp_path): # a saved table loads back with the same values and is probed
+    table = build(3, 1, 0)
+    filename = str(tmp_path / "KBvK_3.tb")
+    table.save(filename)
+    assert os.path.getsize(filename) == HEADER.size + table.size
+    unload_tablebases()
+    assert load_tablebase(filename).values == table.values
+    assert probe((3, [King(1, 1, True), King(3, 3, False), Bishop(2, 1, True)]), True) == (DRAW, 0)
+
+def test_load_tablebase(tmp_path): # other files are refused
+    filename = str(tmp_path / "bad.tb")
+    with open(filename, "wb") as f:
+        f.write(b"XXXX\x03\x01\x00")
+    with pytest.raises(ValueError):
+        load_tablebase(filename)
+
+def test_main(tmp_path, capsys): # the command line builds a table and the ones it needs, and load_tablebases reads them back
+    assert main(["3", "KBvK", "-o", str(tmp_path)]) == 0
+    assert sorted(os.listdir(tmp_path)) == ["KBvK_3.tb", "KvK_3.tb"]
+    unload_tablebases()
+    assert load_tablebases(str(tmp_path)) == 2
+    assert (3, 1, 0) in chess_tablebase._tables
@@ -0,0 +1,292 @@
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from chess_geometry import DIRECTIONS, geometry
+from chess_puzzle import Board, King, as_indexed, is_check, generate_legal_moves, random_board
+from chess_engine import evaluate, BISHOP_VALUE, MOBILITY_WEIGHT, KING_DANGER_WEIGHT, KING_FREEDOM_WEIGHT, BISHOP_PAIR_BONUS
+
+# Batch evaluation and move generation with NumPy: many same-size positions scored or
+# expanded at once, for offline analysis and data generation where one IndexedBoard at a
+# time is too slow. The scores, checks and moves are the same as evaluate, is_check and
+# generate_legal_moves give position by position.
+#
+# A position is an S x S int8 plane, row y - 1 and column x - 1 holding the piece on (x, y):
+# 1 a white bishop, 2 the white king, -1 a black bishop, -2 the black king, 0 empty. A batch
+# is a stack of planes, shape (N, S, S). The diagonals of every square of every position are
+# walked together, one step per array operation, to find the first piece on each; the attack
+# maps, mobility, the bishop pair and king safety follow from that.
+
+EMPTY = 0
+WHITE_BISHOP = 1
+WHITE_KING = 2
+BLACK_BISHOP = -1
+BLACK_KING = -2
+OFF_BOARD = 3 # Value of the padding square past the end of every ray; it blocks like a piece.
+
+CHUNK_CELLS = 1 << 18 # Ray cells walked at once; larger batches are done in chunks.
+
+BatchAnalysis = tuple[np.ndarray, np.ndarray, np.ndarray] # (scores for White, White in check, Black in check)
+
+_neighbours = {} # S -> king neighbourhood table
+
+def neighbour_table(S: int) -> np.ndarray:
+    # neighbours[sq] is the mask of the squares a king on sq = (y - 1) * S + (x - 1) attacks.
+    if S in _neighbours:
+        return _neighbours[S]
+    geo = geometry(S)
+    neighbours = np.zeros((S * S, S * S), dtype=bool)
+    for square in geo.squares:
+        neighbours[geo.index(square), [geo.index(n) for n in geo.neighbours[square]]] = True
+    _neighbours[S] = neighbours
+    return neighbours
+
+def encode_boards(boards: list[Board]) -> np.ndarray:
+    # Stack boards of one size into an (N, S, S) int8 batch of planes.
+    S = boards[0][0] if boards else 0
+    planes = np.zeros((len(boards), S, S), dtype=np.int8)
+    for i, B in enumerate(boards):
+        if B[0] != S:
+            raise ValueError(f"A batch holds boards of one size: {B[0]} is not {S}.")
+        for piece in B[1]:
+            code = WHITE_KING if isinstance(piece, King) else WHITE_BISHOP # Black is the negative.
+            planes[i, piece.pos_y - 1, piece.pos_x - 1] = code if piece.side else -code
+    return planes
+
+def first_blockers(planes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # For each position, diagonal and square of a chunk of (n, S, S) planes: how many squares
+    # a bishop on the square attacks along the diagonal (up to and including the first
+    # piece) and what that first piece is (OFF_BOARD when there is none). The planes sit in
+    # the middle of a 3S x 3S frame of OFF_BOARD, so step k along a diagonal of every square
+    # at once is just a shifted view of the frame, walked for the whole chunk together.
+    n, S = planes.shape[0], planes.shape[-1]
+    frame = np.full((n, 3 * S, 3 * S), OFF_BOARD, dtype=np.int8)
+    frame[:, S:2 * S, S:2 * S] = planes
+    steps = np.zeros((n, 4, S, S), dtype=np.int16)
+    blocker = np.zeros((n, 4, S, S), dtype=np.int8)
+    for d, (dx, dy) in enumerate(DIRECTIONS):
+        ray_blocker = blocker[:, d]
+        ray_steps = steps[:, d]
+        for k in range(1, S + 1):
+            open_ray = ray_blocker == EMPTY
+            if not open_ray.any():
+                break # Every ray in this direction has ended.
+            ray_steps += open_ray
+            cell = frame[:, S + k * dy:2 * S + k * dy, S + k * dx:2 * S + k * dx]
+            np.copyto(ray_blocker, cell, where=open_ray)
+    reach = steps - (blocker == OFF_BOARD) # The edge of the board is not a square attacked.
+    return reach.reshape(n, 4, S * S), blocker.reshape(n, 4, S * S)
+
+def analyse_batch(planes: np.ndarray) -> BatchAnalysis:
+    # The evaluate score for White and whether each king is in check, for every position of
+    # an (N, S, S) batch. Every position needs exactly one king of each side.
+    planes = np.asarray(planes, dtype=np.int8)
+    count, S = planes.shape[0], planes.shape[-1]
+    flat = planes.reshape(count, S * S)
+    if not ((flat == WHITE_KING).sum(axis=1) == 1).all() or not ((flat == BLACK_KING).sum(axis=1) == 1).all():
+        raise ValueError("Every position must have exactly one king of each side.")
+    neighbours = neighbour_table(S)
+    geo = geometry(S)
+    light = np.array([geo.light[square] for square in geo.squares])
+    scores = np.empty(count, dtype=np.int64)
+    white_in_check = np.empty(count, dtype=bool)
+    black_in_check = np.empty(count, dtype=bool)
+    chunk = max(1, CHUNK_CELLS // (S * S * 4))
+    for start in range(0, count, chunk):
+        part = flat[start:start + chunk]
+        n = part.shape[0]
+        rows = np.arange(n)
+        reach, blocker = first_blockers(part.reshape(-1, S, S))
+        reach = reach.sum(axis=1)
+        white_bishops = part == WHITE_BISHOP
+        black_bishops = part == BLACK_BISHOP
+        material = BISHOP_VALUE * (white_bishops.sum(axis=1) - black_bishops.sum(axis=1))
+        mobility = MOBILITY_WEIGHT * ((reach * white_bishops).sum(axis=1) - (reach * black_bishops).sum(axis=1))
+        def pair(bishops):
+            return ((bishops & light).any(axis=1) & (bishops & ~light).any(axis=1)).astype(np.int64)
+        bishop_pair = BISHOP_PAIR_BONUS * (pair(white_bishops) - pair(black_bishops))
+
+        # A square is attacked by a side's bishop when that bishop is the first piece on one
+        # of the square's diagonals, and by its king when it is next to it.
+        white_king = np.argmax(part == WHITE_KING, axis=1)
+        black_king = np.argmax(part == BLACK_KING, axis=1)
+        white_zone = neighbours[white_king]
+        black_zone = neighbours[black_king]
+        by_white = (blocker == WHITE_BISHOP).any(axis=1) | white_zone
+        by_black = (blocker == BLACK_BISHOP).any(axis=1) | black_zone
+        empty = part == EMPTY
+
+        def safety(zone, by_enemy):
+            danger = (zone & by_enemy).sum(axis=1)
+            freedom = (zone & ~by_enemy & empty).sum(axis=1)
+            return KING_FREEDOM_WEIGHT * freedom - KING_DANGER_WEIGHT * danger
+
+        scores[start:start + n] = material + mobility + bishop_pair + safety(white_zone, by_black) - safety(black_zone, by_white)
+        white_in_check[start:start + n] = by_black[rows, white_king]
+        black_in_check[start:start + n] = by_white[rows, black_king]
+    return scores, white_in_check, black_in_check
+
+def evaluate_batch(planes: np.ndarray, side: bool = True) -> np.ndarray:
+    # evaluate(B, side) of every position of a batch.
+    scores = analyse_batch(planes)[0]
+    return scores if side else -scores
+
+def is_check_batch(side: bool, planes: np.ndarray) -> np.ndarray:
+    # is_check(side, B) of every position of a batch.
+    _, white_in_check, black_in_check = analyse_batch(planes)
+    return white_in_check if side else black_in_check
+
+MOVE_CHUNK_CELLS = 1 << 22 # Move mask cells (piece x destination square) built at once.
+
+PieceMoves = tuple[np.ndarray, np.ndarray] # (squares of the pieces, their destination masks)
+
+_rays = {} # S -> (rays, distances)
+
+def ray_tables(S: int) -> tuple[np.ndarray, np.ndarray]:
+    # For each square sq = (y - 1) * S + (x - 1) and diagonal d (in DIRECTIONS order):
+    #   rays[sq, d, k]          the square k + 1 steps out along the diagonal (S * S past its end)
+    #   distances[d, sq, to]    how many steps along diagonal d square to is from sq (0 when it is not on it)
+    if S in _rays:
+        return _rays[S]
+    N = S * S
+    rays = np.full((N, 4, S), N, dtype=np.intp)
+    distances = np.zeros((4, N, N), dtype=np.int16)
+    geo = geometry(S)
+    for square in geo.squares:
+        sq = geo.index(square)
+        for d, ray in enumerate(geo.rays[square]):
+            for k, target in enumerate(ray):
+                rays[sq, d, k] = geo.index(target)
+                distances[d, sq, geo.index(target)] = k + 1
+    _rays[S] = (rays, distances)
+    return _rays[S]
+
+def move_masks(planes: np.ndarray, side: bool) -> PieceMoves:
+    # The legal moves of side in every position of an (N, S, S) batch, piece by piece, under
+    # the rules of can_move_to and generate_legal_moves. With P the most pieces side has in
+    # any position of the batch:
+    #   squares[i, p]           the square of piece p of side in position i (-1 past its last piece)
+    #   destinations[i, p, to]  whether that piece may move to square to
+    # Pieces are listed in square order. Only the pieces' own rows are built, so memory and
+    # time grow with P * S * S per position rather than with S ** 4.
+    planes = np.asarray(planes, dtype=np.int8)
+    count, S = planes.shape[0], planes.shape[-1]
+    flat = planes.reshape(count, S * S)
+    if not ((flat == WHITE_KING).sum(axis=1) == 1).all() or not ((flat == BLACK_KING).sum(axis=1) == 1).all():
+        raise ValueError("Every position must have exactly one king of each side.")
+    own = (1 if side else -1) * flat > 0
+    P = int(own.sum(axis=1).max())
+    # The own pieces first, in square order: a stable sort on "not own".
+    order = np.argsort(~own, axis=1, kind="stable")[:, :P]
+    squares = np.where(np.take_along_axis(own, order, axis=1), order, -1)
+    destinations = np.zeros((count, P, S * S), dtype=bool)
+    chunk = max(1, MOVE_CHUNK_CELLS // (P * S * S))
+    for start in range(0, count, chunk):
+        destinations[start:start + chunk] = _chunk_moves(flat[start:start + chunk], squares[start:start + chunk], S, side)
+    return squares, destinations
+
+def _chunk_moves(part: np.ndarray, squares: np.ndarray, S: int, side: bool) -> np.ndarray:
+    sign = 1 if side else -1
+    own_bishop, own_king = sign * WHITE_BISHOP, sign * WHITE_KING
+    enemy_bishop, enemy_king = -own_bishop, -own_king
+    n = part.shape[0]
+    rows = np.arange(n)
+    rays, distances = ray_tables(S)
+    neighbours = neighbour_table(S)
+    own = sign * part > 0
+    reach, blocker = first_blockers(part.reshape(n, S, S))
+    start = np.maximum(squares, 0) # Padding slots read square 0; their kind is EMPTY.
+    kind = np.where(squares >= 0, np.take_along_axis(part, start, axis=1), EMPTY)
+
+    # Bishops: each diagonal up to the first piece, which is taken if it is an enemy one.
+    steps = reach - ((blocker == own_bishop) | (blocker == own_king))
+    moves = np.zeros((n, squares.shape[1], S * S), dtype=bool)
+    for d in range(4):
+        piece_steps = np.take_along_axis(steps[:, d], start, axis=1)
+        distance = distances[d][start] # (n, P, S * S): steps from each piece along d
+        moves |= (distance > 0) & (distance <= piece_steps[:, :, None])
+    moves &= (kind == own_bishop)[:, :, None]
+
+    # [Rule4] as in check_analysis: the diagonals of the king give the checking bishops, the
+    # squares that block a single check, and the own pieces pinned to the king.
+    king = np.argmax(part == own_king, axis=1)
+    checks = np.zeros(n, dtype=np.intp)
+    block = np.zeros((n, S * S), dtype=bool)
+    for d in range(4):
+        distance = distances[d][king] # (n, S * S): steps from the king along d
+        first_reach = reach[rows, d, king]
+        first_piece = blocker[rows, d, king]
+        on_line = (distance > 0) & (distance <= first_reach[:, None])
+        checker = first_piece == enemy_bishop
+        checks += checker
+        block |= on_line & checker[:, None]
+        # The square of the first piece (clamped onto the board where the ray is empty, as
+        # only rows with an own bishop there are used), and the next piece behind it.
+        shield = np.minimum(rays[king, d, np.maximum(first_reach - 1, 0)], S * S - 1)
+        pinned = np.flatnonzero((first_piece == own_bishop) & (blocker[rows, d, shield] == enemy_bishop))
+        if len(pinned):
+            pin_reach = first_reach + reach[rows, d, shield]
+            pin_line = (distance > 0) & (distance <= pin_reach[:, None])
+            pin_line[rows, shield] = False
+            slot = np.argmax(squares == shield[:, None], axis=1) # The pinned piece's row.
+            moves[pinned, slot[pinned]] &= pin_line[pinned]
+    moves &= np.where((checks == 0)[:, None], True, block & (checks == 1)[:, None])[:, None, :]
+
+    # The king: a neighbouring square that is not its own piece's nor the enemy king's, and
+    # not attacked by the enemy once the king has left its square. Where the first piece on
+    # a diagonal of the square is the king itself, the piece behind it, which is the king's
+    # own first piece in that direction, is what attacks the square.
+    behind_king = blocker[rows, :, king][:, :, None]
+    attacked = ((blocker == enemy_bishop) | ((blocker == own_king) & (behind_king == enemy_bishop))).any(axis=1)
+    attacked |= neighbours[np.argmax(part == enemy_king, axis=1)]
+    moves[rows, np.argmax(kind == own_king, axis=1)] = neighbours[king] & ~own & (part != enemy_king) & ~attacked
+    return moves
+
+def move_list(moves: PieceMoves) -> np.ndarray:
+    # The moves of a move_masks result as rows of (position, from square, to square).
+    squares, destinations = moves
+    position, piece, to = np.nonzero(destinations)
+    return np.stack((position, squares[position, piece], to), axis=1)
+
+def benchmark(S: int = 8, bishops: int = 8, sizes: tuple[int, ...] = (1, 64, 1024, 16384),
+              seed: int = 0, out=sys.stdout, moves: bool = False) -> None:
+    # Positions per second of the batch evaluation (encoding included) against evaluate and
+    # is_check on one IndexedBoard at a time (building the board included); with moves, of
+    # move_masks against generate_legal_moves, for White.
+    rng = random.Random(seed)
+    for size in sizes:
+        boards = [random_board(rng, S, bishops) for _ in range(size)]
+        start = time.perf_counter()
+        if moves:
+            move_masks(encode_boards(boards), True)
+        else:
+            analyse_batch(encode_boards(boards))
+        batch_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for B in boards:
+            B = as_indexed(B)
+            if moves:
+                list(generate_legal_moves(True, B))
+            else:
+                evaluate(B, True)
+                is_check(True, B)
+                is_check(False, B)
+        scalar_seconds = time.perf_counter() - start
+        print(f"batch {size:>6}: {size / batch_seconds:12.0f} positions/s batched, "
+              f"{size / scalar_seconds:10.0f} positions/s one by one", file=out)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy batch evaluation and move generation.")
+    parser.add_argument("-s", "--size", type=int, default=8, help="board size")
+    parser.add_argument("-b", "--bishops", type=int, default=8, help="bishops per position")
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 64, 1024, 16384], help="batch sizes")
+    parser.add_argument("--moves", action="store_true", help="time move generation instead of evaluation")
+    args = parser.parse_args(argv)
+    benchmark(args.size, args.bishops, tuple(args.batches), moves=args.moves)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import io
+import random
+
+import pytest
+np = pytest.importorskip("numpy")
+from chess_puzzle import *
+from chess_engine import evaluate
+from chess_vector import *
+
+# encoding tests:
+def test_encode_boards1(): # one int8 plane per board, row y - 1 and column x - 1
+    planes = encode_boards([read_board("board_examp.txt")])
+    assert planes.shape == (1, 5, 5) and planes.dtype == np.int8
+    assert planes[0, 4, 2] == WHITE_KING and planes[0, 2, 1] == BLACK_KING
+    assert planes[0, 4, 1] == WHITE_BISHOP and planes[0, 2, 2] == BLACK_BISHOP
+    assert (planes != EMPTY).sum() == 7
+
+def test_encode_boards2(): # a batch holds boards of one size
+    with pytest.raises(ValueError):
+        encode_boards([read_board("board_examp.txt"), (6, [King(1, 1, True), King(6, 6, False)])])
+
+def test_neighbour_table(): # a king attacks 3 squares from a corner, 5 from an edge and 8 in the middle
+    neighbours = neighbour_table(4)
+    assert neighbours.sum(axis=1).tolist() == [3, 5, 5, 3, 5, 8, 8, 5, 5, 8, 8, 5, 3, 5, 5, 3]
+    assert neighbours[0, 5] and not neighbours[0, 0]
+
+# evaluation tests:
+def test_analyse_batch1(): # board_examp: the score and checks of the scalar code
+    B = as_indexed(read_board("board_examp.txt"))
+    scores, white_in_check, black_in_check = analyse_batch(encode_boards([B]))
+    assert scores.tolist() == [evaluate(B, True)]
+    assert white_in_check.tolist() == [is_check(True, B)]
+    assert black_in_check.tolist() == [is_check(False, B)]
+
+def test_analyse_batch2(): # random boards of every size agree with evaluate and is_check position by position
+    rng = random.Random(22)
+    for S, bishops in ((3, 1), (4, 3), (5, 8), (8, 14), (13, 30), (26, 80)):
+        boards = [random_board(rng, S, bishops) for _ in range(200)]
+        scores, white_in_check, black_in_check = analyse_batch(encode_boards(boards))
+        for i, B in enumerate(boards):
+            B = as_indexed(B)
+            assert scores[i] == evaluate(B, True)
+            assert white_in_check[i] == is_check(True, B) and black_in_check[i] == is_check(False, B)
+
+def test_analyse_batch3(): # batches larger than a chunk give the same answers as one chunk at a time
+    rng = random.Random(23)
+    boards = [random_board(rng, 8, 10) for _ in range(300)]
+    planes = encode_boards(boards)
+    whole = analyse_batch(planes)
+    parts = [analyse_batch(planes[i:i + 1]) for i in range(len(boards))]
+    for j in range(3):
+        assert whole[j].tolist() == [part[j][0] for part in parts]
+
+def test_analyse_batch4(monkeypatch): # results do not depend on the chunk size
+    rng = random.Random(24)
+    planes = encode_boards([random_board(rng, 6, 8) for _ in range(100)])
+    expected = analyse_batch(planes)
+    monkeypatch.setattr("chess_vector.CHUNK_CELLS", 1)
+    assert all((a == b).all() for a, b in zip(analyse_batch(planes), expected))
+
+def test_analyse_batch5(): # each position needs one king of each side
+    planes = encode_boards([read_board("board_examp.txt")])
+    planes[0][planes[0] == BLACK_KING] = EMPTY
+    with pytest.raises(ValueError):
+        analyse_batch(planes)
+
+def test_evaluate_batch(): # the score for either side, and is_check for either side
+    rng = random.Random(25)
+    boards = [random_board(rng, 5, 6) for _ in range(50)]
+    planes = encode_boards(boards)
+    assert evaluate_batch(planes, False).tolist() == [evaluate(as_indexed(B), False) for B in boards]
+    assert is_check_batch(False, planes).tolist() == [is_check(False, B) for B in boards]
+
+def test_benchmark(): # one line per batch size
+    out = io.StringIO()
+    benchmark(5, 4, (1, 64), out=out)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 2 and "positions/s" in lines[1]
+
+# move generation tests:
+def square_moves(B, side): # the legal moves of generate_legal_moves as (from square, to square)
+    S = B[0]
+    return {((piece.pos_y - 1) * S + piece.pos_x - 1, (y - 1) * S + x - 1)
+            for piece, x, y in generate_legal_moves(side, as_indexed(B, side))}
+
+def mask_moves(moves, i): # the moves of position i of a move_masks result as (from square, to square)
+    return {(start, to) for j, start, to in move_list(moves).tolist() if j == i}
+
+def targets(moves, i, start): # the destination mask of the piece on square start of position i
+    squares, destinations = moves
+    slots = np.flatnonzero(squares[i] == start)
+    return destinations[i, slots[0]] if len(slots) else np.zeros(destinations.shape[2], dtype=bool)
+
+def test_ray_tables(): # the squares of each diagonal and their distances from the start
+    rays, distances = ray_tables(4)
+    assert rays[0, 0].tolist() == [5, 10, 15, 16] # a1: b2, c3, d4, then past the end
+    assert rays[0, 1].tolist() == [16] * 4 # nothing up and to the left of a1
+    assert distances[0, 0, 15] == 3 and distances[1, 0, 15] == 0
+
+def test_move_masks1(): # board_examp: the moves of generate_legal_moves, for both sides
+    B = read_board("board_examp.txt")
+    planes = encode_boards([B])
+    for side in (True, False):
+        assert mask_moves(move_masks(planes, side), 0) == square_moves(B, side)
+
+def test_move_masks2(): # random boards of several sizes, legal or not, agree with generate_legal_moves
+    rng = random.Random(26)
+    for S, bishops in ((3, 1), (4, 3), (5, 6), (7, 10), (9, 24)):
+        boards = [random_board(rng, S, bishops) for _ in range(150)]
+        planes = encode_boards(boards)
+        for side in (True, False):
+            moves = move_masks(planes, side)
+            for i, B in enumerate(boards):
+                assert mask_moves(moves, i) == square_moves(B, side), (format_board(B, True), side)
+
+def test_move_masks3(): # every square of every piece agrees with can_move_to on plain boards
+    rng = random.Random(27)
+    boards = [random_board(rng, 5, 5) for _ in range(60)]
+    moves = move_masks(encode_boards(boards), True)
+    for i, B in enumerate(boards):
+        for piece in [p for p in B[1] if p.side]:
+            mask = targets(moves, i, (piece.pos_y - 1) * 5 + piece.pos_x - 1)
+            for x in range(1, 6):
+                for y in range(1, 6):
+                    assert mask[(y - 1) * 5 + x - 1] == piece.can_move_to(x, y, B)
+
+def test_move_masks4(): # a pinned bishop stays on its pin line, and in double check only the king moves
+    pinned = (5, [King(1, 1, True), Bishop(2, 2, True), Bishop(4, 4, False), King(5, 1, False)])
+    moves = move_masks(encode_boards([pinned]), True)
+    assert sorted(np.flatnonzero(targets(moves, 0, 6)).tolist()) == [12, 18] # c3 and the pinner on d4
+    double = (5, [King(3, 1, True), Bishop(1, 3, False), Bishop(5, 3, False), Bishop(3, 3, True), King(3, 5, False)])
+    moves = move_masks(encode_boards([double]), True)
+    assert not targets(moves, 0, 12).any() and targets(moves, 0, 2).any() # c3 could block either check, but not both
+    single = (5, [King(3, 1, True), Bishop(5, 3, False), Bishop(3, 3, True), King(3, 5, False)])
+    assert np.flatnonzero(targets(move_masks(encode_boards([single]), True), 0, 12)).tolist() == [8] # the block on d2
+
+def test_move_masks5(monkeypatch): # results do not depend on the chunk size
+    rng = random.Random(28)
+    planes = encode_boards([random_board(rng, 6, 8) for _ in range(40)])
+    squares, destinations = move_masks(planes, False)
+    monkeypatch.setattr("chess_vector.MOVE_CHUNK_CELLS", 1)
+    again = move_masks(planes, False)
+    assert (again[0] == squares).all() and (again[1] == destinations).all()
+
+def test_move_masks6(): # the move counts are the depth 1 perft counts of the reference positions
+    from chess_perft import REFERENCE_POSITIONS, reference_board
+    for name, text, side, counts in REFERENCE_POSITIONS:
+        assert move_masks(encode_boards([reference_board(text)]), side)[1].sum() == counts[1], name
+
+def test_move_masks7(): # one row per piece: the largest board size with many bishops agrees with generate_legal_moves
+    rng = random.Random(30)
+    boards = [random_board(rng, 26, 30) for _ in range(8)]
+    for side in (True, False):
+        squares, destinations = moves = move_masks(encode_boards(boards), side)
+        assert destinations.shape == (8, squares.shape[1], 26 * 26)
+        assert squares.shape[1] == max(sum(1 for p in B[1] if p.side == side) for B in boards)
+        for i, B in enumerate(boards):
+            assert mask_moves(moves, i) == square_moves(B, side)
+
+def test_move_list(): # one row of (position, from, to) per move
+    rng = random.Random(29)
+    boards = [random_board(rng, 4, 2) for _ in range(5)]
+    moves = move_masks(encode_boards(boards), True)
+    rows = move_list(moves)
+    assert rows.shape == (moves[1].sum(), 3)
+    assert all(targets(moves, i, start)[to] for i, start, to in rows.tolist())
+
+def test_benchmark_moves(): # the move generation benchmark
+    out = io.StringIO()
+    benchmark(5, 4, (1, 64), out=out, moves=True)
+    benchmark(26, 30, (4,), out=out, moves=True) # the largest board size
+    assert len(out.getvalue().splitlines()) == 3